@@ -1,11 +1,17 @@
 # Import necessary libraries
-import yfinance as yf  # For fetching stock data from Yahoo Finance
-import openai  # For interacting with the ChatGPT API
-import requests  # For making HTTP requests to external APIs
 from datetime import datetime  # For working with dates and timestamps
 from dotenv import load_dotenv  # For loading environment variables from a .env file
 import time  # For adding delays in retry logic
 import os  # For accessing environment variables
+from stockthing.v2.pythonversion import http_client  # Pooled keep-alive sessions for all HTTP APIs
+from stockthing.v2.pythonversion.llm_cache import cached_completion  # Reuses identical completions
+from stockthing.v2.pythonversion.rules import rating_rules  # Shared P/E rating thresholds
+from stockthing.v2.pythonversion.utils import lazy_import  # Defers heavy imports to first use
+
+# Provider clients are imported on first use, so starting the script does not pay for them
+yf = lazy_import("yfinance")  # For fetching stock data from Yahoo Finance
+openai = lazy_import("openai")  # For interacting with the ChatGPT API
+requests = lazy_import("requests")  # For making HTTP requests to external APIs
 
 # Explicitly load the api.env file to access API keys and other sensitive information
 load_dotenv("api.env")
@@ -17,6 +23,8 @@ SEARCH_ENGINE_ID = os.getenv("SEARCH_ENGINE_ID", "").strip()  # Google Custom Se
 
 # Set the OpenAI API key for the OpenAI library
 openai.api_key = OPENAI_API_KEY
+# Route OpenAI requests through pooled keep-alive sessions (one per thread, created on first use)
+openai.requestssession = http_client.openai_session
 
 # Function to fetch stock data using Yahoo Finance
 def fetch_stock_data(symbol):
@@ -98,7 +106,7 @@ def scrape_company_data(symbol):
         }
 
         # Make the API request to Google Custom Search
-        response = requests.get(url, params=params)
+        response = http_client.get("google_cse", url, params=params)
         response.raise_for_status()  # Raise an error for bad status codes
         search_results = response.json()  # Parse the JSON response
 
@@ -144,12 +152,8 @@ def get_company_synopsis(long_name, recent_quarter, pe_ratio, scraped_data):
         # Determine the recommendation based on the P/E ratio
         if pe_ratio is None or pe_ratio == "N/A":
             recommendation = "No recommendation (P/E ratio unavailable)."
-        elif pe_ratio < 15:
-            recommendation = "Buy"
-        elif 15 <= pe_ratio <= 25:
-            recommendation = "Hold"
         else:
-            recommendation = "Sell"
+            recommendation = rating_rules.rate(pe_ratio)
 
         # Extract relevant web-scraped data
         title = scraped_data.get("title", "N/A") if scraped_data else "N/A"
@@ -168,7 +172,8 @@ def get_company_synopsis(long_name, recent_quarter, pe_ratio, scraped_data):
         retries = 3
         for attempt in range(retries):
             try:
-                response = openai.ChatCompletion.create(
+                response = cached_completion(
+                    openai.ChatCompletion.create,
                     model="gpt-4",
                     messages=[
                         {"role": "system", "content": "You are a highly skilled financial analyst."},
@@ -203,12 +208,8 @@ def analyze_stock_data(stock_data):
         pe_ratio = stock_data.get("pe_ratio", None)
         if pe_ratio is None or pe_ratio == "N/A":
             return "No Rating (P/E ratio unavailable)"
-        elif pe_ratio < 15:
-            return "Buy"
-        elif 15 <= pe_ratio <= 25:
-            return "Hold"
         else:
-            return "Sell"
+            return rating_rules.rate(pe_ratio)
     except Exception as e:
         # Handle errors during analysis
         print(f"Error analyzing stock data: {e}")
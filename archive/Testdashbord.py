@@ -1,11 +1,14 @@
 # Import necessary libraries
-import openai  # For OpenAI API integration (currently unused in this script)
-import requests  # For making HTTP requests to the Alpha Vantage API
-from datetime import datetime  # For handling timestamps and logging
 from dotenv import load_dotenv, find_dotenv  # For loading environment variables from a .env file
 import os  # For interacting with the operating system (e.g., reading environment variables)
 import time  # For handling rate-limiting and delays
-import streamlit as st  # For creating an interactive dashboard
+from stockthing.v2.pythonversion import http_client  # Pooled keep-alive sessions for the Alpha Vantage API
+from stockthing.v2.pythonversion.export import ExportWriter  # Buffered CSV export
+from stockthing.v2.pythonversion.rules import rating_rules  # Shared P/E rating thresholds
+from stockthing.v2.pythonversion.utils import log_error  # Structured, buffered error log
+from stockthing.v2.pythonversion.utils import lazy_import  # Defers heavy imports to first use
+
+st = lazy_import("streamlit")  # For creating an interactive dashboard (loaded when the dashboard is drawn)
 
 # Load the .env file to access API keys
 dotenv_path = find_dotenv("api.env")
@@ -13,12 +16,8 @@ if dotenv_path:
     load_dotenv(dotenv_path)
 
 # Access the environment variables for API keys
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "").strip()  # OpenAI API key (not used in this script)
 ALPHA_VANTAGE_API_KEY = os.getenv("ALPHA_VANTAGE_API_KEY", "").strip()  # Alpha Vantage API key
 
-# Set the OpenAI API key (not used in this script)
-openai.api_key = OPENAI_API_KEY
-
 # Global variables to track API calls and rate-limiting
 api_call_count = 0  # Tracks the number of API calls made in the current minute
 start_time = time.time()  # Tracks the start time of the current minute
@@ -62,6 +61,7 @@ def fetch_stock_data(symbol):
     Returns:
         dict: A dictionary containing stock information, or None if an error occurs.
     """
+    start = time.perf_counter()  # Time the lookup for the error log
     try:
         # Check and handle rate limits before making the API call
         rate_limit_check()
@@ -73,7 +73,7 @@ def fetch_stock_data(symbol):
             "symbol": symbol,  # Stock symbol
             "apikey": ALPHA_VANTAGE_API_KEY,  # API key for authentication
         }
-        overview_response = requests.get(overview_url, params=overview_params)
+        overview_response = http_client.get("alphavantage", overview_url, params=overview_params)
         overview_data = overview_response.json()  # Parse the JSON response
 
         # If the response does not contain the "Symbol" key, raise an error
@@ -88,7 +88,7 @@ def fetch_stock_data(symbol):
             "symbol": symbol,  # Stock symbol
             "apikey": ALPHA_VANTAGE_API_KEY,  # API key for authentication
         }
-        earnings_response = requests.get(earnings_url, params=earnings_params)
+        earnings_response = http_client.get("alphavantage", earnings_url, params=earnings_params)
         earnings_data = earnings_response.json()  # Parse the JSON response
 
         # Extract the most recent fiscal quarter from the earnings data
@@ -113,14 +113,12 @@ def fetch_stock_data(symbol):
     except ValueError as ve:
         # Handle specific errors related to missing or invalid data
         print(f"ValueError: {ve}")
-        with open("error_log.txt", "a") as log_file:
-            log_file.write(f"{datetime.now()} - ValueError: {ve}\n")
+        log_error(f"ValueError: {ve}", error=ve, symbol=symbol, latency=time.perf_counter() - start)
         return None
     except Exception as e:
         # Handle general errors (e.g., network issues)
         print(f"Error fetching data for {symbol}: {e}")
-        with open("error_log.txt", "a") as log_file:
-            log_file.write(f"{datetime.now()} - Error: {e}\n")
+        log_error(f"Error: {e}", error=e, symbol=symbol, latency=time.perf_counter() - start)
         return None
 
 def analyze_stock_data(stock_data):
@@ -141,12 +139,8 @@ def analyze_stock_data(stock_data):
         # Provide a recommendation based on the P/E ratio
         if pe_ratio is None or pe_ratio == "N/A":
             return "No Rating (P/E ratio unavailable)"
-        elif float(pe_ratio) < 15:
-            return "Buy"
-        elif 15 <= float(pe_ratio) <= 25:
-            return "Hold"
         else:
-            return "Sell"
+            return rating_rules.rate(pe_ratio)
     except Exception as e:
         # Handle errors during analysis (e.g., invalid data types)
         print(f"Error analyzing stock data: {e}")
@@ -225,19 +219,8 @@ def handle_output(display_option, symbol, stock_data, rating, csv_writer=None, h
             file.write(f"The rating for {symbol} is: {rating}\n\n")
         print(f"Analysis for {symbol} has been added to stock_analysis.txt.")
     elif display_option == "csv" and csv_writer:
-        # Write the stock data to the CSV file
-        csv_writer.writerow([
-            stock_data.get("symbol", "N/A"),
-            stock_data.get("long_name", "N/A"),
-            stock_data.get("sector", "N/A"),
-            stock_data.get("industry", "N/A"),
-            stock_data.get("market_cap", "N/A"),
-            stock_data.get("pe_ratio", "N/A"),
-            stock_data.get("dividend_yield", "N/A"),
-            stock_data.get("current_price", "N/A"),
-            stock_data.get("recent_quarter", "N/A"),
-            rating,
-        ])
+        # Buffered by the run's ExportWriter and written out in batches
+        csv_writer.write(stock_data, rating)
         print(f"Analysis for {symbol} has been added to stock_analysis.csv.")
     elif display_option == "html" and html_file:
         # Write the stock data to the HTML file
@@ -295,19 +278,16 @@ def main():
     # Split the input into a list of symbols
     symbols = symbols.split(",")
 
+    csv_writer = html_file = None  # Only set for the csv and html options
+
     # If saving to a single document, open the file once
     if display_option == "one":
         output_file = "stock_analysis.txt"
         with open(output_file, "w") as file:
             file.write("=== Stock Analysis ===\n\n")
     elif display_option == "csv":
-        # Open the CSV file and write the header
-        import csv
-        csv_file = open("stock_analysis.csv", "w", newline="")
-        csv_writer = csv.writer(csv_file)
-        csv_writer.writerow(
-            ["Symbol", "Long Name", "Sector", "Industry", "Market Cap", "P/E Ratio", "Dividend Yield", "Current Price", "Recent Quarter", "Rating"]
-        )
+        # One buffered writer for the run; the file is moved into place when it is closed
+        csv_writer = ExportWriter("stock_analysis.csv")
     elif display_option == "html":
         # Open the HTML file and write the header
         html_file = open("stock_analysis.html", "w")
@@ -315,26 +295,32 @@ def main():
         html_file.write("<h1>Stock Analysis</h1>")
 
     # Process each symbol
-    for symbol in symbols:
-        symbol = symbol.strip()  # Remove any extra spaces
-        if not symbol:  # Skip empty inputs
-            continue
+    try:
+        for symbol in symbols:
+            symbol = symbol.strip()  # Remove any extra spaces
+            if not symbol:  # Skip empty inputs
+                continue
 
-        # Fetch stock data using Alpha Vantage
-        stock_data = fetch_stock_data(symbol)
-        if not stock_data:
-            print(f"Unable to fetch data for {symbol}. Skipping...")
-            continue
+            # Fetch stock data using Alpha Vantage
+            stock_data = fetch_stock_data(symbol)
+            if not stock_data:
+                print(f"Unable to fetch data for {symbol}. Skipping...")
+                continue
 
-        # Analyze stock data to determine Buy, Sell, or Hold
-        rating = analyze_stock_data(stock_data)
+            # Analyze stock data to determine Buy, Sell, or Hold
+            rating = analyze_stock_data(stock_data)
 
-        # Handle the chosen display option
-        handle_output(display_option, symbol, stock_data, rating, csv_writer, html_file)
+            # Handle the chosen display option
+            handle_output(display_option, symbol, stock_data, rating, csv_writer, html_file)
+    except BaseException:
+        # Don't leave a half-written CSV behind (the previous file, if any, is kept)
+        if csv_writer:
+            csv_writer.abort()
+        raise
 
     # Close any open files
     if display_option == "csv":
-        csv_file.close()
+        csv_writer.close()
     elif display_option == "html":
         html_file.write("</body></html>")
         html_file.close()
@@ -1,5 +1,8 @@
-from flask import Flask, render_template, request
+from flask import Flask, Response, jsonify, render_template, request
 from stockthing.v2.pythonversion.stock_analysis import fetch_stock_data, analyze_stock_data
+from stockthing.v2.pythonversion.metrics import PROMETHEUS_CONTENT_TYPE, register_stats, render_prometheus
+from stockthing.v2.pythonversion.prewarm import Prewarmer, alpha_vantage_task
+from stockthing.v2.pythonversion.web_cache import web_cache
 from dotenv import load_dotenv
 import os
 
@@ -10,6 +13,13 @@ app = Flask(__name__)
 load_dotenv("api.env")
 ALPHA_VANTAGE_API_KEY = os.getenv("ALPHA_VANTAGE_API_KEY", "").strip()
 
+# Keep the watchlist and popular tickers warm in the background (set PREWARM=1 to enable)
+prewarmer = Prewarmer([alpha_vantage_task("OVERVIEW", ALPHA_VANTAGE_API_KEY),
+                       alpha_vantage_task("EARNINGS", ALPHA_VANTAGE_API_KEY)])
+register_stats("prewarm", prewarmer.stats)
+if os.getenv("PREWARM", "").strip().lower() in ("1", "true", "yes"):
+    prewarmer.start()
+
 @app.route("/", methods=["GET", "POST"])
 def index():
     """
@@ -18,9 +28,12 @@ def index():
     if request.method == "POST":
         # Get user input
         stock_symbol = request.form.get("stock_symbol").upper().strip()
+        prewarmer.touch(stock_symbol)
 
-        # Fetch stock data
-        stock_data = fetch_stock_data(stock_symbol, ALPHA_VANTAGE_API_KEY)
+        # Fetch stock data (popular tickers are answered from the in-process cache)
+        stock_data = web_cache.get_or_fetch(
+            ("stock", stock_symbol), lambda: fetch_stock_data(stock_symbol, ALPHA_VANTAGE_API_KEY)
+        )
         if not stock_data:
             return render_template("index.html", error="Unable to fetch stock data. Please check the symbol.")
 
@@ -28,9 +41,19 @@ def index():
         rating = analyze_stock_data(stock_data)
 
         # Render the result page
-        return render_template("result.html", stock_data=stock_data, rating=rating)
+        return render_template("result.html", stock_data=stock_data.display_dict(), rating=rating)
 
     return render_template("index.html")
 
+@app.route("/metrics")
+def metrics():
+    """
+    Latency histograms, counters and cache stats in the Prometheus text format
+    (or the cache and pre-warming stats as JSON with ?format=json).
+    """
+    if request.args.get("format") == "json":
+        return jsonify(web_cache=web_cache.stats(), prewarm=prewarmer.stats())
+    return Response(render_prometheus(), content_type=PROMETHEUS_CONTENT_TYPE)
+
 if __name__ == "__main__":
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,147 @@
+# async_app.py
+import asyncio
+import os
+
+import aiohttp
+import jinja2
+from aiohttp import web
+
+from stockthing.v2.pythonversion import http_client, stock_analysis
+from stockthing.v2.pythonversion.llm_cache import cached_completion_async
+from stockthing.v2.pythonversion.maintowebsite import (
+    ALPHA_VANTAGE_API_KEY, COMPETITOR_DEADLINE, SENTIMENT_UNAVAILABLE, CompetitorList, competitor_request, openai,
+    parse_competitors, prewarmer, sentiment_request,
+)
+from stockthing.v2.pythonversion.metrics import PROMETHEUS_CONTENT_TYPE, render_prometheus
+from stockthing.v2.pythonversion.utils import PRIORITY_BATCH
+from stockthing.v2.pythonversion.web_cache import web_cache
+
+# The same pages as maintowebsite, served on an asyncio event loop: a request waiting on Alpha Vantage
+# or OpenAI holds no thread, so concurrency is bounded by upstream connections, not by worker threads.
+# Run with `python -m stockthing.v2.pythonversion.async_app` (HOST and PORT set the address).
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+templates = jinja2.Environment(loader=jinja2.FileSystemLoader(os.path.join(BASE_DIR, "templates")),
+                               autoescape=jinja2.select_autoescape(["html"]))
+
+# aiohttp session for all upstream calls, created when the app starts
+UPSTREAM_SESSION = web.AppKey("upstream_session", aiohttp.ClientSession)
+
+# Competitor lookups still running after the deadline; referenced so they finish and fill the cache
+background_tasks = set()
+
+def render(template, **context):
+    return web.Response(text=templates.get_template(template).render(**context), content_type="text/html")
+
+def keep_running(task):
+    """
+    Let a task finish in the background after its page has been rendered.
+    """
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    # Read the outcome so a failure is not reported as a never-retrieved exception
+    task.add_done_callback(lambda task: task.cancelled() or task.exception())
+
+async def get_investor_sentiment_async(stock_symbol, max_age=None):
+    """
+    Async get_investor_sentiment: the same prompt and LLM cache entry, without blocking the loop.
+    """
+    try:
+        response = await cached_completion_async(openai.Completion.acreate, max_age=max_age,
+                                                 **sentiment_request(stock_symbol))
+        return response["choices"][0]["text"].strip()
+    except Exception as e:
+        print(f"Error fetching investor sentiment: {e}")
+        return SENTIMENT_UNAVAILABLE
+
+async def get_competing_companies_async(session, stock_symbol):
+    """
+    Async get_competing_companies: competitors are fetched concurrently, and whatever has not finished
+    by COMPETITOR_DEADLINE is left off the page (and the list is not cached).
+    """
+    try:
+        response = await cached_completion_async(openai.Completion.acreate, **competitor_request(stock_symbol))
+        symbols = parse_competitors(response, stock_symbol)
+        if not symbols:
+            return CompetitorList()
+
+        # Batch lane, so lookups left running never queue ahead of the next users' own lookups
+        tasks = [asyncio.ensure_future(stock_analysis.fetch_stock_data_async(session, symbol, ALPHA_VANTAGE_API_KEY,
+                                                                             PRIORITY_BATCH))
+                 for symbol in symbols]
+        done, pending = await asyncio.wait(tasks, timeout=COMPETITOR_DEADLINE)
+        for task in pending:
+            keep_running(task)
+        competitors = CompetitorList(task.result() for task in tasks if task in done and task.result())
+        competitors.complete = not pending
+        return competitors
+    except Exception as e:
+        print(f"Error fetching competing companies: {e}")
+        return CompetitorList()
+
+async def index(request):
+    """
+    Homepage where users can input stock symbols and get analysis.
+    """
+    if request.method == "POST":
+        form = await request.post()
+        stock_symbol = form.get("stock_symbol", "").upper().strip()
+        prewarmer.touch(stock_symbol)
+
+        # Fetch stock data, investor sentiment and competing companies concurrently; popular tickers
+        # are answered from the in-process cache
+        session = request.app[UPSTREAM_SESSION]
+        openai.aiosession.set(session)  # Pooled connections for the completions of this request
+        stock_data, sentiment, competitors = await asyncio.gather(
+            web_cache.get_or_fetch_async(
+                ("stock", stock_symbol),
+                lambda: stock_analysis.fetch_stock_data_async(session, stock_symbol, ALPHA_VANTAGE_API_KEY)),
+            web_cache.get_or_fetch_async(("sentiment", stock_symbol),
+                                         lambda: get_investor_sentiment_async(stock_symbol),
+                                         lambda sentiment: sentiment != SENTIMENT_UNAVAILABLE),
+            web_cache.get_or_fetch_async(("competitors", stock_symbol),
+                                         lambda: get_competing_companies_async(session, stock_symbol),
+                                         lambda competitors: bool(competitors) and competitors.complete),
+        )
+        if not stock_data:
+            return render("index.html", error="Unable to fetch stock data. Please check the symbol.")
+
+        # Render the result page
+        return render(
+            "result.html",
+            stock_data=stock_data.display_dict(),
+            rating=stock_analysis.analyze_stock_data(stock_data),
+            sentiment=sentiment,
+            competitors=[competitor.display_dict() for competitor in competitors],
+        )
+
+    return render("index.html")
+
+async def metrics(request):
+    """
+    Latency histograms, counters and cache stats in the Prometheus text format
+    (or the cache and pre-warming stats as JSON with ?format=json).
+    """
+    if request.query.get("format") == "json":
+        return web.json_response({"web_cache": web_cache.stats(), "prewarm": prewarmer.stats()})
+    return web.Response(body=render_prometheus().encode("utf-8"), headers={"Content-Type": PROMETHEUS_CONTENT_TYPE})
+
+async def upstream_session(app):
+    app[UPSTREAM_SESSION] = http_client.create_async_session()
+    yield
+    await app[UPSTREAM_SESSION].close()
+
+def create_app():
+    """
+    Return the aiohttp application serving the analysis pages.
+    """
+    app = web.Application()
+    app.router.add_route("GET", "/", index)
+    app.router.add_route("POST", "/", index)
+    app.router.add_get("/metrics", metrics)
+    app.router.add_static("/static", os.path.join(BASE_DIR, "static"))
+    app.cleanup_ctx.append(upstream_session)
+    return app
+
+if __name__ == "__main__":
+    web.run_app(create_app(), host=os.getenv("HOST", "127.0.0.1"), port=int(os.getenv("PORT", "8000")))
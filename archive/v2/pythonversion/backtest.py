@@ -0,0 +1,161 @@
+# backtest.py
+import math
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+from stockthing.v2.pythonversion import indicators
+from stockthing.v2.pythonversion.cache import fundamentals_cache
+from stockthing.v2.pythonversion.rules import rating_rules
+from stockthing.v2.pythonversion.screening import BUY, INVALID_RATING, NO_RATING, SELL, Universe, rate_codes
+
+class Market(NamedTuple):
+    """
+    Historical data for a universe: one row per symbol and one column per trading day.
+    """
+
+    symbols: list
+    dates: np.ndarray
+    close: np.ndarray
+    pe_ratio: np.ndarray  # Price over trailing twelve months EPS; NaN when EPS is missing or not positive
+    factors: Optional[dict] = None  # Extra symbols x days matrices by name, usable in screening rules
+
+class BacktestResult(NamedTuple):
+    returns: np.ndarray  # Daily portfolio returns after costs
+    equity: np.ndarray  # Growth of 1 invested at the start
+    total_return: float
+    annual_return: float
+    volatility: float
+    sharpe: float
+    max_drawdown: float
+    turnover: float  # Average fraction of the portfolio traded per year
+
+def trailing_eps(dates, report_dates, reported_eps):
+    """
+    Return trailing twelve months EPS at every date, from quarterly EPS known on their report dates.
+
+    Dates before four quarters have been reported are NaN, so nothing is used before it was public.
+    """
+    order = np.argsort(report_dates)
+    report_dates = np.asarray(report_dates)[order]
+    eps = np.asarray(reported_eps, dtype=np.float64)[order]
+    ttm = np.full(len(eps), np.nan)
+    if len(eps) >= 4:
+        totals = np.cumsum(eps)
+        ttm[3:] = totals[3:] - np.concatenate([[0.0], totals[:-4]])
+    # Index of the latest report published on or before each date
+    latest = np.searchsorted(report_dates, dates, side="right") - 1
+    return np.where(latest >= 0, ttm[np.maximum(latest, 0)], np.nan)
+
+def pe_history(dates, close, earnings_data):
+    """
+    Return the P/E ratio at every date from daily closes and an Alpha Vantage EARNINGS response.
+    """
+    quarters = [
+        quarter for quarter in earnings_data.get("quarterlyEarnings", [])
+        if quarter.get("reportedDate") not in (None, "None") and quarter.get("reportedEPS") not in (None, "None")
+    ]
+    if not quarters:
+        return np.full(len(dates), np.nan)
+    eps = trailing_eps(
+        dates.astype("datetime64[D]"),
+        np.array([quarter["reportedDate"] for quarter in quarters], dtype="datetime64[D]"),
+        [float(quarter["reportedEPS"]) for quarter in quarters],
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(eps > 0, close / eps, np.nan)
+
+def load_market(symbols, start=None, end=None, store=None, cache=None):
+    """
+    Build a Market from the price store and the EARNINGS responses in the fundamentals cache.
+    """
+    cache = cache or fundamentals_cache
+    dates, close = indicators.load_closes(symbols, start, end, store)
+    pe_ratio = np.full(close.shape, np.nan)
+    for row, symbol in enumerate(symbols):
+        earnings_data = cache.get("alphavantage", "EARNINGS", symbol, allow_stale=True)
+        if earnings_data:
+            pe_ratio[row] = pe_history(dates, close[row], earnings_data)
+    return Market(list(symbols), dates, close, pe_ratio)
+
+def forward_fill(values, axis=-1):
+    """
+    Replace NaNs with the last earlier non-NaN value along axis (leading NaNs stay NaN).
+    """
+    values = np.moveaxis(values, axis, -1)
+    index = np.where(np.isnan(values), 0, np.arange(values.shape[-1]))
+    np.maximum.accumulate(index, axis=-1, out=index)
+    filled = np.take_along_axis(values, index, axis=-1)
+    return np.moveaxis(filled, -1, axis)
+
+def rating_codes(market, buy_below=rating_rules.buy_below, sell_above=rating_rules.sell_above, buy_rules=()):
+    """
+    Rate every symbol on every day with the same P/E bands as analyze_stock_data.
+
+    buy_rules are screening rules (field, op, value) over the market's factors that a stock must also
+    pass to be rated Buy.
+    """
+    # Flattened views, so every (symbol, day) is one row of a screening universe
+    columns = {name: values.ravel() for name, values in (market.factors or {}).items()}
+    columns["pe_ratio"] = market.pe_ratio.ravel()
+    universe = Universe(columns, {"pe_ratio": np.zeros(len(columns["pe_ratio"]), dtype=bool)})
+    return rate_codes(universe, buy_below, sell_above, buy_rules).reshape(market.pe_ratio.shape)
+
+def pe_rating_strategy(buy_below=rating_rules.buy_below, sell_above=rating_rules.sell_above, buy_rules=()):
+    """
+    Strategy following the P/E rating: buy on Buy, keep a position through Hold, sell on Sell or when
+    the rating is unavailable. Positions are equally weighted.
+    """
+    def strategy(market):
+        codes = rating_codes(market, buy_below, sell_above, buy_rules)
+        held = np.full(codes.shape, np.nan)
+        held[codes == BUY] = 1.0
+        held[(codes == SELL) | (codes == NO_RATING) | (codes == INVALID_RATING)] = 0.0
+        # Hold keeps whatever position the stock had
+        held = np.nan_to_num(forward_fill(held), nan=0.0)
+        return equal_weights(held)
+    return strategy
+
+def equal_weights(held):
+    """
+    Turn a 0/1 holdings matrix into equal portfolio weights per day (columns sum to 1, or 0 when empty).
+    """
+    counts = held.sum(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(counts > 0, held / counts, 0.0)
+
+def run_backtest(market, strategy, rebalance_every=1, cost_bps=10.0, periods_per_year=indicators.PERIODS_PER_YEAR):
+    """
+    Backtest a strategy over a Market and report returns, Sharpe ratio and turnover.
+
+    strategy(market) returns target weights (symbols x days). Weights decided at a day's close earn
+    the next day's returns, so a rule never trades on data it could not have seen. Weights are
+    only changed every rebalance_every days, and every trade costs cost_bps basis points.
+    """
+    weights = np.asarray(strategy(market), dtype=np.float64)
+    if rebalance_every > 1:
+        # Keep the weights of the last rebalance day in between
+        held = np.full(weights.shape, np.nan)
+        held[:, ::rebalance_every] = weights[:, ::rebalance_every]
+        weights = forward_fill(held)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        asset_returns = np.nan_to_num(market.close[:, 1:] / market.close[:, :-1] - 1, nan=0.0, posinf=0.0)
+    traded = np.abs(np.diff(weights, axis=1, prepend=0.0)).sum(axis=0)[:-1]
+    returns = np.einsum("ij,ij->j", weights[:, :-1], asset_returns) - traded * cost_bps / 10000
+
+    equity = np.cumprod(1 + returns)
+    years = len(returns) / periods_per_year
+    volatility = returns.std(ddof=1) * math.sqrt(periods_per_year) if len(returns) > 1 else 0.0
+    total_return = equity[-1] - 1 if len(equity) else 0.0
+    return BacktestResult(
+        returns=returns,
+        equity=equity,
+        total_return=float(total_return),
+        annual_return=float((1 + total_return) ** (1 / years) - 1) if years else 0.0,
+        volatility=float(volatility),
+        sharpe=float(returns.mean() / returns.std(ddof=1) * math.sqrt(periods_per_year)) if volatility else 0.0,
+        max_drawdown=float(indicators.max_drawdown(equity)) if len(equity) else 0.0,
+        # Each unit traded is half a buy and half a sell
+        turnover=float(traded.sum() / 2 / years) if years else 0.0,
+    )
@@ -0,0 +1,77 @@
+# benchmark.py
+import argparse
+
+from stockthing.v2.pythonversion import stock_analysis
+from stockthing.v2.pythonversion.benchmarks import analytics, data, fetching, import_time, scenarios
+from stockthing.v2.pythonversion.benchmarks.history import BENCHMARK_HISTORY_PATH, record_results
+
+# Scenarios run by "suite"
+SUITE = ("cli_single", "batch", "flask_load", "report")
+
+def bench_suite(args):
+    """
+    Run the end-to-end scenarios against the stub and record each one in the history.
+    """
+    for name in SUITE:
+        print(f"== {name}")
+        results = BENCHMARKS[name](args)
+        if not args.no_save:
+            record_results(name, args, results)
+
+# Available benchmark scenarios
+BENCHMARKS = {
+    "backtest": analytics.bench_backtest,
+    "batch": scenarios.bench_batch,
+    "cli_single": scenarios.bench_cli_single,
+    "export": data.bench_export,
+    "fetch_many": fetching.bench_fetch_many,
+    "flask_load": scenarios.bench_flask_load,
+    "http_pool": fetching.bench_http_pool,
+    "import_time": import_time.bench_import_time,
+    "indicators": analytics.bench_indicators,
+    "portfolio": analytics.bench_portfolio,
+    "price_store": data.bench_price_store,
+    "rate_limit": scenarios.bench_rate_limit,
+    "records": data.bench_records,
+    "report": scenarios.bench_report,
+    "screening": data.bench_screening,
+    "singleflight": fetching.bench_singleflight,
+    "suite": bench_suite,
+}
+
+def main():
+    parser = argparse.ArgumentParser(description="Run performance benchmarks against local mock services.")
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS), help="Benchmark scenario to run.")
+    parser.add_argument("--symbols", type=int, default=50, help="Number of symbols to fetch.")
+    parser.add_argument("--latency", type=float, default=0.05, help="Mock upstream latency in seconds.")
+    parser.add_argument("--clients", type=int, default=50, help="Number of simultaneous clients for load tests.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000],
+                        help="Universe sizes for the screening, records and export benchmarks.")
+    parser.add_argument("--universe", type=int, default=5000,
+                        help="Number of symbols for the indicator and backtest benchmarks.")
+    parser.add_argument("--years", type=int, default=10,
+                        help="Years of daily bars for the indicator and backtest benchmarks.")
+    parser.add_argument("--positions", type=int, default=1000, help="Number of positions for the portfolio benchmark.")
+    parser.add_argument("--processes", type=int, help="Worker processes for parameter sweeps (default: CPU count).")
+    parser.add_argument("--passes", type=int, default=5, help="Repetitions of the analysis pass.")
+    parser.add_argument("--requests", type=int, default=100, help="Number of requests for per-request benchmarks.")
+    parser.add_argument("--concurrency", type=int, default=stock_analysis.DEFAULT_MAX_CONCURRENCY,
+                        help="Maximum number of concurrent upstream requests.")
+    parser.add_argument("--batch", type=int, default=500, help="Number of symbols for the batch benchmark.")
+    parser.add_argument("--tickers", type=int, default=20, help="Distinct tickers requested in the Flask load test.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of stub requests failing with 503.")
+    parser.add_argument("--stub-rate-limit", help="Quota the stub enforces per API key, e.g. 5/60 (default: none).")
+    parser.add_argument("--time-scale", type=float, default=60.0,
+                        help="Speed-up of the quota period in the rate_limit benchmark (60: 5/60 becomes 5/1).")
+    parser.add_argument("--recordings", help="Directory of recorded responses for the stub to replay.")
+    parser.add_argument("--repeat", type=int, default=5, help="Measurements per entry point in import_time.")
+    parser.add_argument("--no-save", action="store_true", help=f"Don't append results to {BENCHMARK_HISTORY_PATH}.")
+    args = parser.parse_args()
+    results = BENCHMARKS[args.benchmark](args)
+    if results and not args.no_save:
+        record_results(args.benchmark, args, results)
+    if results and results.get("failures"):
+        raise SystemExit(f"Failed: {', '.join(results['failures'])}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+# analytics.py
+import math
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from stockthing.v2.pythonversion import backtest, indicators, portfolio, sweep
+from stockthing.v2.pythonversion.benchmarks.common import make_symbols
+
+def python_sma_ema(closes, window):
+    """
+    Per-symbol pure Python SMA and EMA, the baseline for the indicator benchmark.
+    """
+    alpha = 2 / (window + 1)
+    for row in closes.tolist():
+        sma = []
+        total = 0.0
+        for index, value in enumerate(row):
+            total += value
+            if index >= window:
+                total -= row[index - window]
+            sma.append(total / window if index >= window - 1 else math.nan)
+        ema = sum(row[:window]) / window
+        for value in row[window:]:
+            ema += alpha * (value - ema)
+
+def bench_indicators(args):
+    """
+    Time every vectorized indicator over years x universe daily closes, a pure Python baseline on
+    a sample, and one incremental update of all symbols.
+    """
+    bars = args.years * indicators.PERIODS_PER_YEAR
+    rng = np.random.default_rng(0)
+    closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.015, (args.universe, bars)), axis=1))
+    print(f"{args.universe} symbols x {bars} bars ({closes.nbytes / 2 ** 20:.0f} MiB of closes)")
+
+    for name, compute in (
+        ("SMA(50)", lambda: indicators.sma(closes, 50)),
+        ("EMA(50)", lambda: indicators.ema(closes, 50)),
+        ("RSI(14)", lambda: indicators.rsi(closes, 14)),
+        ("MACD(12,26,9)", lambda: indicators.macd(closes)),
+        ("Bollinger(20,2)", lambda: indicators.bollinger_bands(closes)),
+        ("volatility(20)", lambda: indicators.rolling_volatility(closes)),
+        ("drawdown", lambda: indicators.drawdown(closes)),
+    ):
+        start = time.perf_counter()
+        compute()
+        print(f"  {name:16s} {(time.perf_counter() - start) * 1000:8.1f} ms")
+
+    sample = closes[:100]
+    start = time.perf_counter()
+    python_sma_ema(sample, 50)
+    python_time = (time.perf_counter() - start) * len(closes) / len(sample)
+    start = time.perf_counter()
+    indicators.sma(closes, 50)
+    indicators.ema(closes, 50)
+    numpy_time = time.perf_counter() - start
+    print(f"  SMA+EMA pure Python (extrapolated from 100 symbols): {python_time:6.2f} s  "
+          f"vectorized: {numpy_time:6.2f} s ({python_time / numpy_time:.0f}x)")
+
+    # Warm the incremental indicators on history, then time one live bar for every symbol
+    live = [indicators.IncrementalSMA(50), indicators.IncrementalEMA(50), indicators.IncrementalRSI(14),
+            indicators.IncrementalMACD(), indicators.IncrementalBollinger(), indicators.IncrementalVolatility(),
+            indicators.IncrementalDrawdown()]
+    for index in range(bars - 1):
+        for indicator in live:
+            indicator.update(closes[:, index])
+    start = time.perf_counter()
+    for indicator in live:
+        indicator.update(closes[:, -1])
+    print(f"  incremental update of all 7 indicators for one new bar: "
+          f"{(time.perf_counter() - start) * 1000:.2f} ms for {args.universe} symbols")
+
+def synthetic_market(symbols, years, seed=0):
+    """
+    Build a Market of random-walk closes and quarterly EPS reports for the backtest benchmarks.
+    """
+    rng = np.random.default_rng(seed)
+    bars = years * indicators.PERIODS_PER_YEAR
+    dates = np.busday_offset("2000-01-03", np.arange(bars), roll="forward").astype("datetime64[s]")
+    # A common market factor plus stock-specific noise, so stocks move together like real ones
+    market_moves = rng.normal(0.0003, 0.011, bars)
+    beta = rng.uniform(0.5, 1.5, (symbols, 1))
+    close = 50 * np.exp(np.cumsum(beta * market_moves + rng.normal(0, 0.015, (symbols, bars)), axis=1))
+    report_dates = np.busday_offset("1999-02-01", np.arange(0, bars + 63, 63), roll="forward")
+    quarters = len(report_dates)
+    eps = rng.uniform(0.3, 1.5, (symbols, 1)) * np.exp(np.cumsum(rng.normal(0.01, 0.08, (symbols, quarters)), axis=1))
+    eps[rng.random((symbols, quarters)) < 0.03] *= -1  # Occasional loss-making quarters
+    pe_ratio = np.empty((symbols, bars))
+    for row in range(symbols):
+        ttm = backtest.trailing_eps(dates.astype("datetime64[D]"), report_dates, eps[row])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            pe_ratio[row] = np.where(ttm > 0, close[row] / ttm, np.nan)
+    return backtest.Market(make_symbols(symbols), dates, close, pe_ratio)
+
+def bench_backtest(args):
+    """
+    Time a P/E rating backtest over years x universe and a parameter sweep on a process pool.
+    """
+    start = time.perf_counter()
+    market = synthetic_market(args.universe, args.years)
+    print(f"{args.universe} symbols x {len(market.dates)} days (built in {time.perf_counter() - start:.1f} s)")
+
+    start = time.perf_counter()
+    result = backtest.run_backtest(market, backtest.pe_rating_strategy())
+    print(f"  single backtest: {time.perf_counter() - start:6.2f} s  "
+          f"annual return {result.annual_return:6.1%}  Sharpe {result.sharpe:5.2f}  "
+          f"turnover {result.turnover:5.2f}/yr  max drawdown {result.max_drawdown:6.1%}")
+
+    # One-year momentum as an extra factor for Buy rules
+    momentum = np.full(market.close.shape, np.nan)
+    momentum[:, 252:] = market.close[:, 252:] / market.close[:, :-252] - 1
+    market = market._replace(factors={"momentum": momentum})
+
+    runner = sweep.SweepRunner(os.path.join(tempfile.mkdtemp(prefix="stock_sweep_"), "sweep.sqlite3"))
+    grid = sweep.parameter_grid(buy_below=[10, 15, 20], sell_above=[25, 30], buy_rules=[[], [["momentum", ">", 0]]])
+    start = time.perf_counter()
+    results = runner.run(market, grid, processes=args.processes)
+    elapsed = time.perf_counter() - start
+    print(f"  sweep of {len(grid)} parameter sets on {args.processes or os.cpu_count()} processes "
+          f"(shared memory): {elapsed:6.2f} s")
+    for parameters, summary in results[:3]:
+        print(f"    {parameters}  Sharpe {summary['sharpe']:5.2f}  annual return {summary['annual_return']:6.1%}")
+
+    # Extending the grid only computes the new points
+    grid += sweep.parameter_grid(buy_below=[12.5], sell_above=[25, 30], buy_rules=[[]])
+    computed = runner.computed
+    start = time.perf_counter()
+    runner.run(market, grid, processes=args.processes)
+    print(f"  re-run with {len(grid)} parameter sets: {runner.computed - computed} computed, "
+          f"{len(grid) - (runner.computed - computed)} from cache, {time.perf_counter() - start:6.2f} s")
+
+def bench_portfolio(args):
+    """
+    Time a full risk analysis of a portfolio and the incremental update after one position changes.
+    """
+    market = synthetic_market(args.positions, 1)
+    returns = (market.close[:, 1:] / market.close[:, :-1] - 1).T
+    rng = np.random.default_rng(1)
+    shares = rng.integers(1, 500, args.positions)
+    sectors = rng.choice(["Technology", "Financials", "Healthcare", "Energy", "Industrials"], args.positions)
+    benchmark_returns = returns.mean(axis=1)
+    print(f"{args.positions} positions x {len(returns)} days of returns")
+
+    start = time.perf_counter()
+    holdings = portfolio.Portfolio(market.symbols, shares, market.close[:, -1], returns, sectors, benchmark_returns)
+    report = holdings.report()
+    print(f"  full analysis: {(time.perf_counter() - start) * 1000:8.2f} ms  "
+          f"value {report['value']:,.0f}  volatility {report['volatility']:.1%}  "
+          f"VaR(95%) {report['value_at_risk']:.2%}  CVaR(95%) {report['conditional_value_at_risk']:.2%}  "
+          f"beta {report['beta']:.2f}")
+
+    start = time.perf_counter()
+    for _ in range(args.requests):
+        holdings.set_position(market.symbols[rng.integers(args.positions)], int(rng.integers(0, 500)))
+        holdings.report()
+    print(f"  one position changed, incremental: {(time.perf_counter() - start) * 1000 / args.requests:8.2f} ms")
+
+    start = time.perf_counter()
+    rebuilt = portfolio.Portfolio(holdings.symbols, holdings.shares, holdings.prices, holdings.returns,
+                                  sectors, benchmark_returns)
+    rebuilt.report()
+    print(f"  one position changed, full rebuild: {(time.perf_counter() - start) * 1000:8.2f} ms "
+          f"(volatility matches: {math.isclose(rebuilt.volatility(), holdings.volatility(), rel_tol=1e-9)})")
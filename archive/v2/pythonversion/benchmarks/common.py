@@ -0,0 +1,76 @@
+# common.py
+import math
+import os
+import tempfile
+
+import openai
+
+from stockthing.v2.pythonversion import llm_cache, stock_analysis, utils
+from stockthing.v2.pythonversion.cache import FundamentalsCache
+from stockthing.v2.pythonversion.mock_server import start_mock_server
+from stockthing.v2.pythonversion.refresh_planner import RefreshPlanner
+
+def make_symbols(count):
+    """
+    Generate a list of distinct fake ticker symbols.
+    """
+    return [f"T{index:04d}" for index in range(count)]
+
+def use_fresh_cache():
+    """
+    Point the fetchers at a new, empty on-disk cache so every lookup goes upstream.
+    """
+    path = os.path.join(tempfile.mkdtemp(prefix="stock_bench_"), "cache.sqlite3")
+    stock_analysis.fundamentals_cache = FundamentalsCache(path)
+    stock_analysis.refresh_planner = RefreshPlanner(stock_analysis.fundamentals_cache)
+    return stock_analysis.fundamentals_cache
+
+def use_mock_alpha_vantage(latency, **server_options):
+    """
+    Start the mock server, point the fetchers at it and lift the rate limit for the run.
+
+    server_options go to start_mock_server (e.g. error_rate, rate_limit).
+    """
+    server, url = start_mock_server(latency=latency, **server_options)
+    stock_analysis.ALPHA_VANTAGE_URL = url
+    utils.configure_rate_limiter("alphavantage", 10 ** 9, 1)
+    return server
+
+def parse_rate(text):
+    """
+    Parse a quota such as "5/60" into (calls, period in seconds), or None for an empty value.
+    """
+    if not text:
+        return None
+    calls, period = (float(value) for value in text.split("/"))
+    return calls, period
+
+def latency_percentiles(latencies):
+    """
+    Return nearest-rank p50/p95/p99 of latencies (seconds) in milliseconds.
+    """
+    ordered = sorted(latencies)
+    if not ordered:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None}
+    return {
+        f"p{percent}_ms": ordered[max(math.ceil(percent / 100 * len(ordered)) - 1, 0)] * 1000
+        for percent in (50, 95, 99)
+    }
+
+def use_stub(args, **server_options):
+    """
+    Start the mock upstreams with the stub options from the command line (latency, error rate,
+    rate limit, recordings) and an empty cache. With a stub rate limit, the client limiter gets
+    the same quota, as it would against the real API.
+    """
+    rate_limit = parse_rate(args.stub_rate_limit)
+    server = use_mock_alpha_vantage(args.latency, error_rate=args.error_rate, rate_limit=rate_limit,
+                                    recordings=args.recordings, **server_options)
+    if rate_limit:
+        utils.configure_rate_limiter("alphavantage", *rate_limit)
+    use_fresh_cache()
+    openai.api_base = server.openai_base
+    openai.api_key = "mock"
+    utils.configure_rate_limiter("openai", 10 ** 9, 1)
+    llm_cache.llm_cache = llm_cache.LLMCache(os.path.join(tempfile.mkdtemp(prefix="stock_bench_"), "llm.sqlite3"))
+    return server
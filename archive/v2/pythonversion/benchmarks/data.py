@@ -0,0 +1,212 @@
+# data.py
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from stockthing.v2.pythonversion import stock_analysis
+from stockthing.v2.pythonversion.benchmarks.common import make_symbols, use_mock_alpha_vantage
+from stockthing.v2.pythonversion.export import ExportWriter, format_text_block
+from stockthing.v2.pythonversion.mock_server import overview_payload, earnings_payload, time_series_payload
+from stockthing.v2.pythonversion.price_store import PriceStore, parse_time_series
+from stockthing.v2.pythonversion.records import StockRecord, StockRecordBatch
+from stockthing.v2.pythonversion.screening import Universe, rate_universe
+
+def make_records(count, seed=0):
+    """
+    Generate stock_data dictionaries with string values, like fetch_stock_data returns.
+    """
+    rng = np.random.default_rng(seed)
+    pe_ratios = rng.uniform(1, 60, count)
+    missing = rng.random(count) < 0.1
+    sectors = ["TECHNOLOGY", "ENERGY", "FINANCE", "HEALTHCARE"]
+    return [
+        {
+            "symbol": f"T{index:06d}",
+            "long_name": f"Company {index}",
+            "sector": sectors[index % len(sectors)],
+            "industry": "N/A",
+            "market_cap": str(int(rng.integers(10 ** 7, 10 ** 12))),
+            "pe_ratio": "N/A" if missing[index] else f"{pe_ratios[index]:.2f}",
+            "dividend_yield": f"{rng.uniform(0, 0.08):.4f}",
+            "current_price": f"{rng.uniform(1, 900):.2f}",
+            "recent_quarter": "2024-09-30",
+        }
+        for index in range(count)
+    ]
+
+def bench_screening(args):
+    """
+    Compare rating a universe with the per-row analyze_stock_data against the vectorized engine.
+    """
+    for count in args.rows:
+        records = make_records(count)
+
+        start = time.perf_counter()
+        scalar = [stock_analysis.analyze_stock_data(record) for record in records]
+        scalar_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        universe = Universe.from_records(records)
+        load_time = time.perf_counter() - start
+        start = time.perf_counter()
+        vectorized = rate_universe(universe)
+        rate_time = time.perf_counter() - start
+
+        assert scalar == vectorized.tolist(), "vectorized ratings differ from analyze_stock_data"
+        print(f"{count:>8} rows: scalar {scalar_time * 1000:8.1f} ms   "
+              f"vectorized load {load_time * 1000:7.1f} ms + rate {rate_time * 1000:6.1f} ms "
+              f"({scalar_time / rate_time:.0f}x on rating)")
+
+def legacy_stock_info(symbol, overview_data, earnings_data):
+    """
+    Build the string-valued dictionary fetch_stock_data used to return, for comparison.
+    """
+    return {
+        "symbol": symbol,
+        "long_name": overview_data.get("Name", "N/A"),
+        "sector": overview_data.get("Sector", "N/A"),
+        "industry": overview_data.get("Industry", "N/A"),
+        "market_cap": overview_data.get("MarketCapitalization", "N/A"),
+        "pe_ratio": overview_data.get("PERatio", "N/A"),
+        "dividend_yield": overview_data.get("DividendYield", "N/A"),
+        "current_price": overview_data.get("50DayMovingAverage", "N/A"),
+        "recent_quarter": earnings_data["quarterlyEarnings"][0]["fiscalDateEnding"],
+    }
+
+def measure_build(build):
+    """
+    Return (result, seconds, bytes still allocated afterwards) for building a collection of records.
+    """
+    start = time.perf_counter()
+    build()
+    elapsed = time.perf_counter() - start
+
+    # Second run under tracemalloc; only memory the result keeps alive is counted
+    tracemalloc.start()
+    result = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, elapsed, size
+
+def bench_records(args):
+    """
+    Compare build time, retained memory and analysis cost of string dictionaries, StockRecords
+    and a StockRecordBatch built from raw API responses.
+    """
+    for count in args.rows:
+        bodies = [
+            (symbol, json.dumps(overview_payload(symbol)), json.dumps(earnings_payload(symbol)))
+            for symbol in make_symbols(count)
+        ]
+
+        def build(make):
+            return [make(symbol, json.loads(overview), json.loads(earnings)) for symbol, overview, earnings in bodies]
+
+        dicts, dict_build, dict_size = measure_build(lambda: build(legacy_stock_info))
+        records, record_build, record_size = measure_build(lambda: build(StockRecord.from_responses))
+        batch, batch_build, batch_size = measure_build(
+            lambda: StockRecordBatch.from_records(build(StockRecord.from_responses)))
+
+        start = time.perf_counter()
+        for _ in range(args.passes):
+            [stock_analysis.analyze_stock_data(record) for record in dicts]
+        dict_analyze = (time.perf_counter() - start) / args.passes
+        start = time.perf_counter()
+        for _ in range(args.passes):
+            [stock_analysis.analyze_stock_data(record) for record in records]
+        record_analyze = (time.perf_counter() - start) / args.passes
+
+        print(f"{count} records")
+        print(f"  string dicts:      build {dict_build * 1000:7.1f} ms  {dict_size / count:6.0f} B/record  "
+              f"analyze {dict_analyze * 1000:6.1f} ms")
+        print(f"  StockRecord:       build {record_build * 1000:7.1f} ms  {record_size / count:6.0f} B/record  "
+              f"analyze {record_analyze * 1000:6.1f} ms")
+        print(f"  StockRecordBatch:  build {batch_build * 1000:7.1f} ms  {batch_size / count:6.0f} B/record")
+
+def bench_export(args):
+    """
+    Compare the old reopen-and-append-per-stock text output with the buffered ExportWriter formats.
+    """
+    for count in args.rows:
+        records = [
+            StockRecord.from_responses(symbol, overview_payload(symbol), earnings_payload(symbol))
+            for symbol in make_symbols(count)
+        ]
+        ratings = [stock_analysis.analyze_stock_data(record) for record in records]
+        print(f"{count} records")
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "legacy.txt")
+            tracemalloc.start()
+            start = time.perf_counter()
+            for record, rating in zip(records, ratings):
+                with open(path, "a") as file:
+                    file.write(format_text_block(record.symbol, record, rating))
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"  append per stock (txt): {elapsed * 1000:8.1f} ms  peak {peak / 1024:8.0f} KiB  "
+                  f"{os.path.getsize(path) / 1024:8.0f} KiB on disk")
+
+            for extension in (".txt", ".csv", ".jsonl", ".parquet"):
+                path = os.path.join(directory, "export" + extension)
+                tracemalloc.start()
+                start = time.perf_counter()
+                try:
+                    with ExportWriter(path) as writer:
+                        for record, rating in zip(records, ratings):
+                            writer.write(record, rating)
+                except ImportError as e:
+                    tracemalloc.stop()
+                    print(f"  ExportWriter ({extension[1:]}): skipped, {e}")
+                    continue
+                elapsed = time.perf_counter() - start
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                print(f"  ExportWriter ({extension[1:]}):{' ' * (10 - len(extension))}{elapsed * 1000:8.1f} ms  "
+                      f"peak {peak / 1024:8.0f} KiB  {os.path.getsize(path) / 1024:8.0f} KiB on disk")
+
+def bench_price_store(args):
+    """
+    Compare one-year range queries on the memory-mapped price store with re-parsing stored JSON,
+    and count the upstream calls of a first load versus an incremental update.
+    """
+    server = use_mock_alpha_vantage(args.latency)
+    symbols = make_symbols(args.symbols)
+    with tempfile.TemporaryDirectory() as directory:
+        store = PriceStore(os.path.join(directory, "store"))
+        start = time.perf_counter()
+        for symbol in symbols:
+            store.update(symbol, "benchmark")
+        first_load = time.perf_counter() - start
+        first_calls = sum(server.call_counts.values())
+        start = time.perf_counter()
+        for symbol in symbols:
+            store.update(symbol, "benchmark")
+        refresh = time.perf_counter() - start
+        print(f"{len(symbols)} symbols, {store.rows(symbols[0])} daily bars each")
+        print(f"  first load:  {first_calls} calls  {first_load:6.2f} s")
+        print(f"  refresh:     {sum(server.call_counts.values()) - first_calls} calls  {refresh:6.2f} s  "
+              f"(compact requests only)")
+
+        bodies = [json.dumps(time_series_payload(symbol, "TIME_SERIES_DAILY", "full")) for symbol in symbols]
+        start = time.perf_counter()
+        for _ in range(args.passes):
+            for body in bodies:
+                bars = parse_time_series(json.loads(body))
+                dates = bars["date"]
+                bars["close"][(dates >= np.datetime64("2020-01-01")) & (dates <= np.datetime64("2020-12-31"))].mean()
+        json_query = (time.perf_counter() - start) / args.passes / len(symbols)
+
+        store = PriceStore(store.root)  # Fresh instance, so the first pass has to map the files
+        start = time.perf_counter()
+        for _ in range(args.passes):
+            for symbol in symbols:
+                store.range(symbol, "2020-01-01", "2020-12-31").close.mean()
+        store_query = (time.perf_counter() - start) / args.passes / len(symbols)
+        print(f"  1-year range query:  JSON {json_query * 1000:7.2f} ms  memmap store {store_query * 1000:7.3f} ms  "
+              f"({json_query / store_query:.0f}x)")
+    server.shutdown()
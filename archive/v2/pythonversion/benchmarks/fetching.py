@@ -0,0 +1,123 @@
+# fetching.py
+import os
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+
+import requests
+
+from stockthing.v2.pythonversion import http_client, stock_analysis
+from stockthing.v2.pythonversion.benchmarks.common import make_symbols, use_fresh_cache, use_mock_alpha_vantage
+from stockthing.v2.pythonversion.mock_server import start_mock_server
+from stockthing.v2.pythonversion.singleflight import SingleFlight
+
+def bench_fetch_many(args):
+    """
+    Compare the sequential fetch loop from main() with the concurrent fetch_many batch API.
+    """
+    server = use_mock_alpha_vantage(args.latency)
+    symbols = make_symbols(args.symbols)
+
+    # Sequential loop, as main() used to do it
+    use_fresh_cache()
+    start = time.perf_counter()
+    sequential = [stock_analysis.fetch_stock_data(symbol, "demo") for symbol in symbols]
+    sequential_time = time.perf_counter() - start
+
+    # Concurrent batch fetch
+    use_fresh_cache()
+    start = time.perf_counter()
+    concurrent = stock_analysis.fetch_many(symbols, "demo", max_concurrency=args.concurrency)
+    concurrent_time = time.perf_counter() - start
+
+    server.shutdown()
+    assert sequential == concurrent, "fetch_many returned different results than the sequential loop"
+
+    print(f"Symbols: {len(symbols)}, mock latency: {args.latency * 1000:.0f} ms, concurrency: {args.concurrency}")
+    print(f"Sequential loop: {sequential_time:.2f} s")
+    print(f"fetch_many:      {concurrent_time:.2f} s ({sequential_time / concurrent_time:.1f}x faster)")
+
+def make_self_signed_cert():
+    """
+    Create a throwaway certificate for 127.0.0.1 with the openssl CLI and return (certfile, keyfile).
+    """
+    directory = tempfile.mkdtemp(prefix="stock_bench_tls_")
+    certfile = os.path.join(directory, "cert.pem")
+    keyfile = os.path.join(directory, "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+         "-subj", "/CN=127.0.0.1", "-addext", "subjectAltName=IP:127.0.0.1",
+         "-keyout", keyfile, "-out", certfile],
+        check=True,
+        capture_output=True,
+    )
+    return certfile, keyfile
+
+def bench_http_pool(args):
+    """
+    Compare per-request latency of bare requests.get with the pooled http_client session over HTTPS.
+    """
+    certfile, keyfile = make_self_signed_cert()
+    server, url = start_mock_server(latency=args.latency, certfile=certfile, keyfile=keyfile)
+    params = {"function": "OVERVIEW", "symbol": "TSLA", "apikey": "demo"}
+
+    def measure(send):
+        timings = []
+        for _ in range(args.requests):
+            start = time.perf_counter()
+            send().raise_for_status()
+            timings.append((time.perf_counter() - start) * 1000)
+        return timings
+
+    # New TCP connection and TLS handshake on every call
+    bare = measure(lambda: requests.get(url, params=params, verify=certfile))
+    # Keep-alive connection reused from the pool
+    pooled = measure(lambda: http_client.get("alphavantage", url, params=params, verify=certfile))
+    server.shutdown()
+
+    print(f"Requests: {args.requests}, mock latency: {args.latency * 1000:.0f} ms")
+    for label, timings in (("requests.get", bare), ("http_client", pooled)):
+        print(f"{label:<13} mean {statistics.mean(timings):7.2f} ms   median {statistics.median(timings):7.2f} ms")
+
+class NoCoalescing:
+    """
+    Stand-in for SingleFlight that runs every call, to measure the uncoalesced baseline.
+    """
+
+    def do(self, key, function):
+        return function()
+
+def bench_singleflight(args):
+    """
+    Fire many simultaneous lookups of one ticker (like concurrent Flask POSTs) and count upstream calls.
+    """
+    def run(flight):
+        server = use_mock_alpha_vantage(args.latency)
+        use_fresh_cache()
+        stock_analysis.alpha_vantage_flight = flight
+        barrier = threading.Barrier(args.clients)
+
+        def client():
+            barrier.wait()
+            stock_analysis.fetch_stock_data("TSLA", "demo")
+
+        threads = [threading.Thread(target=client) for _ in range(args.clients)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        server.shutdown()
+        return sum(server.call_counts.values()), elapsed
+
+    baseline_calls, baseline_time = run(NoCoalescing())
+    flight = SingleFlight()
+    coalesced_calls, coalesced_time = run(flight)
+
+    print(f"Concurrent clients asking for TSLA: {args.clients}, mock latency: {args.latency * 1000:.0f} ms")
+    print(f"Without coalescing: {baseline_calls} upstream calls in {baseline_time:.2f} s")
+    print(f"With single-flight: {coalesced_calls} upstream calls in {coalesced_time:.2f} s")
+    print(f"Single-flight stats: {flight.stats()}")
@@ -0,0 +1,46 @@
+# history.py
+import json
+import os
+import subprocess
+import time
+
+# Where scenario results are appended (one JSON object per run) for comparing runs over time
+BENCHMARK_HISTORY_PATH = os.getenv("BENCHMARK_HISTORY_PATH", "benchmark_history.jsonl")
+
+def current_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def record_results(name, args, results, path=None):
+    """
+    Append a scenario's results to the history and print the change since the last run of the
+    same scenario with the same parameters.
+    """
+    path = path or BENCHMARK_HISTORY_PATH
+    parameters = {key: value for key, value in sorted(vars(args).items()) if key not in ("benchmark", "no_save")}
+    previous = None
+    if os.path.exists(path):
+        with open(path) as file:
+            for line in file:
+                entry = json.loads(line)
+                if entry["scenario"] == name and entry["parameters"] == parameters:
+                    previous = entry
+    entry = {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": current_commit(),
+        "scenario": name,
+        "parameters": parameters,
+        "results": results,
+    }
+    with open(path, "a") as file:
+        file.write(json.dumps(entry) + "\n")
+
+    if previous:
+        print(f"  compared with {previous['time']} ({previous['commit']}):")
+        for key, value in results.items():
+            before = previous["results"].get(key)
+            if isinstance(value, (int, float)) and isinstance(before, (int, float)) and before:
+                print(f"    {key:32s} {before:12.3f} -> {value:12.3f} ({(value - before) / before:+7.1%})")
@@ -0,0 +1,64 @@
+# import_time.py
+import os
+import statistics
+import subprocess
+import sys
+
+# Entry points checked by the import_time benchmark: module -> (import budget in ms, heavy modules it may load)
+IMPORT_TIME_BUDGETS = {
+    "stockthing.v2.pythonversion.main": (250, ()),
+    "stockthing.v2.pythonversion.maintowebsite": (500, ("flask",)),
+    "stockthing.v2.pythonversion.app": (500, ("flask",)),
+    "stockthing.Test": (150, ()),
+    "stockthing.Testalphavantage": (250, ()),
+    "stockthing.Testdashbord": (250, ()),
+}
+
+# Dependencies entry points should only import on first use
+HEAVY_MODULES = ("openai", "requests", "yfinance", "flask", "streamlit", "numpy")
+
+# Directory of the entry point scripts (main.py imports output_handler from it)
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Multiplies every import budget (e.g. 2 on a slow CI machine)
+IMPORT_TIME_BUDGET_SCALE = float(os.getenv("IMPORT_TIME_BUDGET_SCALE", "1"))
+
+def measure_import(module):
+    """
+    Import module in a fresh interpreter under -X importtime. Returns (cumulative import time in
+    seconds, heavy modules it loaded). The scripts' own directory is on sys.path, as when they are run.
+    """
+    code = (f"import sys; sys.path.insert(0, {SCRIPTS_DIR!r}); import {module}; "
+            f"print(','.join(name for name in {HEAVY_MODULES!r} if name in sys.modules))")
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True,
+                             check=True)
+    for line in process.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        _, cumulative, name = line.split("|")
+        if name.strip() == module:
+            return int(cumulative) / 1e6, [name for name in process.stdout.strip().split(",") if name]
+    raise RuntimeError(f"No import time reported for {module}")
+
+def bench_import_time(args):
+    """
+    Check the startup import time of every entry point against IMPORT_TIME_BUDGETS, and that heavy
+    dependencies are loaded lazily. Exits with status 1 when a budget is exceeded.
+    """
+    results = {}
+    failures = []
+    print(f"{'Entry point':45s} {'median ms':>9s} {'budget':>7s}  heavy modules loaded")
+    for module, (budget, allowed) in IMPORT_TIME_BUDGETS.items():
+        measure_import(module)  # Warm-up: compiles bytecode and fills the OS file cache
+        runs = [measure_import(module) for _ in range(args.repeat)]
+        median = statistics.median(seconds for seconds, _ in runs) * 1000
+        loaded = runs[-1][1]
+        budget *= IMPORT_TIME_BUDGET_SCALE
+        eager = [name for name in loaded if name not in allowed]
+        status = "ok"
+        if median > budget or eager:
+            status = "OVER BUDGET" if median > budget else "EAGER IMPORT"
+            failures.append(module)
+        print(f"{module:45s} {median:9.1f} {budget:7.0f}  {', '.join(loaded) or '-':24s} {status}")
+        results[f"{module}_ms"] = median
+    results["failures"] = failures
+    return results
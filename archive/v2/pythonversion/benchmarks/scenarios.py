@@ -0,0 +1,179 @@
+# scenarios.py
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+import openai
+
+from stockthing.v2.pythonversion import bulk_loader, http_client, llm_cache, stock_analysis, utils
+from stockthing.v2.pythonversion.benchmarks.common import (
+    latency_percentiles, make_symbols, parse_rate, use_fresh_cache, use_mock_alpha_vantage, use_stub,
+)
+from stockthing.v2.pythonversion.export import ExportWriter
+from stockthing.v2.pythonversion.output_handler import handle_output
+
+# Output file per report mode, as in main.py
+REPORT_FILES = {
+    "one": "stock_analysis.txt",
+    "csv": "stock_analysis.csv",
+    "jsonl": "stock_analysis.jsonl",
+    "parquet": "stock_analysis.parquet",
+}
+
+def bench_cli_single(args):
+    """
+    Time the single-symbol CLI path (fetch, analyze, console output) with a cold and a warm cache.
+    """
+    server = use_stub(args)
+
+    def one_run(symbol):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            stock_data = stock_analysis.fetch_stock_data(symbol, "mock")
+            if stock_data:
+                handle_output("console", symbol, stock_data, stock_analysis.analyze_stock_data(stock_data))
+        return time.perf_counter() - start, stock_data is not None
+
+    symbols = make_symbols(args.requests)
+    cold = [one_run(symbol) for symbol in symbols]
+    warm = [one_run(symbol) for symbol in symbols]
+    server.shutdown()
+
+    results = {}
+    for label, runs in (("cold", cold), ("warm", warm)):
+        percentiles = latency_percentiles([latency for latency, _ in runs])
+        failed = sum(not fetched for _, fetched in runs)
+        print(f"  {label} cache: p50 {percentiles['p50_ms']:8.2f} ms  p95 {percentiles['p95_ms']:8.2f} ms  "
+              f"p99 {percentiles['p99_ms']:8.2f} ms  failed {failed}/{len(runs)}")
+        results.update({f"{label}_{name}": value for name, value in percentiles.items()})
+        results[f"{label}_failed"] = failed
+    results["upstream_calls"] = sum(server.call_counts.values())
+    return results
+
+def bench_batch(args):
+    """
+    Time a bulk load of args.batch symbols through bulk_loader, then the same run again from cache.
+    """
+    server = use_stub(args)
+    symbols = make_symbols(args.batch)
+    directory = tempfile.mkdtemp(prefix="stock_batch_")
+    results = {}
+    for label, checkpoint_path in (("cold", "cold.json"), ("warm", "warm.json")):
+        calls = sum(server.call_counts.values())
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            checkpoint = bulk_loader.run(symbols, "mock", os.path.join(directory, checkpoint_path),
+                                         max_concurrency=args.concurrency)
+        elapsed = time.perf_counter() - start
+        calls = sum(server.call_counts.values()) - calls
+        print(f"  {label}: {len(symbols)} symbols in {elapsed:7.2f} s ({len(symbols) / elapsed:8.1f} symbols/s)  "
+              f"{len(checkpoint['failed'])} failed  {calls} upstream calls")
+        results.update({f"{label}_seconds": elapsed, f"{label}_symbols_per_second": len(symbols) / elapsed,
+                        f"{label}_failed": len(checkpoint["failed"]), f"{label}_upstream_calls": calls})
+    server.shutdown()
+    return results
+
+def bench_flask_load(args):
+    """
+    Time concurrent requests to the analysis web app (maintowebsite) against the stub.
+    """
+    # Imported here so the other scenarios don't start the web app
+    from stockthing.v2.pythonversion import load_test
+
+    upstream = load_test.use_mock_upstreams(args.latency, error_rate=args.error_rate,
+                                            rate_limit=parse_rate(args.stub_rate_limit), recordings=args.recordings)
+    if args.stub_rate_limit:
+        utils.configure_rate_limiter("alphavantage", *parse_rate(args.stub_rate_limit))
+    app_server, base_url = load_test.start_app()
+    tickers = [f"T{index:03d}" for index in range(args.tickers)]
+    latencies, errors, elapsed = load_test.run_load(base_url + "/", args.clients, args.requests, tickers)
+    load_test.report("concurrent", latencies, errors, elapsed)
+    app_server.shutdown()
+    upstream.shutdown()
+    results = {"requests_per_second": len(latencies) / elapsed, "errors": errors}
+    results.update(latency_percentiles(latencies))
+    return results
+
+def bench_report(args):
+    """
+    Time report generation for args.symbols stocks: every output mode of main.py, and the
+    search + LLM synopsis step of Test.py (cold, then from the LLM cache).
+    """
+    server = use_stub(args)
+    symbols = make_symbols(args.symbols)
+    records = [record for record in stock_analysis.fetch_many(symbols, "mock", args.concurrency) if record]
+    ratings = [stock_analysis.analyze_stock_data(record) for record in records]
+    print(f"{len(records)} stocks")
+
+    results = {}
+    directory = tempfile.mkdtemp(prefix="stock_report_")
+    cwd = os.getcwd()
+    os.chdir(directory)  # handle_output writes "multiple" reports to the working directory
+    try:
+        for mode in ("console", "multiple", "one", "csv", "jsonl", "parquet"):
+            start = time.perf_counter()
+            try:
+                writer = ExportWriter(REPORT_FILES[mode]) if mode in REPORT_FILES else None
+                with contextlib.redirect_stdout(io.StringIO()):
+                    for record, rating in zip(records, ratings):
+                        handle_output(mode, record.symbol, record, rating, export_writer=writer)
+                if writer:
+                    writer.close()
+            except ImportError as e:
+                print(f"  {mode:9s} skipped, {e}")
+                continue
+            elapsed = time.perf_counter() - start
+            print(f"  {mode:9s} {elapsed * 1000:8.1f} ms")
+            results[f"{mode}_ms"] = elapsed * 1000
+    finally:
+        os.chdir(cwd)
+
+    def synopsis(record):
+        start = time.perf_counter()
+        search = http_client.get("google_cse", server.search_url,
+                                 params={"key": "mock", "cx": "mock", "q": f"{record.symbol} company profile"}).json()
+        snippet = search["items"][0]["snippet"] if search.get("items") else "N/A"
+        llm_cache.cached_completion(
+            openai.ChatCompletion.create,
+            model="gpt-4",
+            messages=[
+                {"role": "system", "content": "You are a highly skilled financial analyst."},
+                {"role": "user", "content": f"Summarize the company '{record.long_name}'. Additional context: {snippet}."},
+            ],
+            max_tokens=200,
+            temperature=0.7,
+        )
+        return time.perf_counter() - start
+
+    for label in ("cold", "warm"):
+        percentiles = latency_percentiles([synopsis(record) for record in records])
+        print(f"  synopsis ({label} LLM cache): p50 {percentiles['p50_ms']:8.2f} ms  p95 {percentiles['p95_ms']:8.2f} ms")
+        results.update({f"synopsis_{label}_{name}": value for name, value in percentiles.items()})
+    server.shutdown()
+    return results
+
+def bench_rate_limit(args):
+    """
+    Check that the client rate limiter keeps a run within the stub's quota (scaled down in time by
+    args.time_scale), compared with running without it.
+    """
+    calls, period = parse_rate(args.stub_rate_limit or "5/60")
+    period /= args.time_scale
+    symbols = make_symbols(10)
+    results = {}
+    for label, client_quota in (("limited", (calls, period)), ("unlimited", (10 ** 9, 1))):
+        server = use_mock_alpha_vantage(args.latency, error_rate=args.error_rate, rate_limit=(calls, period))
+        use_fresh_cache()
+        utils.configure_rate_limiter("alphavantage", *client_quota)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            fetched = sum(record is not None for record in stock_analysis.fetch_many(symbols, "mock", args.concurrency))
+        elapsed = time.perf_counter() - start
+        rejected = server.call_counts.get("rate_limited", 0)
+        server.shutdown()
+        print(f"  {label:9s}: {fetched}/{len(symbols)} fetched in {elapsed:6.2f} s, "
+              f"{rejected} requests rejected by the {calls:g}/{period:g}s quota")
+        results.update({f"{label}_seconds": elapsed, f"{label}_fetched": fetched, f"{label}_rejected": rejected})
+    return results
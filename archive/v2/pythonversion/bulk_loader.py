@@ -0,0 +1,245 @@
+# bulk_loader.py
+import argparse
+import csv
+import io
+import json
+import os
+import time
+from datetime import datetime
+
+from dotenv import load_dotenv, find_dotenv
+
+from stockthing.v2.pythonversion import error_log, http_client, stock_analysis
+from stockthing.v2.pythonversion.cache import fundamentals_cache
+from stockthing.v2.pythonversion.export import ExportWriter
+from stockthing.v2.pythonversion.utils import PRIORITY_BATCH, get_rate_limiter, log_error, rate_limit_check
+
+# Alpha Vantage functions fetched for every symbol in the universe
+FUNCTIONS = ("OVERVIEW", "EARNINGS")
+
+# Where progress is saved so an interrupted run can resume
+DEFAULT_CHECKPOINT = "bulk_checkpoint.json"
+
+# Save the checkpoint and print progress after this many symbols
+DEFAULT_CHECKPOINT_EVERY = 25
+
+def load_universe_file(path):
+    """
+    Read symbols from a text file (one per line) or a CSV file with a "symbol" column.
+    """
+    with open(path, newline="") as file:
+        text = file.read()
+    first_line = text.split("\n", 1)[0]
+    if "," in first_line and "symbol" in first_line.lower():
+        rows = csv.DictReader(io.StringIO(text))
+        column = next(name for name in rows.fieldnames if name.strip().lower() == "symbol")
+        symbols = [row[column] for row in rows]
+    else:
+        symbols = text.splitlines()
+    return unique_symbols(symbols)
+
+def unique_symbols(symbols):
+    """
+    Normalize symbols to upper case and drop blanks and duplicates, keeping the original order.
+    """
+    return list(dict.fromkeys(symbol.strip().upper() for symbol in symbols if symbol.strip()))
+
+def fetch_listing_status(api_key, exchanges=None, asset_type="Stock"):
+    """
+    Return the symbols of active listings from Alpha Vantage's LISTING_STATUS CSV.
+
+    The listing is cached like any other response, so reruns on the same day cost no API call.
+    """
+    def fetch():
+        params = {"function": "LISTING_STATUS", "apikey": api_key}
+        if not http_client.is_replayed(stock_analysis.ALPHA_VANTAGE_URL, params):
+            rate_limit_check(priority=PRIORITY_BATCH)
+        response = http_client.get("alphavantage", stock_analysis.ALPHA_VANTAGE_URL, params=params)
+        return list(csv.DictReader(io.StringIO(response.text)))
+
+    listings = fundamentals_cache.get_or_fetch(
+        "alphavantage", "LISTING_STATUS", "*", fetch, is_valid=lambda rows: bool(rows) and "symbol" in rows[0]
+    )
+    if not listings or "symbol" not in listings[0]:
+        raise ValueError(f"Unexpected LISTING_STATUS response: {listings[:1]}")
+
+    exchanges = {exchange.upper() for exchange in exchanges} if exchanges else None
+    return unique_symbols(
+        row["symbol"]
+        for row in listings
+        if row.get("status", "Active") == "Active"
+        and (asset_type is None or row.get("assetType") == asset_type)
+        and (exchanges is None or row.get("exchange", "").upper() in exchanges)
+    )
+
+def load_checkpoint(path):
+    """
+    Return the saved progress ({"completed": [...], "failed": [...]}), or empty progress if there is none.
+    """
+    if not os.path.exists(path):
+        return {"completed": [], "failed": []}
+    with open(path) as file:
+        return json.load(file)
+
+def save_checkpoint(path, checkpoint):
+    """
+    Write the checkpoint atomically, so a crash mid-write never leaves a corrupt file.
+    """
+    checkpoint["updated_at"] = datetime.now().isoformat(timespec="seconds")
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w") as file:
+        json.dump(checkpoint, file)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, path)
+
+def pending_symbols(symbols, checkpoint, retry_failed=False):
+    """
+    Return the symbols a run still has to fetch, in universe order.
+    """
+    done = set(checkpoint["completed"])
+    if not retry_failed:
+        done.update(checkpoint["failed"])
+    return [symbol for symbol in symbols if symbol not in done]
+
+def plan_requests(symbols):
+    """
+    Count the upstream calls a run needs: every function the refresh planner cannot serve from the cache.
+    """
+    return sum(
+        stock_analysis.refresh_planner.needs_fetch(function, symbol)
+        for symbol in symbols
+        for function in FUNCTIONS
+    )
+
+def format_duration(seconds):
+    """
+    Format a duration in seconds as e.g. "2h 05m" or "3m 20s".
+    """
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h {seconds % 3600 // 60:02d}m"
+    return f"{seconds // 60}m {seconds % 60:02d}s"
+
+def estimate_seconds(calls):
+    """
+    Return the minimum time the shared Alpha Vantage rate limiter needs to allow this many calls.
+    """
+    limiter = get_rate_limiter("alphavantage")
+    return max(0.0, calls - limiter.available()) / limiter.rate
+
+def run(symbols, api_key, checkpoint_path=DEFAULT_CHECKPOINT, checkpoint_every=DEFAULT_CHECKPOINT_EVERY,
+        max_concurrency=stock_analysis.DEFAULT_MAX_CONCURRENCY, retry_failed=False):
+    """
+    Fetch OVERVIEW and EARNINGS for every symbol, skipping symbols finished by an earlier run.
+
+    Progress is checkpointed every checkpoint_every symbols and on interruption. Requests use the
+    batch lane of the rate limiter, so interactive lookups running at the same time go first.
+    Returns the checkpoint.
+    """
+    checkpoint = load_checkpoint(checkpoint_path)
+    pending = pending_symbols(symbols, checkpoint, retry_failed)
+    if retry_failed:
+        checkpoint["failed"] = []
+
+    calls = plan_requests(pending)
+    print(f"Universe: {len(symbols)} symbols, {len(symbols) - len(pending)} already done, {len(pending)} to fetch.")
+    print(f"Plan: {calls} API calls ({len(pending) * len(FUNCTIONS) - calls} served from cache), "
+          f"ETA {format_duration(estimate_seconds(calls))} at the current rate limit.")
+    if not pending:
+        return checkpoint
+
+    start = time.monotonic()
+    done = 0
+    try:
+        for _, symbol, stock_data in stock_analysis.iter_fetch_many(
+            pending, api_key, max_concurrency, priority=PRIORITY_BATCH
+        ):
+            checkpoint["completed" if stock_data else "failed"].append(symbol)
+            done += 1
+            if done % checkpoint_every == 0 or done == len(pending):
+                save_checkpoint(checkpoint_path, checkpoint)
+                report_progress(done, len(pending), len(checkpoint["failed"]), calls, time.monotonic() - start)
+    except KeyboardInterrupt:
+        print("\nInterrupted. Saving progress; rerun the same command to resume.")
+        raise
+    finally:
+        save_checkpoint(checkpoint_path, checkpoint)
+    return checkpoint
+
+def report_progress(done, total, failed, calls, elapsed):
+    """
+    Print progress and an ETA based on both the observed pace and the remaining rate budget.
+    """
+    remaining = total - done
+    observed = elapsed / done * remaining
+    budget = estimate_seconds(calls * remaining / total)
+    print(f"Progress: {done}/{total} symbols ({done / total:.1%}), {failed} failed, "
+          f"elapsed {format_duration(elapsed)}, ETA {format_duration(max(observed, budget))}.")
+
+def export_from_cache(symbols, path):
+    """
+    Write every symbol that has cached data to an export file, without making API calls.
+    """
+    written = 0
+    with ExportWriter(path) as writer:
+        for symbol in symbols:
+            overview_data = fundamentals_cache.get("alphavantage", "OVERVIEW", symbol, allow_stale=True)
+            earnings_data = fundamentals_cache.get("alphavantage", "EARNINGS", symbol, allow_stale=True)
+            if overview_data is None or earnings_data is None:
+                continue
+            try:
+                stock_analysis.check_overview(symbol, overview_data)
+                stock_data = stock_analysis.build_stock_info(symbol, overview_data, earnings_data)
+            except ValueError as e:
+                log_error(f"Error exporting {symbol}: {e}", error=e, symbol=symbol)
+                continue
+            writer.write(stock_data, stock_analysis.analyze_stock_data(stock_data))
+            written += 1
+    print(f"Exported {written} stocks to {path}.")
+
+def main():
+    parser = argparse.ArgumentParser(description="Fetch fundamentals for a whole universe of symbols.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--universe", help="File with one symbol per line, or a CSV with a symbol column.")
+    source.add_argument("--listing", action="store_true", help="Use Alpha Vantage's LISTING_STATUS (all active US listings).")
+    parser.add_argument("--exchange", nargs="+", help="Only keep listings on these exchanges (e.g. NYSE NASDAQ).")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT, help="Progress file used to resume interrupted runs.")
+    parser.add_argument("--checkpoint-every", type=int, default=DEFAULT_CHECKPOINT_EVERY,
+                        help="Save progress after this many symbols.")
+    parser.add_argument("--concurrency", type=int, default=stock_analysis.DEFAULT_MAX_CONCURRENCY,
+                        help="Maximum number of concurrent upstream requests.")
+    parser.add_argument("--retry-failed", action="store_true", help="Retry symbols that failed in earlier runs.")
+    parser.add_argument("--plan", action="store_true", help="Only print the request plan and ETA.")
+    parser.add_argument("--output", help="Export the loaded universe to a .csv, .jsonl or .parquet file.")
+    args = parser.parse_args()
+
+    dotenv_path = find_dotenv("api.env")
+    if dotenv_path:
+        load_dotenv(dotenv_path)
+    api_key = os.getenv("ALPHA_VANTAGE_API_KEY", "").strip()
+
+    if args.listing:
+        symbols = fetch_listing_status(api_key, args.exchange)
+    else:
+        symbols = load_universe_file(args.universe)
+
+    if args.plan:
+        pending = pending_symbols(symbols, load_checkpoint(args.checkpoint), args.retry_failed)
+        calls = plan_requests(pending)
+        print(f"{len(pending)} of {len(symbols)} symbols to fetch, {calls} API calls, "
+              f"ETA {format_duration(estimate_seconds(calls))} at the current rate limit.")
+        return
+
+    try:
+        checkpoint = run(symbols, api_key, args.checkpoint, args.checkpoint_every, args.concurrency, args.retry_failed)
+    except KeyboardInterrupt:
+        return
+    print(f"Done: {len(checkpoint['completed'])} loaded, {len(checkpoint['failed'])} failed "
+          f"(see {error_log.ERROR_LOG_PATH}).")
+    print(f"Calls saved by the refresh planner: {stock_analysis.refresh_planner.stats()['total_saved_calls']}.")
+    if args.output:
+        export_from_cache(checkpoint["completed"], args.output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+# cache.py
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from stockthing.v2.pythonversion import metrics
+
+# Location of the on-disk cache (shared by the CLI and the Flask app)
+CACHE_PATH = os.getenv("STOCK_CACHE_PATH", "stock_cache.sqlite3")
+
+# How long each Alpha Vantage endpoint stays fresh, in seconds
+ENDPOINT_TTLS = {
+    "OVERVIEW": 24 * 60 * 60,  # Company overview changes at most daily
+    "EARNINGS": 7 * 24 * 60 * 60,  # Earnings only change after a quarterly report
+}
+DEFAULT_TTL = 24 * 60 * 60
+
+# Least recently used entries are evicted beyond this many rows
+MAX_ENTRIES = int(os.getenv("STOCK_CACHE_MAX_ENTRIES", "10000"))
+
+# When offline, lookups are served from the cache only and never go upstream
+offline = os.getenv("STOCK_OFFLINE", "").strip().lower() in ("1", "true", "yes")
+
+# Providers offline mode applies to. Completions in the LLM cache (provider "openai") are keyed
+# by the whole prompt and are rarely all cached, so they still go upstream when offline.
+OFFLINE_PROVIDERS = frozenset(["alphavantage"])
+
+class CacheMiss(Exception):
+    """
+    Raised in offline mode when an entry is not in the cache.
+    """
+
+def set_offline(enabled):
+    """
+    Turn offline (cache-only) mode on or off.
+    """
+    global offline
+    offline = enabled
+
+def is_offline(provider):
+    """
+    Return True when lookups for provider must be served from the cache only.
+    """
+    return offline and provider in OFFLINE_PROVIDERS
+
+class FundamentalsCache:
+    """
+    Read-through cache of upstream API responses keyed by (provider, function, symbol).
+
+    Entries live in SQLite, so writes are atomic and several processes (CLI runs, Flask workers)
+    can share one cache file. Counters are per process.
+    """
+
+    def __init__(self, path=CACHE_PATH, max_entries=MAX_ENTRIES, ttls=None, default_ttl=DEFAULT_TTL):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttls = ENDPOINT_TTLS if ttls is None else ttls
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._local = threading.local()  # One connection per thread
+        self._stats_lock = threading.Lock()
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            # WAL lets readers in other processes continue while one process writes
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "provider TEXT, function TEXT, symbol TEXT, payload TEXT, "
+                "fetched_at REAL, accessed_at REAL, "
+                "PRIMARY KEY (provider, function, symbol))"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)")
+            connection.commit()
+            self._local.connection = connection
+        return connection
+
+    def _count(self, counter):
+        with self._stats_lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def get(self, provider, function, symbol, allow_stale=False, max_age=None):
+        """
+        Return the cached payload, or None if it is missing or older than the endpoint's TTL.
+
+        max_age (seconds) replaces the endpoint's TTL for this lookup.
+        """
+        connection = self._connection()
+        row = connection.execute(
+            "SELECT payload, fetched_at FROM entries WHERE provider = ? AND function = ? AND symbol = ?",
+            (provider, function, symbol),
+        ).fetchone()
+        now = time.time()
+        if max_age is None:
+            max_age = self.ttls.get(function, self.default_ttl)
+        if row is None or (not allow_stale and now - row[1] > max_age):
+            self._count("misses")
+            return None
+
+        # Record the access for LRU eviction
+        with connection:
+            connection.execute(
+                "UPDATE entries SET accessed_at = ? WHERE provider = ? AND function = ? AND symbol = ?",
+                (now, provider, function, symbol),
+            )
+        self._count("hits")
+        return json.loads(row[0])
+
+    def age(self, provider, function, symbol):
+        """
+        Return how many seconds ago an entry was fetched, or None if it is not cached.
+
+        Does not count a hit or miss or touch the entry's LRU position.
+        """
+        row = self._connection().execute(
+            "SELECT fetched_at FROM entries WHERE provider = ? AND function = ? AND symbol = ?",
+            (provider, function, symbol),
+        ).fetchone()
+        return None if row is None else time.time() - row[0]
+
+    def is_fresh(self, provider, function, symbol, max_age=None):
+        """
+        Return True if a fresh entry exists, without counting a hit or miss or touching its LRU position.
+        """
+        age = self.age(provider, function, symbol)
+        if max_age is None:
+            max_age = self.ttls.get(function, self.default_ttl)
+        return age is not None and age <= max_age
+
+    def set(self, provider, function, symbol, payload):
+        """
+        Store a payload and evict the least recently used entries if the cache is over its size limit.
+        """
+        connection = self._connection()
+        now = time.time()
+        # Insert and eviction happen in one transaction
+        with connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                (provider, function, symbol, json.dumps(payload), now, now),
+            )
+            excess = connection.execute("SELECT COUNT(*) FROM entries").fetchone()[0] - self.max_entries
+            if excess > 0:
+                connection.execute(
+                    "DELETE FROM entries WHERE rowid IN "
+                    "(SELECT rowid FROM entries ORDER BY accessed_at ASC LIMIT ?)",
+                    (excess,),
+                )
+                with self._stats_lock:
+                    self.evictions += excess
+
+    def get_or_fetch(self, provider, function, symbol, fetch, is_valid=None, max_age=None):
+        """
+        Return the cached payload or call fetch() and cache its result.
+
+        Results rejected by is_valid (e.g. error or rate-limit responses) are returned but not cached.
+        max_age (seconds) replaces the endpoint's TTL for this lookup. In offline mode, for the
+        OFFLINE_PROVIDERS, stale entries are served and a missing entry raises CacheMiss.
+        """
+        cache_only = is_offline(provider)
+        payload = self.get(provider, function, symbol, allow_stale=cache_only, max_age=max_age)
+        if payload is not None:
+            return payload
+        if cache_only:
+            raise CacheMiss(f"{provider} {function} for {symbol} is not cached (offline mode).")
+
+        payload = fetch()
+        if is_valid is None or is_valid(payload):
+            self.set(provider, function, symbol, payload)
+        return payload
+
+    async def get_or_fetch_async(self, provider, function, symbol, fetch, is_valid=None, max_age=None):
+        """
+        get_or_fetch for async callers: fetch is a coroutine function. The lookup itself is a local
+        SQLite read and runs inline.
+        """
+        cache_only = is_offline(provider)
+        payload = self.get(provider, function, symbol, allow_stale=cache_only, max_age=max_age)
+        if payload is not None:
+            return payload
+        if cache_only:
+            raise CacheMiss(f"{provider} {function} for {symbol} is not cached (offline mode).")
+
+        payload = await fetch()
+        if is_valid is None or is_valid(payload):
+            self.set(provider, function, symbol, payload)
+        return payload
+
+    def stats(self):
+        """
+        Return hit/miss/eviction counters for this process.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+# Shared cache instance
+fundamentals_cache = FundamentalsCache()
+metrics.register_stats("fundamentals_cache", lambda: fundamentals_cache.stats())
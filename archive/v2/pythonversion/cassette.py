@@ -0,0 +1,334 @@
+# cassette.py
+import argparse
+import atexit
+import gzip
+import hashlib
+import json
+import os
+import threading
+import zlib
+from datetime import timedelta
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from stockthing.v2.pythonversion import metrics
+
+# Record/replay mode for every upstream request made through http_client:
+#   "record": go upstream and save each response, "replay": answer from the cassette only (no network),
+#   "auto": replay what was recorded and record the rest, anything else: off
+HTTP_CASSETTE = os.getenv("HTTP_CASSETTE", "").strip().lower()
+
+# Directory holding the cassette (interactions.gz and index.json)
+HTTP_CASSETTE_DIR = os.getenv("HTTP_CASSETTE_DIR", "cassettes")
+
+MODES = ("record", "replay", "auto")
+
+# Query parameters holding credentials; they are neither part of the lookup key nor stored
+SECRET_PARAMS = frozenset(["apikey", "api_key", "key"])
+
+# Final responses with these statuses are passed through but never recorded
+UNRECORDED_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+# Response headers that describe the wire encoding rather than the (stored, decoded) body
+DROPPED_HEADERS = frozenset(["content-encoding", "content-length", "transfer-encoding", "connection", "set-cookie"])
+
+class CassetteMiss(requests.exceptions.ConnectionError):
+    """
+    Raised in replay mode for a request that is not in the cassette.
+
+    A ConnectionError, so callers handle it like the upstream being unreachable.
+    """
+
+def redact_url(url):
+    """
+    Return the URL with credential parameters removed and the rest of the query sorted.
+    """
+    parts = urlsplit(url)
+    params = sorted((name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+                    if name.lower() not in SECRET_PARAMS)
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(params), ""))
+
+def request_key(method, url, body=None):
+    """
+    Return the lookup key of a request: method, redacted URL with normalized parameters, and a
+    digest of the body (JSON bodies are normalized first, so key order does not matter).
+    """
+    key = f"{method.upper()} {redact_url(url)}"
+    if body:
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        try:
+            body = json.dumps(json.loads(body), sort_keys=True, separators=(",", ":")).encode("utf-8")
+        except ValueError:
+            pass
+        key += " " + hashlib.sha256(body).hexdigest()[:16]
+    return key
+
+class Cassette:
+    """
+    Recorded upstream responses with an index for O(1) lookup.
+
+    Every interaction is one gzip member appended to interactions.gz (so `zcat` shows them all as
+    JSON lines); index.json maps each request key to the offset and length of its latest member.
+    Re-recording a request leaves the old member behind as garbage until compact() rewrites the file.
+    Recording only updates the index in memory; flush() writes it (once, at exit, for the shared
+    cassette). Members carry their key, so a missing index is rebuilt from the data and members
+    appended after the last flush are indexed on load.
+    """
+
+    def __init__(self, directory=HTTP_CASSETTE_DIR):
+        self.directory = directory
+        self.data_path = os.path.join(directory, "interactions.gz")
+        self.index_path = os.path.join(directory, "index.json")
+        self.index = {}  # Request key -> {"offset", "length", "url"}
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as file:
+                self.index = json.load(file)
+        elif os.path.exists(self.data_path):
+            self.index = self.rebuild_index()
+        self._dirty = False
+        self._catch_up()
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Return the recorded interaction for key, or None.
+        """
+        with self._lock:
+            location = self.index.get(key)
+            if location is None:
+                self.misses += 1
+                return None
+            with open(self.data_path, "rb") as file:
+                file.seek(location["offset"])
+                member = file.read(location["length"])
+            self.hits += 1
+        return json.loads(gzip.decompress(member))
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self.index
+
+    def record(self, key, interaction):
+        """
+        Append an interaction and point key at it.
+        """
+        member = gzip.compress((json.dumps(interaction) + "\n").encode("utf-8"))
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self.data_path, "ab") as file:
+                offset = file.seek(0, os.SEEK_END)
+                file.write(member)
+            self.index[key] = {"offset": offset, "length": len(member), "url": interaction["url"]}
+            self._dirty = True
+            self.recorded += 1
+
+    def flush(self):
+        """
+        Write the index if anything was recorded since it was last written.
+        """
+        with self._lock:
+            if self._dirty:
+                self._save_index(self.index)
+                self._dirty = False
+
+    def rebuild_index(self):
+        """
+        Scan interactions.gz member by member and return the index of the latest member per key.
+        """
+        index = self._scan(0)
+        self._save_index(index)
+        return index
+
+    def _catch_up(self):
+        # Index members recorded after the index was last written (e.g. the process was killed)
+        end = max((location["offset"] + location["length"] for location in self.index.values()), default=0)
+        if os.path.exists(self.data_path) and os.path.getsize(self.data_path) > end:
+            self.index.update(self._scan(end))
+            self._dirty = True
+
+    def _scan(self, offset):
+        # Index of the members from offset to the end of interactions.gz, latest member per key
+        index = {}
+        with open(self.data_path, "rb") as file:
+            file.seek(offset)
+            data = file.read()
+        position = 0
+        while position < len(data):
+            decompressor = zlib.decompressobj(wbits=31)  # One gzip member
+            interaction = json.loads(decompressor.decompress(data[position:]))
+            length = len(data) - position - len(decompressor.unused_data)
+            index[interaction["key"]] = {"offset": offset + position, "length": length, "url": interaction["url"]}
+            position += length
+        return index
+
+    def _save_index(self, index):
+        temp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(temp_path, "w") as file:
+            json.dump(index, file)
+        os.replace(temp_path, self.index_path)
+
+    def compact(self):
+        """
+        Rewrite interactions.gz with only the members the index points at. Returns the bytes reclaimed.
+        """
+        with self._lock:
+            if not os.path.exists(self.data_path):
+                return 0
+            before = os.path.getsize(self.data_path)
+            temp_path = f"{self.data_path}.{os.getpid()}.tmp"
+            index = {}
+            with open(self.data_path, "rb") as source, open(temp_path, "wb") as target:
+                for key, location in sorted(self.index.items(), key=lambda item: item[1]["offset"]):
+                    source.seek(location["offset"])
+                    index[key] = dict(location, offset=target.tell())
+                    target.write(source.read(location["length"]))
+            # Without an index the next load rebuilds it, so a crash between the two writes is harmless
+            if os.path.exists(self.index_path):
+                os.remove(self.index_path)
+            os.replace(temp_path, self.data_path)
+            self._save_index(index)
+            self.index = index
+            self._dirty = False
+            return before - os.path.getsize(self.data_path)
+
+    def stats(self):
+        """
+        Return lookup counters, the number of interactions and the share of the file that is garbage.
+        """
+        with self._lock:
+            size = os.path.getsize(self.data_path) if os.path.exists(self.data_path) else 0
+            live = sum(location["length"] for location in self.index.values())
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "recorded": self.recorded,
+                "interactions": len(self.index),
+                "bytes": size,
+                "garbage_ratio": (size - live) / size if size else 0.0,
+            }
+
+class CassetteAdapter(BaseAdapter):
+    """
+    Transport adapter answering requests from a cassette and/or recording what the wrapped adapter returns.
+
+    Sits where the pooled HTTPAdapter would be mounted, so retries, timeouts and connection pooling
+    still apply to recorded requests, and replayed ones never open a connection.
+    """
+
+    def __init__(self, adapter, cassette, mode):
+        super().__init__()
+        self.adapter = adapter
+        self.cassette = cassette
+        self.mode = mode
+
+    def send(self, request, **kwargs):
+        key = request_key(request.method, request.url, request.body)
+        if self.mode in ("replay", "auto"):
+            interaction = self.cassette.get(key)
+            if interaction is not None:
+                metrics.increment("cassette_lookups_total", result="hit")
+                return build_response(request, interaction)
+            metrics.increment("cassette_lookups_total", result="miss")
+            if self.mode == "replay":
+                raise CassetteMiss(f"No recorded response for {key} in {self.cassette.directory} "
+                                   "(record it with HTTP_CASSETTE=record or auto)", request=request)
+
+        response = self.adapter.send(request, **kwargs)
+        if response.status_code not in UNRECORDED_STATUSES:
+            self.cassette.record(key, {
+                "key": key,
+                "method": request.method,
+                "url": redact_url(request.url),
+                "status": response.status_code,
+                "reason": response.reason,
+                "headers": {name: value for name, value in response.headers.items()
+                            if name.lower() not in DROPPED_HEADERS},
+                # Reading content here consumes the stream; requests serves it from _content afterwards
+                "body": response.content.decode("latin-1"),
+            })
+        return response
+
+    def close(self):
+        self.cassette.flush()
+        self.adapter.close()
+
+def build_response(request, interaction):
+    """
+    Turn a recorded interaction back into a requests Response for request.
+    """
+    response = requests.Response()
+    response.status_code = interaction["status"]
+    response.reason = interaction["reason"]
+    response.headers = CaseInsensitiveDict(interaction["headers"])
+    response.encoding = get_encoding_from_headers(response.headers)
+    response._content = interaction["body"].encode("latin-1")
+    response.url = request.url
+    response.request = request
+    response.elapsed = timedelta(0)
+    return response
+
+# Created on first use by get_cassette()
+_cassette = None
+_cassette_lock = threading.Lock()
+
+def get_cassette():
+    """
+    Return the shared cassette in HTTP_CASSETTE_DIR.
+    """
+    global _cassette
+    with _cassette_lock:
+        if _cassette is None:
+            _cassette = Cassette()
+            metrics.register_stats("cassette", _cassette.stats)
+            atexit.register(_cassette.flush)
+        return _cassette
+
+def wrap_adapter(adapter):
+    """
+    Return adapter wrapped for the HTTP_CASSETTE mode, or unchanged when the mode is off.
+    """
+    if HTTP_CASSETTE not in MODES:
+        return adapter
+    return CassetteAdapter(adapter, get_cassette(), HTTP_CASSETTE)
+
+def replays(method, url, params=None):
+    """
+    Return True when a request will be answered from the cassette without going upstream (always in
+    replay mode, where a miss raises CassetteMiss; in auto mode only if it was recorded).
+    """
+    if HTTP_CASSETTE == "replay":
+        return True
+    if HTTP_CASSETTE != "auto":
+        return False
+    prepared = requests.Request(method, url, params=params).prepare()
+    return request_key(prepared.method, prepared.url, prepared.body) in get_cassette()
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or compact a recorded HTTP cassette.")
+    parser.add_argument("command", choices=["list", "stats", "compact", "reindex"])
+    parser.add_argument("--dir", default=HTTP_CASSETTE_DIR, help="Cassette directory.")
+    args = parser.parse_args()
+
+    cassette = Cassette(args.dir)
+    if args.command == "list":
+        for key in sorted(cassette.index):
+            print(key)
+    elif args.command == "stats":
+        print(json.dumps(cassette.stats(), indent=2))
+    elif args.command == "reindex":
+        cassette.index = cassette.rebuild_index()
+        print(f"Indexed {len(cassette.index)} interactions.")
+    else:
+        print(f"Reclaimed {cassette.compact()} bytes; {len(cassette.index)} interactions kept.")
+    cassette.flush()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+# error_log.py
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+
+# JSON Lines error log, rotated by size
+ERROR_LOG_PATH = os.getenv("ERROR_LOG_PATH", "error_log.jsonl")
+ERROR_LOG_MAX_BYTES = int(os.getenv("ERROR_LOG_MAX_BYTES", str(10 * 2 ** 20)))
+ERROR_LOG_BACKUPS = int(os.getenv("ERROR_LOG_BACKUPS", "5"))
+
+# Repeated errors (same logger, error class, endpoint and status) are written in full this many
+# times per window, then only one in ERROR_LOG_SAMPLE_RATE is written for the rest of the window
+ERROR_LOG_SAMPLE_BURST = int(os.getenv("ERROR_LOG_SAMPLE_BURST", "10"))
+ERROR_LOG_SAMPLE_RATE = int(os.getenv("ERROR_LOG_SAMPLE_RATE", "100"))
+ERROR_LOG_SAMPLE_WINDOW = float(os.getenv("ERROR_LOG_SAMPLE_WINDOW", "60"))
+
+# Structured fields every record may carry (None when unknown)
+RECORD_FIELDS = ("symbol", "endpoint", "latency", "status", "error_class")
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats a record as one JSON object per line.
+    """
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["traceback"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class SamplingFilter(logging.Filter):
+    """
+    Lets the first `burst` records of each kind through per window, then one in `rate`.
+
+    A record let through after others were dropped carries "suppressed": the number dropped since
+    the previous one of its kind, so counts can still be reconstructed from the log.
+    """
+
+    def __init__(self, burst=ERROR_LOG_SAMPLE_BURST, rate=ERROR_LOG_SAMPLE_RATE, window=ERROR_LOG_SAMPLE_WINDOW,
+                 clock=time.monotonic):
+        super().__init__()
+        self.burst = burst
+        self.rate = rate
+        self.window = window
+        self.clock = clock
+        self.kinds = {}  # Kind -> [window start, records seen in window, dropped since last written]
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        fields = getattr(record, "fields", {})
+        kind = (record.name, fields.get("error_class"), fields.get("endpoint"), fields.get("status"))
+        now = self.clock()
+        with self._lock:
+            state = self.kinds.get(kind)
+            if state is None or now - state[0] >= self.window:
+                dropped = state[2] if state else 0
+                state = self.kinds[kind] = [now, 0, dropped]
+            state[1] += 1
+            if state[1] > self.burst and (state[1] - self.burst) % self.rate:
+                state[2] += 1
+                return False
+            if state[2]:
+                record.fields = dict(fields, suppressed=state[2])
+                state[2] = 0
+            return True
+
+# Started on first use by get_logger()
+_logger = None
+_listener = None
+_logger_lock = threading.Lock()
+
+def get_logger():
+    """
+    Return the shared error logger.
+
+    Callers only put records on an in-memory queue; one background thread formats them and appends
+    them to ERROR_LOG_PATH, so logging never blocks on file I/O. The queue is flushed at exit.
+    """
+    global _logger, _listener
+    with _logger_lock:
+        if _logger is None:
+            file_handler = logging.handlers.RotatingFileHandler(
+                ERROR_LOG_PATH, maxBytes=ERROR_LOG_MAX_BYTES, backupCount=ERROR_LOG_BACKUPS, encoding="utf-8"
+            )
+            file_handler.setFormatter(JsonFormatter())
+            records = queue.SimpleQueue()
+            _listener = logging.handlers.QueueListener(records, file_handler)
+            _listener.start()
+            atexit.register(shutdown)
+
+            queue_handler = logging.handlers.QueueHandler(records)
+            queue_handler.addFilter(SamplingFilter())
+            logger = logging.getLogger("stockthing.errors")
+            logger.setLevel(logging.INFO)
+            logger.addHandler(queue_handler)
+            logger.propagate = False
+            _logger = logger
+        return _logger
+
+def shutdown():
+    """
+    Write out queued records and stop the background thread.
+    """
+    global _listener
+    with _logger_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+def error_fields(error):
+    """
+    Return the structured fields that can be read off an exception (class and HTTP status).
+    """
+    fields = {"error_class": type(error).__name__}
+    response = getattr(error, "response", None)
+    if getattr(response, "status_code", None) is not None:
+        fields["status"] = response.status_code
+    return fields
+
+def log(level, message, error=None, **fields):
+    """
+    Queue a structured record. fields are usually symbol, endpoint, latency (seconds) and status;
+    error is the exception being reported, if any.
+    """
+    record_fields = {name: None for name in RECORD_FIELDS}
+    if error is not None:
+        record_fields.update(error_fields(error))
+    record_fields.update(fields)
+    get_logger().log(level, message, extra={"fields": record_fields})
@@ -0,0 +1,178 @@
+# export.py
+import csv
+import json
+import math
+import os
+import shutil
+import tempfile
+
+from stockthing.v2.pythonversion.records import NUMERIC_FIELDS, StockRecord, format_value, parse_float
+
+# Columns written for every analysed stock
+EXPORT_FIELDS = StockRecord._fields + ("rating",)
+CSV_HEADER = [
+    "Symbol", "Long Name", "Sector", "Industry", "Market Cap", "P/E Ratio",
+    "Dividend Yield", "Current Price", "Recent Quarter", "Rating",
+]
+
+# File extension for each supported format
+FORMAT_EXTENSIONS = {".csv": "csv", ".jsonl": "jsonl", ".parquet": "parquet", ".txt": "txt"}
+
+# Rows kept in memory before they are written out
+DEFAULT_BATCH_SIZE = 1000
+
+def format_text_block(symbol, stock_data, rating):
+    """
+    Return the plain-text analysis block used by the "one" output mode.
+    """
+    lines = [f"=== Analysis for {symbol} ===", "=== Stock Information ==="]
+    for key, value in stock_data.items():
+        lines.append(f"{key.capitalize()}: {value}")
+    lines.append("\n=== Rating ===")
+    lines.append(f"The rating for {symbol} is: {rating}\n\n")
+    return "\n".join(lines)
+
+def typed_value(field, value):
+    """
+    Return a JSON/Parquet-friendly value: numbers as floats and missing values as None.
+    """
+    if field in NUMERIC_FIELDS:
+        value = parse_float(value)
+        return None if math.isnan(value) else value
+    return None if value in (None, "N/A") else value
+
+class ExportWriter:
+    """
+    Streams analysis results to one CSV, JSON Lines, Parquet or text file.
+
+    Rows are buffered and written in batches through a single open handle, so memory stays constant
+    however many stocks are exported. Output goes to a temporary file next to the target, which
+    replaces the target only when the writer is closed successfully. With append=True (not for
+    Parquet) rows are appended to an existing target in place, so earlier runs are never copied;
+    abort() truncates the target back to its original length.
+    """
+
+    def __init__(self, path, format=None, batch_size=DEFAULT_BATCH_SIZE, append=False):
+        self.path = path
+        self.format = format or FORMAT_EXTENSIONS.get(os.path.splitext(path)[1].lower())
+        if self.format not in FORMAT_EXTENSIONS.values():
+            raise ValueError(f"Unsupported export format for {path}: {self.format}")
+        if append and self.format == "parquet":
+            raise ValueError("Parquet files cannot be appended to.")
+        self.batch_size = batch_size
+        self.append = append
+        self.rows = []
+        self.count = 0
+        self.temp_path = None
+        self.append_offset = None  # Length of the target before appending, if appending in place
+        self._open()
+
+    def _open(self):
+        newline = "" if self.format == "csv" else None
+        if self.append and os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+            self.file = open(self.path, "a", newline=newline)
+            self.append_offset = self.file.tell()
+        else:
+            # Unique name in the target's directory, so the final rename is atomic
+            directory, name = os.path.split(os.path.abspath(self.path))
+            descriptor, self.temp_path = tempfile.mkstemp(prefix=f"{name}.", suffix=".tmp", dir=directory)
+            if self.format == "parquet":
+                os.close(descriptor)
+                self._open_parquet()
+                return
+            self.file = os.fdopen(descriptor, "w", newline=newline)
+
+        if self.format == "csv":
+            self.csv_writer = csv.writer(self.file)
+            if self.append_offset is None:
+                self.csv_writer.writerow(CSV_HEADER)
+
+    def _open_parquet(self):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("Parquet export requires pyarrow (pip install pyarrow).") from e
+        self.schema = pa.schema(
+            [(field, pa.float64() if field in NUMERIC_FIELDS else pa.string()) for field in EXPORT_FIELDS]
+        )
+        self.file = pq.ParquetWriter(self.temp_path, self.schema)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def write(self, stock_data, rating):
+        """
+        Add one analysed stock (a StockRecord or stock_data dictionary) and its rating.
+        """
+        self.rows.append((stock_data, rating))
+        self.count += 1
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Write the buffered rows to the output file.
+        """
+        if not self.rows:
+            return
+        if self.format == "csv":
+            self.csv_writer.writerows(
+                [format_value(stock_data.get(field)) for field in StockRecord._fields] + [rating]
+                for stock_data, rating in self.rows
+            )
+        elif self.format == "jsonl":
+            self.file.write("".join(
+                json.dumps({**{field: typed_value(field, stock_data.get(field)) for field in StockRecord._fields},
+                            "rating": rating}) + "\n"
+                for stock_data, rating in self.rows
+            ))
+        elif self.format == "txt":
+            self.file.write("".join(
+                format_text_block(stock_data.get("symbol"), stock_data, rating) for stock_data, rating in self.rows
+            ))
+        else:
+            import pyarrow as pa
+            columns = {field: [typed_value(field, stock_data.get(field)) for stock_data, _ in self.rows]
+                       for field in StockRecord._fields}
+            columns["rating"] = [rating for _, rating in self.rows]
+            # Each batch becomes one Parquet row group
+            self.file.write_table(pa.table(columns, schema=self.schema))
+        self.rows = []
+
+    def close(self):
+        """
+        Flush the remaining rows and atomically move the finished file into place.
+        """
+        self.flush()
+        if self.format == "parquet":
+            self.file.close()
+        else:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.file.close()
+        if self.temp_path is None:
+            return
+        # mkstemp creates the file readable by the owner only; keep the permissions of the file it replaces
+        if os.path.exists(self.path):
+            shutil.copymode(self.path, self.temp_path)
+        else:
+            os.chmod(self.temp_path, 0o644)
+        os.replace(self.temp_path, self.path)
+
+    def abort(self):
+        """
+        Discard everything written so far and leave any existing target file untouched.
+        """
+        self.rows = []
+        self.file.close()
+        if self.append_offset is not None:
+            os.truncate(self.path, self.append_offset)
+        elif os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
@@ -0,0 +1,150 @@
+# http_client.py
+import functools
+import os
+import random
+import threading
+
+from stockthing.v2.pythonversion import metrics
+
+# Connection pool and timeout settings per provider.
+# Timeouts are (connect, read) in seconds.
+PROVIDER_SETTINGS = {
+    "alphavantage": {"pool_maxsize": 8, "timeout": (3.05, 15)},
+    "google_cse": {"pool_maxsize": 4, "timeout": (3.05, 10)},
+    "openai": {"pool_maxsize": 8, "timeout": (3.05, 60)},
+    "default": {"pool_maxsize": 4, "timeout": (3.05, 15)},
+}
+
+# Retry policy for transient failures (connection errors, 429 and 5xx responses).
+# Only idempotent methods are retried after the request was sent: retrying a POST (an OpenAI
+# completion) could run and bill it twice. Connection failures are retried for every method.
+RETRY_METHODS = frozenset(["GET", "HEAD"])
+MAX_RETRIES = 3
+BACKOFF_FACTOR = 0.5
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Connections the asyncio web app keeps open to upstreams (all providers together)
+ASYNC_CONNECTION_LIMIT = int(os.getenv("ASYNC_CONNECTION_LIMIT", "512"))
+
+@functools.lru_cache(maxsize=None)
+def jittered_retry_class():
+    """
+    Return JitteredRetry. requests and urllib3 are imported when the first session is created
+    rather than at import time, so CLI prompts appear before they are loaded.
+    """
+    from urllib3.util.retry import Retry
+
+    class JitteredRetry(Retry):
+        """
+        urllib3 Retry with "full jitter" exponential backoff, so parallel clients don't retry in lockstep.
+        """
+
+        def get_backoff_time(self):
+            backoff = super().get_backoff_time()
+            return random.uniform(0, backoff) if backoff else 0
+
+        def increment(self, *args, **kwargs):
+            retry = super().increment(*args, **kwargs)
+            # Only counted when another attempt will be made (super raises once retries are exhausted)
+            metrics.increment("http_retries_total", host=getattr(kwargs.get("_pool"), "host", None) or "unknown")
+            return retry
+
+    return JitteredRetry
+
+# Shared sessions, one per provider
+sessions = {}
+sessions_lock = threading.Lock()
+
+def create_session(provider):
+    """
+    Build a keep-alive session with a sized connection pool, retries and gzip for a provider.
+
+    With HTTP_CASSETTE set, requests are recorded to or replayed from the cassette (see cassette.py).
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    from stockthing.v2.pythonversion import cassette
+
+    settings = PROVIDER_SETTINGS.get(provider, PROVIDER_SETTINGS["default"])
+    retry = jittered_retry_class()(
+        total=MAX_RETRIES,
+        backoff_factor=BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=RETRY_METHODS,
+        respect_retry_after_header=True,
+        raise_on_status=False,  # Hand the final response back to the caller
+    )
+    adapter = cassette.wrap_adapter(
+        HTTPAdapter(pool_connections=2, pool_maxsize=settings["pool_maxsize"], max_retries=retry)
+    )
+
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"Accept-Encoding": "gzip, deflate"})
+    return session
+
+def get_session(provider):
+    """
+    Return the shared session for a provider, creating it on first use.
+    """
+    with sessions_lock:
+        if provider not in sessions:
+            sessions[provider] = create_session(provider)
+        return sessions[provider]
+
+def openai_session():
+    """
+    Return a new pooled session for the openai client (openai.requestssession = openai_session).
+
+    openai 0.28 keeps one session per thread and closes it after MAX_SESSION_LIFETIME_SECS, so it
+    must not be handed the shared session: closing that would drop every other thread's connections.
+    """
+    return create_session("openai")
+
+def is_replayed(url, params=None):
+    """
+    Return True when a GET will be served from the HTTP cassette, so it needs no rate limit token.
+    """
+    from stockthing.v2.pythonversion import cassette
+
+    return cassette.replays("GET", url, params)
+
+def get(provider, url, params=None, **kwargs):
+    """
+    Send a GET request through the provider's pooled session with the provider's default timeout.
+    """
+    settings = PROVIDER_SETTINGS.get(provider, PROVIDER_SETTINGS["default"])
+    kwargs.setdefault("timeout", settings["timeout"])
+    with metrics.timer("upstream_request_seconds", provider=provider):
+        response = get_session(provider).get(url, params=params, **kwargs)
+    metrics.increment("upstream_responses_total", provider=provider, status=response.status_code)
+    return response
+
+def create_async_session(limit=ASYNC_CONNECTION_LIMIT):
+    """
+    Build an aiohttp session for the asyncio web app. Call it from a running event loop.
+
+    Unlike the requests sessions it neither retries nor uses the HTTP cassette.
+    """
+    import aiohttp
+
+    return aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=limit))
+
+async def get_json_async(session, provider, url, params=None):
+    """
+    Send a GET request through an aiohttp session with the provider's default timeout and
+    return (status, parsed JSON body).
+    """
+    import aiohttp
+
+    settings = PROVIDER_SETTINGS.get(provider, PROVIDER_SETTINGS["default"])
+    connect, read = settings["timeout"]
+    with metrics.timer("upstream_request_seconds", provider=provider):
+        async with session.get(url, params=params,
+                               timeout=aiohttp.ClientTimeout(sock_connect=connect, sock_read=read)) as response:
+            payload = await response.json(content_type=None)
+    metrics.increment("upstream_responses_total", provider=provider, status=response.status)
+    return response.status, payload
+
@@ -0,0 +1,358 @@
+# indicators.py
+import math
+
+import numpy as np
+
+from stockthing.v2.pythonversion.price_store import price_store
+
+# Trading days per year, used to annualize volatility
+PERIODS_PER_YEAR = 252
+
+# All functions work on the last axis, so they accept one series (1-D) or one row per symbol (2-D).
+# Bars before an indicator has enough history are NaN. Missing bars (NaN, e.g. before a late listing
+# or in a gap from load_closes) are skipped: windows that contain one are NaN, and smoothed
+# indicators hold their state across them.
+
+def _nan_prefix(values, count):
+    """
+    Return a float array shaped like values with the first `count` bars set to NaN.
+    """
+    result = np.empty(values.shape, dtype=np.float64)
+    result[..., :count] = np.nan
+    return result
+
+def sma(values, window):
+    """
+    Simple moving average over `window` bars; NaN where the window contains a missing bar.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    result = _nan_prefix(values, window - 1)
+    if values.shape[-1] < window:
+        return result
+    # Running sums via cumsum: each average costs one subtraction instead of `window` additions
+    valid = ~np.isnan(values)
+    if valid.all():
+        totals = np.cumsum(values, axis=-1)
+        result[..., window - 1] = totals[..., window - 1]
+        result[..., window:] = totals[..., window:] - totals[..., :-window]
+        result[..., window - 1:] /= window
+        return result
+    # Missing bars count as 0 in the sums, and the running count of valid bars tells which windows are full
+    totals = np.cumsum(np.where(valid, values, 0.0), axis=-1)
+    counts = np.cumsum(valid, axis=-1)
+    window_totals = totals[..., window - 1:].copy()
+    window_counts = counts[..., window - 1:].copy()
+    window_totals[..., 1:] -= totals[..., :-window]
+    window_counts[..., 1:] -= counts[..., :-window]
+    result[..., window - 1:] = np.where(window_counts == window, window_totals / window, np.nan)
+    return result
+
+def _first_valid(values):
+    """
+    Index of the first non-NaN bar of each series (the series length if there is none).
+    """
+    valid = ~np.isnan(values)
+    return np.where(valid.any(axis=-1), valid.argmax(axis=-1), values.shape[-1])
+
+def _smooth(values, alpha, window):
+    """
+    Exponential smoothing seeded with the simple average of the first `window` consecutive valid bars.
+
+    Loops over bars (not symbols), so a 2-D input updates every symbol in one vector operation per
+    bar. Each series starts at its own seed, and missing bars leave its state unchanged.
+    """
+    result = np.full(values.shape, np.nan)
+    if values.shape[-1] < window:
+        return result
+    missing = np.isnan(values)
+    if not missing.any():
+        current = values[..., :window].mean(axis=-1)
+        result[..., window - 1] = current
+        for index in range(window, values.shape[-1]):
+            current = current + alpha * (values[..., index] - current)
+            result[..., index] = current
+        return result
+
+    seeds = sma(values, window)
+    start = np.atleast_1d(_first_valid(seeds))
+    # Bars where any series is missing or gets its seed need the slower masked update
+    missing_bars = set(np.flatnonzero(missing.reshape(-1, values.shape[-1]).any(axis=0)).tolist())
+    seed_bars = set(start[start < values.shape[-1]].tolist())
+    current = np.full(values.shape[:-1], np.nan)
+    for index in range(min(seed_bars, default=values.shape[-1]), values.shape[-1]):
+        value = values[..., index]
+        if index in missing_bars:
+            # A missing bar leaves the state unchanged
+            value = np.where(missing[..., index], current, value)
+        # Series not seeded yet stay NaN, since current is NaN for them
+        current = current + alpha * (value - current)
+        if index in seed_bars:
+            current = np.where(start.reshape(current.shape) == index, seeds[..., index], current)
+        result[..., index] = current
+    result[missing] = np.nan
+    return result
+
+def ema(values, window):
+    """
+    Exponential moving average with alpha = 2 / (window + 1), seeded with the SMA of the first window.
+    """
+    return _smooth(np.asarray(values, dtype=np.float64), 2 / (window + 1), window)
+
+def rsi(close, window=14):
+    """
+    Relative Strength Index (0-100) with Wilder's smoothing.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    change = np.diff(close, axis=-1)
+    # Wilder's smoothing is an EMA with alpha = 1 / window
+    gain = _smooth(np.maximum(change, 0.0), 1 / window, window)
+    loss = _smooth(np.maximum(-change, 0.0), 1 / window, window)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        values = 100 - 100 / (1 + gain / loss)
+    values = np.where(loss == 0, np.where(gain == 0, 50.0, 100.0), values)
+    values[np.isnan(gain)] = np.nan
+    # Changes start at the second bar
+    return np.concatenate([np.full(close.shape[:-1] + (1,), np.nan), values], axis=-1)
+
+def macd(close, fast=12, slow=26, signal=9):
+    """
+    Moving Average Convergence Divergence. Returns (macd, signal, histogram).
+    """
+    close = np.asarray(close, dtype=np.float64)
+    line = ema(close, fast) - ema(close, slow)
+    signal_line = _nan_prefix(close, close.shape[-1])
+    # The signal EMA starts once the MACD line has values (later for series with missing bars)
+    signal_line[..., slow - 1:] = ema(line[..., slow - 1:], signal)
+    return line, signal_line, line - signal_line
+
+def rolling_std(values, window, ddof=0):
+    """
+    Standard deviation over a sliding window of `window` bars; NaN where the window contains a missing bar.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    result = _nan_prefix(values, window - 1)
+    if values.shape[-1] < window:
+        return result
+    # Shift each series by its first valid value so the running sums of squares keep their precision
+    first = _first_valid(values)
+    origin = np.take_along_axis(values, np.minimum(first, values.shape[-1] - 1)[..., np.newaxis], axis=-1)
+    shifted = values - np.nan_to_num(origin)
+    means = sma(shifted, window)[..., window - 1:]
+    squares = sma(shifted * shifted, window)[..., window - 1:]
+    variance = np.maximum(squares - means * means, 0.0) * window / (window - ddof)
+    result[..., window - 1:] = np.sqrt(variance)
+    return result
+
+def bollinger_bands(close, window=20, num_std=2.0):
+    """
+    Bollinger bands. Returns (middle, upper, lower).
+    """
+    middle = sma(close, window)
+    width = num_std * rolling_std(close, window)
+    return middle, middle + width, middle - width
+
+def log_returns(close):
+    """
+    Bar-to-bar log returns; the first bar is NaN.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    returns = _nan_prefix(close, 1)
+    returns[..., 1:] = np.diff(np.log(close), axis=-1)
+    return returns
+
+def rolling_volatility(close, window=20, periods_per_year=PERIODS_PER_YEAR):
+    """
+    Annualized volatility: standard deviation of log returns over `window` bars.
+    """
+    returns = log_returns(close)
+    result = _nan_prefix(returns, returns.shape[-1])
+    result[..., 1:] = rolling_std(returns[..., 1:], window, ddof=1) * math.sqrt(periods_per_year)
+    return result
+
+def drawdown(close):
+    """
+    Fall from the running peak at every bar, as a fraction (0 at a new high, -0.25 at 25% below it).
+    """
+    close = np.asarray(close, dtype=np.float64)
+    # fmax ignores missing bars, so a gap does not hide later peaks
+    return close / np.fmax.accumulate(close, axis=-1) - 1
+
+def max_drawdown(close):
+    """
+    Worst drawdown over the whole series (missing bars ignored).
+    """
+    return np.fmin.reduce(drawdown(close), axis=-1)
+
+def load_closes(symbols, start=None, end=None, store=None):
+    """
+    Return (dates, closes) for several symbols from the price store, aligned on the first symbol's dates.
+
+    closes has one row per symbol; bars a symbol does not have are NaN.
+    """
+    store = store or price_store
+    reference = store.range(symbols[0], start, end)
+    dates = np.array(reference.dates)
+    closes = np.full((len(symbols), len(dates)), np.nan)
+    for row, symbol in enumerate(symbols):
+        series = store.range(symbol, start, end)
+        positions = np.searchsorted(dates, series.dates)
+        found = positions < len(dates)
+        found[found] = dates[positions[found]] == series.dates[found]
+        closes[row, positions[found]] = series.close[found]
+    return dates, closes
+
+# Incremental indicators for live data: update() takes the newest bar and costs O(1) per bar.
+# A bar can be a number (one symbol) or an array with one value per symbol, so every symbol is
+# updated in one vector operation. Results match the vectorized functions above for series without gaps.
+
+class IncrementalSMA:
+    """
+    Simple moving average kept as a running sum over a ring buffer.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self.buffer = None  # Ring buffer of the last `window` bars
+        self.total = 0.0
+        self.count = 0
+
+    def update(self, value):
+        value = np.asarray(value, dtype=np.float64)
+        if self.buffer is None:
+            self.buffer = np.zeros((self.window,) + value.shape)
+        slot = self.count % self.window
+        self.total = self.total + value - self.buffer[slot]
+        self.buffer[slot] = value
+        self.count += 1
+        if slot == self.window - 1:
+            # Re-sum once per window so rounding errors in the running sum cannot build up
+            self.total = self.buffer.sum(axis=0)
+        return self.total / self.window if self.count >= self.window else np.full(value.shape, np.nan)[()]
+
+class IncrementalEMA:
+    """
+    Exponential moving average, seeded with the SMA of the first window like ema().
+    """
+
+    def __init__(self, window, alpha=None):
+        self.window = window
+        self.alpha = 2 / (window + 1) if alpha is None else alpha
+        self.seed = IncrementalSMA(window)
+        self.value = None
+
+    def update(self, value):
+        if self.value is None:
+            seed = self.seed.update(value)
+            if self.seed.count >= self.window:
+                self.value = seed
+            return seed
+        self.value = self.value + self.alpha * (np.asarray(value, dtype=np.float64) - self.value)
+        return self.value
+
+class IncrementalRSI:
+    """
+    Relative Strength Index with Wilder's smoothing, like rsi().
+    """
+
+    def __init__(self, window=14):
+        self.gain = IncrementalEMA(window, alpha=1 / window)
+        self.loss = IncrementalEMA(window, alpha=1 / window)
+        self.previous = None
+
+    def update(self, close):
+        close = np.asarray(close, dtype=np.float64)
+        if self.previous is None:
+            self.previous = close
+            return np.full(close.shape, np.nan)[()]
+        change = close - self.previous
+        self.previous = close
+        gain = self.gain.update(np.maximum(change, 0.0))
+        loss = self.loss.update(np.maximum(-change, 0.0))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            value = 100 - 100 / (1 + gain / loss)
+        value = np.where(loss == 0, np.where(gain == 0, 50.0, 100.0), value)
+        return np.where(np.isnan(gain), np.nan, value)[()]
+
+class IncrementalMACD:
+    """
+    MACD line, signal and histogram, like macd().
+    """
+
+    def __init__(self, fast=12, slow=26, signal=9):
+        self.fast = IncrementalEMA(fast)
+        self.slow = IncrementalEMA(slow)
+        self.signal = IncrementalEMA(signal)
+
+    def update(self, close):
+        """
+        Return (macd, signal, histogram) for the newest bar.
+        """
+        line = self.fast.update(close) - self.slow.update(close)
+        if np.all(np.isnan(line)):
+            return line, line, line
+        signal = self.signal.update(line)
+        return line, signal, line - signal
+
+class IncrementalBollinger:
+    """
+    Bollinger bands from running sums of the last `window` bars, like bollinger_bands().
+    """
+
+    def __init__(self, window=20, num_std=2.0):
+        self.num_std = num_std
+        self.mean = IncrementalSMA(window)
+        self.squares = IncrementalSMA(window)
+        self.origin = None  # First bar, subtracted for precision like rolling_std
+
+    def update(self, close):
+        """
+        Return (middle, upper, lower) for the newest bar.
+        """
+        close = np.asarray(close, dtype=np.float64)
+        if self.origin is None:
+            self.origin = close
+        shifted = close - self.origin
+        mean = self.mean.update(shifted)
+        width = self.num_std * np.sqrt(np.maximum(self.squares.update(shifted * shifted) - mean * mean, 0.0))
+        middle = mean + self.origin
+        return middle, middle + width, middle - width
+
+class IncrementalVolatility:
+    """
+    Annualized volatility of log returns over the last `window` bars, like rolling_volatility().
+    """
+
+    def __init__(self, window=20, periods_per_year=PERIODS_PER_YEAR):
+        self.window = window
+        self.scale = math.sqrt(periods_per_year)
+        self.mean = IncrementalSMA(window)
+        self.squares = IncrementalSMA(window)
+        self.previous = None
+        self.origin = None
+
+    def update(self, close):
+        close = np.asarray(close, dtype=np.float64)
+        if self.previous is None:
+            self.previous = close
+            return np.full(close.shape, np.nan)[()]
+        change = np.log(close / self.previous)
+        self.previous = close
+        if self.origin is None:
+            self.origin = change
+        shifted = change - self.origin
+        mean = self.mean.update(shifted)
+        variance = np.maximum(self.squares.update(shifted * shifted) - mean * mean, 0.0)
+        return np.sqrt(variance * self.window / (self.window - 1)) * self.scale
+
+class IncrementalDrawdown:
+    """
+    Fall from the running peak, like drawdown().
+    """
+
+    def __init__(self):
+        self.peak = None
+
+    def update(self, close):
+        close = np.asarray(close, dtype=np.float64)
+        self.peak = close if self.peak is None else np.maximum(self.peak, close)
+        return close / self.peak - 1
@@ -0,0 +1,161 @@
+# llm_cache.py
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+from stockthing.v2.pythonversion import metrics
+from stockthing.v2.pythonversion.cache import FundamentalsCache
+from stockthing.v2.pythonversion.singleflight import AsyncSingleFlight, SingleFlight
+from stockthing.v2.pythonversion.utils import PRIORITY_INTERACTIVE, rate_limit_check, rate_limit_check_async
+
+# Location of the completion cache and how long a completion is reused, in seconds
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "llm_cache.sqlite3")
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", str(6 * 60 * 60)))
+
+# Near-identical prompts (case, whitespace, punctuation) share an entry when enabled
+LLM_CACHE_SEMANTIC = os.getenv("LLM_CACHE_SEMANTIC", "").strip().lower() in ("1", "true", "yes")
+
+# Approximate price in USD per 1K tokens, used to report the cost saved by cache hits
+MODEL_PRICES_PER_1K = {
+    "gpt-4": 0.06,
+    "gpt-3.5-turbo": 0.002,
+    "text-davinci-003": 0.02,
+}
+
+def normalize_prompt(prompt):
+    """
+    Reduce a prompt to lowercase words so trivially different prompts map to the same key.
+    """
+    return " ".join(re.findall(r"[a-z0-9./$%-]+", prompt.lower()))
+
+class LLMCache:
+    """
+    Content-addressed cache of completions keyed by (model, prompt hash, temperature, max_tokens).
+
+    Completions are stored in the same SQLite-backed store as the fundamentals cache, and concurrent
+    identical prompts share one upstream call. Hits add the original call's latency, tokens and
+    estimated cost to the savings counters. Only upstream calls take a token from the "openai" rate
+    limiter; hits are free.
+    """
+
+    def __init__(self, path=LLM_CACHE_PATH, ttl=LLM_CACHE_TTL, semantic=LLM_CACHE_SEMANTIC):
+        self.store = FundamentalsCache(path, ttls={}, default_ttl=ttl)
+        self.semantic = semantic
+        self.flight = SingleFlight()
+        self.async_flight = AsyncSingleFlight()
+        self.saved_calls = 0
+        self.saved_seconds = 0.0
+        self.saved_tokens = 0
+        self.saved_cost = 0.0
+        self._stats_lock = threading.Lock()
+
+    def key(self, request):
+        """
+        Return (model, key) for a completion request.
+        """
+        model = request.get("model") or request.get("engine")
+        if "messages" in request:
+            prompt = json.dumps(request["messages"], sort_keys=True)
+        else:
+            prompt = request.get("prompt", "")
+        if self.semantic:
+            prompt = normalize_prompt(prompt)
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        return model, f"{digest}:{request.get('temperature')}:{request.get('max_tokens')}"
+
+    def age(self, **request):
+        """
+        Return how many seconds ago the completion for this request was cached, or None if it is not.
+        """
+        model, key = self.key(request)
+        return self.store.age("openai", model, key)
+
+    def completion(self, create, max_age=None, priority=PRIORITY_INTERACTIVE, **request):
+        """
+        Return the cached response for this request, or call create(**request) and cache it.
+
+        max_age (seconds) replaces the cache TTL for this lookup, e.g. 0 to refresh ahead of expiry.
+        priority is the rate limiter lane a cache miss waits in.
+        Responses are returned as plain dicts, so read them with response["choices"][0]...
+        """
+        model, key = self.key(request)
+        fetched = []
+
+        def fetch():
+            rate_limit_check("openai", priority=priority)
+            start = time.perf_counter()
+            with metrics.timer("llm_request_seconds", model=model):
+                response = json.loads(json.dumps(create(**request)))
+            fetched.append(True)
+            tokens = response.get("usage", {}).get("total_tokens", 0)
+            return {"response": response, "latency": time.perf_counter() - start, "tokens": tokens}
+
+        entry = self.flight.do((model, key), lambda: self.store.get_or_fetch("openai", model, key, fetch,
+                                                                                     max_age=max_age))
+
+        # Served from the cache (or from another caller's identical in-flight request)
+        if not fetched:
+            self._count_saved(model, entry)
+        return entry["response"]
+
+    async def completion_async(self, acreate, max_age=None, priority=PRIORITY_INTERACTIVE, **request):
+        """
+        completion for coroutines: acreate is an async create function, e.g. openai.Completion.acreate.
+        """
+        model, key = self.key(request)
+        fetched = []
+
+        async def fetch():
+            await rate_limit_check_async("openai", priority=priority)
+            start = time.perf_counter()
+            with metrics.timer("llm_request_seconds", model=model):
+                response = json.loads(json.dumps(await acreate(**request)))
+            fetched.append(True)
+            tokens = response.get("usage", {}).get("total_tokens", 0)
+            return {"response": response, "latency": time.perf_counter() - start, "tokens": tokens}
+
+        entry = await self.async_flight.do(
+            (model, key), lambda: self.store.get_or_fetch_async("openai", model, key, fetch, max_age=max_age)
+        )
+        if not fetched:
+            self._count_saved(model, entry)
+        return entry["response"]
+
+    def _count_saved(self, model, entry):
+        with self._stats_lock:
+            self.saved_calls += 1
+            self.saved_seconds += entry["latency"]
+            self.saved_tokens += entry["tokens"]
+            self.saved_cost += entry["tokens"] / 1000 * MODEL_PRICES_PER_1K.get(model, 0.0)
+
+    def stats(self):
+        """
+        Return hit/miss counters and the latency, tokens and cost saved by cache hits.
+        """
+        stats = self.store.stats()
+        stats.update({
+            "saved_calls": self.saved_calls,
+            "saved_seconds": round(self.saved_seconds, 3),
+            "saved_tokens": self.saved_tokens,
+            "saved_cost_usd": round(self.saved_cost, 4),
+        })
+        return stats
+
+# Shared cache instance
+llm_cache = LLMCache()
+metrics.register_stats("llm_cache", llm_cache.stats)
+
+def cached_completion(create, max_age=None, priority=PRIORITY_INTERACTIVE, **request):
+    """
+    Call an OpenAI create function (e.g. openai.Completion.create) through the shared LLM cache.
+    """
+    return llm_cache.completion(create, max_age=max_age, priority=priority, **request)
+
+async def cached_completion_async(acreate, max_age=None, priority=PRIORITY_INTERACTIVE, **request):
+    """
+    Call an async OpenAI create function (e.g. openai.Completion.acreate) through the shared LLM cache.
+    """
+    return await llm_cache.completion_async(acreate, max_age=max_age, priority=priority, **request)
@@ -0,0 +1,173 @@
+# load_test.py
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+import aiohttp
+import openai
+from flask import render_template, request
+from werkzeug.serving import make_server
+
+from stockthing.v2.pythonversion import llm_cache, maintowebsite, stock_analysis, utils
+from stockthing.v2.pythonversion.cache import FundamentalsCache
+from stockthing.v2.pythonversion.refresh_planner import RefreshPlanner
+from stockthing.v2.pythonversion.mock_server import start_mock_server
+from stockthing.v2.pythonversion.web_cache import web_cache
+
+def use_mock_upstreams(latency, **server_options):
+    """
+    Point Alpha Vantage and OpenAI at the local mock server and lift their rate limits.
+
+    server_options go to start_mock_server (e.g. error_rate).
+    """
+    server, url = start_mock_server(latency=latency, **server_options)
+    stock_analysis.ALPHA_VANTAGE_URL = url
+    openai.api_base = server.openai_base
+    openai.api_key = "mock"
+    utils.configure_rate_limiter("alphavantage", 10 ** 9, 1)
+    utils.configure_rate_limiter("openai", 10 ** 9, 1)
+    directory = tempfile.mkdtemp(prefix="stock_load_")
+    stock_analysis.fundamentals_cache = FundamentalsCache(os.path.join(directory, "cache.sqlite3"))
+    stock_analysis.refresh_planner = RefreshPlanner(stock_analysis.fundamentals_cache)
+    llm_cache.llm_cache = llm_cache.LLMCache(os.path.join(directory, "llm_cache.sqlite3"))
+    return server
+
+def register_sequential_route(app):
+    """
+    Add /sequential, which runs the fetch, sentiment and competitor steps one after another
+    like the original synchronous view, as the baseline for comparison.
+    """
+    def sequential_index():
+        stock_symbol = request.form.get("stock_symbol").upper().strip()
+        stock_data = maintowebsite.fetch_stock_data(stock_symbol, maintowebsite.ALPHA_VANTAGE_API_KEY)
+        if not stock_data:
+            return render_template("index.html", error="Unable to fetch stock data. Please check the symbol.")
+        rating = maintowebsite.analyze_stock_data(stock_data)
+        sentiment = maintowebsite.get_investor_sentiment(stock_symbol)
+        competitors = maintowebsite.get_competing_companies(stock_symbol)
+        return render_template(
+            "result.html",
+            stock_data=stock_data.display_dict(),
+            rating=rating,
+            sentiment=sentiment,
+            competitors=[competitor.display_dict() for competitor in competitors],
+        )
+
+    app.add_url_rule("/sequential", "sequential_index", sequential_index, methods=["POST"])
+
+def start_app():
+    """
+    Serve the web app from a threaded WSGI server in the background and return (server, base URL).
+    """
+    register_sequential_route(maintowebsite.app)
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)  # Don't log every request
+    server = make_server("127.0.0.1", 0, maintowebsite.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+class AsyncAppServer:
+    """
+    The asyncio web app (async_app) served from an event loop in a background thread.
+    """
+
+    def __init__(self):
+        from aiohttp import web
+
+        from stockthing.v2.pythonversion import async_app
+
+        self.loop = asyncio.new_event_loop()
+        self.runner = web.AppRunner(async_app.create_app(), access_log=None)
+        self.loop.run_until_complete(self.runner.setup())
+        site = web.TCPSite(self.runner, "127.0.0.1", 0, backlog=1024)
+        self.loop.run_until_complete(site.start())
+        self.port = self.runner.addresses[0][1]
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+
+    def shutdown(self):
+        asyncio.run_coroutine_threadsafe(self.runner.cleanup(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+def start_async_app():
+    """
+    Serve the asyncio web app in the background and return (server, base URL).
+    """
+    server = AsyncAppServer()
+    return server, f"http://127.0.0.1:{server.port}"
+
+def run_load(url, clients, total, tickers):
+    """
+    POST `total` analysis requests to url from `clients` concurrent clients and return
+    (latencies, errors, elapsed seconds).
+
+    The clients are coroutines on one aiohttp session, so thousands of them cost no threads.
+    """
+    async def load():
+        results = []
+        numbers = iter(range(total))  # Shared by all clients; each takes the next request number
+
+        async def client(session):
+            for number in numbers:
+                start = time.perf_counter()
+                try:
+                    async with session.post(url, data={"stock_symbol": tickers[number % len(tickers)]}) as response:
+                        await response.read()
+                        status = response.status
+                except aiohttp.ClientError:
+                    status = None
+                results.append((time.perf_counter() - start, status))
+
+        async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=clients),
+                                         timeout=aiohttp.ClientTimeout(total=None)) as session:
+            await asyncio.gather(*(client(session) for _ in range(clients)))
+        return results
+
+    start = time.perf_counter()
+    results = asyncio.run(load())
+    elapsed = time.perf_counter() - start
+    return [latency for latency, _ in results], sum(status != 200 for _, status in results), elapsed
+
+def report(label, latencies, errors, elapsed):
+    """
+    Print throughput and latency percentiles for one run.
+    """
+    cuts = statistics.quantiles(latencies, n=100)
+    print(f"{label:<12} {len(latencies) / elapsed:7.1f} req/s   "
+          f"p50 {cuts[49] * 1000:7.1f} ms   p95 {cuts[94] * 1000:7.1f} ms   p99 {cuts[98] * 1000:7.1f} ms   "
+          f"errors {errors}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the analysis web app against mocked upstreams.")
+    parser.add_argument("--url", help="Test an already running server (e.g. gunicorn --threads 32 maintowebsite:app) "
+                                      "started with ALPHA_VANTAGE_URL and OPENAI_API_BASE pointing at mocks.")
+    parser.add_argument("--clients", type=int, default=50, help="Number of concurrent clients.")
+    parser.add_argument("--requests", type=int, default=500, help="Total number of requests.")
+    parser.add_argument("--tickers", type=int, default=20, help="Number of distinct tickers to request.")
+    parser.add_argument("--latency", type=float, default=0.1, help="Mock upstream latency in seconds.")
+    args = parser.parse_args()
+
+    tickers = [f"T{index:03d}" for index in range(args.tickers)]
+    if args.url:
+        report("target", *run_load(args.url, args.clients, args.requests, tickers))
+        return
+
+    print(f"Clients: {args.clients}, requests: {args.requests}, tickers: {args.tickers}, "
+          f"mock latency: {args.latency * 1000:.0f} ms")
+    app_server, base_url = start_app()
+    async_server, async_url = start_async_app()
+    for label, url in (("sequential", base_url + "/sequential"), ("concurrent", base_url + "/"),
+                       ("async", async_url + "/")):
+        # Fresh mocks and caches for every run so all start cold
+        upstream = use_mock_upstreams(args.latency)
+        web_cache.clear()
+        report(label, *run_load(url, args.clients, args.requests, tickers))
+        upstream.shutdown()
+    async_server.shutdown()
+    app_server.shutdown()
+
+if __name__ == "__main__":
+    main()
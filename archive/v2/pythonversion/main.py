@@ -1,14 +1,14 @@
 # Import necessary libraries
-import openai  # For OpenAI API integration (currently unused in this script)
-import requests  # For making HTTP requests to the Alpha Vantage API
-from datetime import datetime  # For handling timestamps and logging
 from dotenv import load_dotenv, find_dotenv  # For loading environment variables from a .env file
 import os  # For interacting with the operating system (e.g., reading environment variables)
-import time  # For handling rate-limiting and delays
+import argparse  # For parsing command-line options
 
-from stockthing.v2.pythonversion.stock_analysis import fetch_stock_data, analyze_stock_data
+from stockthing.v2.pythonversion import metrics
+from stockthing.v2.pythonversion.stock_analysis import iter_fetch_many, analyze_stock_data
 from output_handler import handle_output
-from stockthing.v2.pythonversion.utils import rate_limit_check
+from stockthing.v2.pythonversion.export import ExportWriter
+from stockthing.v2.pythonversion.cache import fundamentals_cache, set_offline
+from stockthing.v2.pythonversion.refresh_planner import refresh_planner
 
 # Load the .env file to access API keys
 dotenv_path = find_dotenv("api.env")
@@ -16,15 +16,15 @@ if dotenv_path:
     load_dotenv(dotenv_path)
 
 # Access the environment variables for API keys
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "").strip()  # OpenAI API key (not used in this script)
 ALPHA_VANTAGE_API_KEY = os.getenv("ALPHA_VANTAGE_API_KEY", "").strip()  # Alpha Vantage API key
 
-# Set the OpenAI API key (not used in this script)
-openai.api_key = OPENAI_API_KEY
-
-# Global variables to track API calls and rate-limiting
-api_call_count = 0  # Tracks the number of API calls made in the current minute
-start_time = time.time()  # Tracks the start time of the current minute
+# Output file for each display option that writes all analyses to one file
+EXPORT_FILES = {
+    "one": "stock_analysis.txt",
+    "csv": "stock_analysis.csv",
+    "jsonl": "stock_analysis.jsonl",
+    "parquet": "stock_analysis.parquet",
+}
 
 def main():
     print("\nHow do you want to display the stock analyses?")
@@ -32,9 +32,11 @@ def main():
     print("2. One: Save all analyses in a single text file (stock_analysis.txt).")
     print("3. Multiple: Save each stock's analysis in separate text files (e.g., TSLA_analysis.txt).")
     print("4. CSV: Save all analyses in a structured CSV file (stock_analysis.csv).")
+    print("5. JSON Lines: Save all analyses as one JSON object per line (stock_analysis.jsonl).")
+    print("6. Parquet: Save all analyses in a columnar Parquet file (stock_analysis.parquet).")
 
-    display_option = input("Enter your choice (1/2/3/4): ").strip()
-    option_map = {"1": "console", "2": "one", "3": "multiple", "4": "csv"}
+    display_option = input("Enter your choice (1/2/3/4/5/6): ").strip()
+    option_map = {"1": "console", "2": "one", "3": "multiple", "4": "csv", "5": "jsonl", "6": "parquet"}
     display_option = option_map.get(display_option, "multiple")
 
     symbols = input("Enter stock symbol(s) (comma-separated for multiple, or press Enter to exit): ").upper().strip()
@@ -42,15 +44,42 @@ def main():
         print("Exiting the program. Goodbye!")
         return False
 
-    symbols = symbols.split(",")
-    for symbol in symbols:
-        # Pass the API key from the environment variables
-        stock_data = fetch_stock_data(symbol, ALPHA_VANTAGE_API_KEY)
-        if not stock_data:
-            print(f"Unable to fetch data for {symbol}. Skipping...")
-            continue
-        rating = analyze_stock_data(stock_data)
-        handle_output(display_option, symbol, stock_data, rating)
+    symbols = [symbol.strip() for symbol in symbols.split(",") if symbol.strip()]
+
+    # Modes that collect every stock in one file share a single buffered writer for the run;
+    # the text file keeps the analyses of earlier runs, the other formats are replaced
+    export_writer = None
+    if display_option in EXPORT_FILES:
+        export_writer = ExportWriter(EXPORT_FILES[display_option], append=display_option == "one")
+
+    try:
+        # Fetch all symbols concurrently and handle each one as soon as its data arrives
+        for _, symbol, stock_data in iter_fetch_many(symbols, ALPHA_VANTAGE_API_KEY):
+            if not stock_data:
+                print(f"Unable to fetch data for {symbol}. Skipping...")
+                continue
+            rating = analyze_stock_data(stock_data)
+            with metrics.timer("stage_seconds", stage="output", mode=display_option):
+                handle_output(display_option, symbol, stock_data, rating, export_writer=export_writer)
+    except BaseException:
+        if export_writer:
+            export_writer.abort()
+        raise
+    if export_writer:
+        with metrics.timer("stage_seconds", stage="output_close", mode=display_option):
+            export_writer.close()
+
+    stats = fundamentals_cache.stats()
+    saved = refresh_planner.stats()["total_saved_calls"]
+    print(f"Cache: {stats['hits']} hits, {stats['misses']} misses, {saved} earnings calls skipped until the next report.")
+    print("\n=== Timings ===")
+    print(metrics.summary())
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analyze stocks using Alpha Vantage data.")
+    parser.add_argument("--offline", action="store_true",
+                        help="Serve Alpha Vantage data from the local cache only (no Alpha Vantage calls).")
+    args = parser.parse_args()
+    if args.offline:
+        set_offline(True)
     main()
\ No newline at end of file
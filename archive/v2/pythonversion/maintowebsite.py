@@ -1,12 +1,20 @@
 # Import necessary libraries
-import openai  # For OpenAI API integration
-import requests  # For making HTTP requests to the Alpha Vantage API
+import functools  # For binding arguments to blocking calls
+from concurrent.futures import ThreadPoolExecutor  # For running the upstream calls of a request concurrently
 from datetime import datetime  # For handling timestamps and logging
 from dotenv import load_dotenv, find_dotenv  # For loading environment variables from a .env file
 import os  # For interacting with the operating system (e.g., reading environment variables)
-from flask import Flask, render_template, request  # For creating the web app
-from stockthing.v2.pythonversion.stock_analysis import fetch_stock_data, analyze_stock_data  # Custom modules
-from stockthing.v2.pythonversion.utils import rate_limit_check  # Utility functions
+from flask import Flask, Response, jsonify, render_template, request  # For creating the web app
+from stockthing.v2.pythonversion.stock_analysis import fetch_stock_data, iter_fetch_many, analyze_stock_data  # Custom modules
+from stockthing.v2.pythonversion.utils import PRIORITY_BACKGROUND, PRIORITY_BATCH, PRIORITY_INTERACTIVE, lazy_import, rate_limit_check  # Utility functions
+from stockthing.v2.pythonversion import http_client  # Pooled keep-alive sessions
+from stockthing.v2.pythonversion import llm_cache  # Shared completion cache (replaced in benchmarks)
+from stockthing.v2.pythonversion.llm_cache import LLM_CACHE_TTL, cached_completion  # Reuses identical completions
+from stockthing.v2.pythonversion.web_cache import web_cache  # In-process cache of page data
+from stockthing.v2.pythonversion.metrics import PROMETHEUS_CONTENT_TYPE, register_stats, render_prometheus  # Latency histograms and counters
+from stockthing.v2.pythonversion.prewarm import Prewarmer, PrewarmTask, alpha_vantage_task  # Background refreshes
+
+openai = lazy_import("openai")  # For OpenAI API integration (imported on the first completion)
 
 # Load the .env file to access API keys
 dotenv_path = find_dotenv("api.env")
@@ -19,10 +27,30 @@ ALPHA_VANTAGE_API_KEY = os.getenv("ALPHA_VANTAGE_API_KEY", "").strip()  # Alpha
 
 # Set the OpenAI API key
 openai.api_key = OPENAI_API_KEY
+# Route OpenAI requests through pooled keep-alive sessions (one per thread, created on first use)
+openai.requestssession = http_client.openai_session
 
 # Initialize Flask app
 app = Flask(__name__)
 
+# Competitor data that is not ready after this many seconds is left off the page
+COMPETITOR_DEADLINE = float(os.getenv("COMPETITOR_DEADLINE", "5"))
+
+# Shared pool for the blocking upstream calls (Alpha Vantage, OpenAI) of all requests
+UPSTREAM_WORKERS = int(os.getenv("UPSTREAM_WORKERS", "32"))
+upstream_executor = ThreadPoolExecutor(max_workers=UPSTREAM_WORKERS, thread_name_prefix="upstream")
+
+# Shown when sentiment analysis fails; never cached
+SENTIMENT_UNAVAILABLE = "Unable to fetch investor sentiment."
+
+class CompetitorList(list):
+    """
+    Stock data of a company's competitors. complete is False when the deadline cut the lookup short,
+    so the list is shown but not cached.
+    """
+
+    complete = True
+
 @app.route("/", methods=["GET", "POST"])
 def index():
     """
@@ -31,60 +59,103 @@ def index():
     if request.method == "POST":
         # Get user input
         stock_symbol = request.form.get("stock_symbol").upper().strip()
-
-        # Fetch stock data
-        stock_data = fetch_stock_data(stock_symbol, ALPHA_VANTAGE_API_KEY)
+        prewarmer.touch(stock_symbol)
+
+        # Fetch stock data, investor sentiment and competing companies concurrently on the shared
+        # upstream pool, so a request takes as long as its slowest call rather than the sum of them;
+        # popular tickers are answered from the in-process cache
+        futures = [
+            upstream_executor.submit(web_cache.get_or_fetch, ("stock", stock_symbol),
+                                     functools.partial(fetch_stock_data, stock_symbol, ALPHA_VANTAGE_API_KEY)),
+            upstream_executor.submit(web_cache.get_or_fetch, ("sentiment", stock_symbol),
+                                     functools.partial(get_investor_sentiment, stock_symbol),
+                                     lambda sentiment: sentiment != SENTIMENT_UNAVAILABLE),
+            upstream_executor.submit(web_cache.get_or_fetch, ("competitors", stock_symbol),
+                                     functools.partial(get_competing_companies, stock_symbol),
+                                     lambda competitors: bool(competitors) and competitors.complete),
+        ]
+        stock_data, sentiment, competitors = (future.result() for future in futures)
         if not stock_data:
             return render_template("index.html", error="Unable to fetch stock data. Please check the symbol.")
 
         # Analyze stock data
         rating = analyze_stock_data(stock_data)
 
-        # Fetch investor sentiment
-        sentiment = get_investor_sentiment(stock_symbol)
-
-        # Fetch competing companies
-        competitors = get_competing_companies(stock_symbol)
-
         # Render the result page
         return render_template(
             "result.html",
-            stock_data=stock_data,
+            stock_data=stock_data.display_dict(),
             rating=rating,
             sentiment=sentiment,
-            competitors=competitors,
+            competitors=[competitor.display_dict() for competitor in competitors],
         )
 
     return render_template("index.html")
 
-def get_investor_sentiment(stock_symbol):
+@app.route("/metrics")
+def metrics():
+    """
+    Latency histograms, counters and cache stats in the Prometheus text format
+    (or the cache and pre-warming stats as JSON with ?format=json).
+    """
+    if request.args.get("format") == "json":
+        return jsonify(web_cache=web_cache.stats(), prewarm=prewarmer.stats())
+    return Response(render_prometheus(), content_type=PROMETHEUS_CONTENT_TYPE)
+
+def sentiment_request(stock_symbol):
+    """
+    Return the completion request that analyzes investor sentiment for the given stock symbol.
+    """
+    # Simulate web scraping (replace this with actual scraping logic)
+    articles = [
+        f"Article 1 about {stock_symbol}",
+        f"Article 2 about {stock_symbol}",
+        f"Article 3 about {stock_symbol}",
+    ]
+
+    # Use ChatGPT to analyze sentiment
+    prompt = (
+        f"Analyze the sentiment of the following articles about {stock_symbol}:\n\n"
+        + "\n".join(articles)
+        + "\n\nProvide a summary of the overall sentiment (positive, negative, or neutral) and key points."
+    )
+    return {"engine": "text-davinci-003", "prompt": prompt, "max_tokens": 200, "temperature": 0.7}
+
+def get_investor_sentiment(stock_symbol, max_age=None, priority=PRIORITY_INTERACTIVE):
     """
     Use web scraping and ChatGPT to analyze investor sentiment for the given stock symbol.
+
+    max_age (seconds) limits how old a cached analysis may be, e.g. 0 to refresh it.
     """
     try:
-        # Simulate web scraping (replace this with actual scraping logic)
-        articles = [
-            f"Article 1 about {stock_symbol}",
-            f"Article 2 about {stock_symbol}",
-            f"Article 3 about {stock_symbol}",
-        ]
-
-        # Use ChatGPT to analyze sentiment
-        prompt = (
-            f"Analyze the sentiment of the following articles about {stock_symbol}:\n\n"
-            + "\n".join(articles)
-            + "\n\nProvide a summary of the overall sentiment (positive, negative, or neutral) and key points."
-        )
-        response = openai.Completion.create(
-            engine="text-davinci-003",
-            prompt=prompt,
-            max_tokens=200,
-            temperature=0.7,
-        )
-        return response.choices[0].text.strip()
+        response = cached_completion(openai.Completion.create, max_age=max_age, priority=priority,
+                                     **sentiment_request(stock_symbol))
+        return response["choices"][0]["text"].strip()
     except Exception as e:
         print(f"Error fetching investor sentiment: {e}")
-        return "Unable to fetch investor sentiment."
+        return SENTIMENT_UNAVAILABLE
+
+def competitor_request(stock_symbol):
+    """
+    Return the completion request that identifies the competitors of the given stock symbol.
+    """
+    prompt = (
+        f"Identify the main competitors of the company with stock symbol {stock_symbol}. "
+        "Provide their stock symbols."
+    )
+    return {"engine": "text-davinci-003", "prompt": prompt, "max_tokens": 100, "temperature": 0.7}
+
+def parse_competitors(response, stock_symbol):
+    """
+    Return the competitor symbols of a competitor_request completion, without duplicates or the company itself.
+    """
+    competitors = response["choices"][0]["text"].strip().split(",")  # Assume competitors are comma-separated
+    symbols = []
+    for competitor in competitors:
+        competitor = competitor.strip().upper()
+        if competitor and competitor != stock_symbol and competitor not in symbols:
+            symbols.append(competitor)
+    return symbols
 
 def get_competing_companies(stock_symbol):
     """
@@ -92,30 +163,45 @@ def get_competing_companies(stock_symbol):
     """
     try:
         # Use ChatGPT to identify competitors
-        prompt = (
-            f"Identify the main competitors of the company with stock symbol {stock_symbol}. "
-            "Provide their stock symbols."
-        )
-        response = openai.Completion.create(
-            engine="text-davinci-003",
-            prompt=prompt,
-            max_tokens=100,
-            temperature=0.7,
-        )
-        competitors = response.choices[0].text.strip().split(",")  # Assume competitors are comma-separated
-
-        # Fetch stock data for each competitor
-        competitor_data = []
-        for competitor in competitors:
-            competitor = competitor.strip()
-            stock_data = fetch_stock_data(competitor, ALPHA_VANTAGE_API_KEY)
-            if stock_data:
-                competitor_data.append(stock_data)
-
-        return competitor_data
+        response = cached_completion(openai.Completion.create, **competitor_request(stock_symbol))
+        symbols = parse_competitors(response, stock_symbol)
+
+        # Fetch all competitors concurrently (cached ones return immediately) and keep whatever
+        # finished before the deadline; the rest keep loading into the fundamentals cache. They use
+        # the batch lane, so leftovers never queue ahead of the next users' own lookups
+        competitor_data = [None] * len(symbols)
+        finished = 0
+        for index, _, stock_data in iter_fetch_many(symbols, ALPHA_VANTAGE_API_KEY, max_concurrency=len(symbols) or 1,
+                                                    timeout=COMPETITOR_DEADLINE, priority=PRIORITY_BATCH):
+            competitor_data[index] = stock_data
+            finished += 1
+        competitors = CompetitorList(stock_data for stock_data in competitor_data if stock_data)
+        competitors.complete = finished == len(symbols)
+        return competitors
     except Exception as e:
         print(f"Error fetching competing companies: {e}")
-        return []
+        return CompetitorList()
+
+def prewarm_sentiment(stock_symbol):
+    """
+    Refresh the sentiment of a stock in the LLM cache and the page cache.
+    """
+    sentiment = get_investor_sentiment(stock_symbol, max_age=0, priority=PRIORITY_BACKGROUND)
+    if sentiment == SENTIMENT_UNAVAILABLE:
+        raise RuntimeError(f"Sentiment for {stock_symbol} is unavailable.")
+    web_cache.set(("sentiment", stock_symbol), sentiment)
+
+# Keep fundamentals, earnings and sentiment of the watchlist and popular tickers warm in the background
+# (set PREWARM=1 to enable)
+prewarmer = Prewarmer([
+    alpha_vantage_task("OVERVIEW", ALPHA_VANTAGE_API_KEY),
+    alpha_vantage_task("EARNINGS", ALPHA_VANTAGE_API_KEY),
+    PrewarmTask("sentiment", "openai", refresh=prewarm_sentiment, max_age=lambda symbol: LLM_CACHE_TTL,
+                age=lambda symbol: llm_cache.llm_cache.age(**sentiment_request(symbol))),
+])
+register_stats("prewarm", prewarmer.stats)
+if os.getenv("PREWARM", "").strip().lower() in ("1", "true", "yes"):
+    prewarmer.start()
 
 if __name__ == "__main__":
     # Start the Flask app instead of running the CLI
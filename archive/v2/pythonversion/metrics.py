@@ -0,0 +1,224 @@
+# metrics.py
+import bisect
+import functools
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds (seconds) of the latency histogram buckets exported to Prometheus
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+                   60.0, math.inf)
+
+# Percentiles are computed over this many most recent observations of each histogram
+RESERVOIR_SIZE = 2048
+
+# Content type of the Prometheus text exposition format
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+class Histogram:
+    """
+    Latency distribution: cumulative bucket counts, sum and count for Prometheus, plus a ring buffer
+    of recent observations for percentiles.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, reservoir_size=RESERVOIR_SIZE):
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.reservoir_size = reservoir_size
+        self.samples = []
+
+    def observe(self, value):
+        self.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+        if len(self.samples) < self.reservoir_size:
+            self.samples.append(value)
+        else:
+            self.samples[self.count % self.reservoir_size] = value
+        self.count += 1
+        self.sum += value
+
+    def percentile(self, percent):
+        """
+        Return the nearest-rank percentile (0-100) of the recent observations, or None if there are none.
+        """
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[max(math.ceil(percent / 100 * len(ordered)) - 1, 0)]
+
+def format_labels(labels, extra=None):
+    """
+    Render labels as {name="value",...} with Prometheus escaping ("" when there are none).
+    """
+    items = list(labels) + list(extra or ())
+    if not items:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label_value(value)}"' for name, value in items) + "}"
+
+def escape_label_value(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def format_bound(bound):
+    return "+Inf" if bound == math.inf else repr(float(bound))
+
+class MetricsRegistry:
+    """
+    Thread-safe store of latency histograms and counters, keyed by metric name and labels.
+
+    Stats from other components (cache hit ratios, evictions, ...) are read at scrape time from
+    functions registered with register_stats(), so they are not counted twice.
+    """
+
+    def __init__(self):
+        self.histograms = {}  # (name, labels) -> Histogram
+        self.counters = {}  # (name, labels) -> value
+        self.stats_sources = {}  # Prefix -> function returning a stats dictionary
+        self._lock = threading.Lock()
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def increment(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """
+        Time the body of a with block (seconds) into histogram name, including when it raises.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def timed(self, name, **labels):
+        """
+        Decorator timing every call of a function into histogram name.
+        """
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.timer(name, **labels):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def register_stats(self, prefix, stats):
+        """
+        Export the numbers returned by stats() as gauges named prefix_key. Nested dictionaries of
+        numbers become one gauge with a "name" label per entry.
+        """
+        with self._lock:
+            self.stats_sources[prefix] = stats
+
+    def _stats_samples(self):
+        with self._lock:
+            sources = list(self.stats_sources.items())
+        for prefix, stats in sources:
+            try:
+                values = stats()
+            except Exception:
+                continue  # A broken source must not break the whole scrape
+            for key, value in values.items():
+                if isinstance(value, dict):
+                    for name, item in value.items():
+                        if isinstance(item, (int, float)) and not isinstance(item, bool):
+                            yield f"{prefix}_{key}", (("name", name),), item
+                elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                    yield f"{prefix}_{key}", (), value
+
+    def render_prometheus(self):
+        """
+        Return every metric in the Prometheus text exposition format.
+        """
+        lines = []
+        with self._lock:
+            histograms = sorted((key, histogram.buckets, list(histogram.bucket_counts), histogram.sum, histogram.count)
+                                for key, histogram in self.histograms.items())
+            counters = sorted(self.counters.items())
+
+        typed = set()
+        for (name, labels), buckets, bucket_counts, total, count in histograms:
+            if name not in typed:
+                lines.append(f"# TYPE {name} histogram")
+                typed.add(name)
+            cumulative = 0
+            for bound, bucket_count in zip(buckets, bucket_counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{format_labels(labels, [('le', format_bound(bound))])} {cumulative}")
+            lines.append(f"{name}_sum{format_labels(labels)} {total}")
+            lines.append(f"{name}_count{format_labels(labels)} {count}")
+        for (name, labels), value in counters:
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{name}{format_labels(labels)} {value}")
+        for name, labels, value in self._stats_samples():
+            if name not in typed:
+                lines.append(f"# TYPE {name} gauge")
+                typed.add(name)
+            lines.append(f"{name}{format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """
+        Return a human-readable table of latency percentiles and counters, for the end of CLI runs.
+        """
+        with self._lock:
+            histograms = [
+                (name, labels, histogram.count, histogram.sum,
+                 [histogram.percentile(percent) for percent in (50, 95, 99)])
+                for (name, labels), histogram in sorted(self.histograms.items())
+            ]
+            counters = sorted(self.counters.items())
+        if not histograms and not counters:
+            return "No metrics recorded."
+
+        names = [name + format_labels(labels) for name, labels, *_ in histograms]
+        names += [name + format_labels(labels) for (name, labels), _ in counters]
+        width = max(len(name) for name in names + ["Counter"])
+        lines = []
+        if histograms:
+            lines.append(f"{'Timer':{width}s} {'count':>7s} {'total s':>9s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s}")
+            for name, (_, _, count, total, percentiles) in zip(names, histograms):
+                lines.append(f"{name:{width}s} {count:7d} {total:9.3f} "
+                             + " ".join(f"{value * 1000:9.2f}" for value in percentiles))
+        if counters:
+            lines.append(f"{'Counter':{width}s} {'value':>7s}")
+            for name, (_, value) in zip(names[len(histograms):], counters):
+                lines.append(f"{name:{width}s} {value:7g}")
+        return "\n".join(lines)
+
+# Shared registry used by the instrumented code paths
+registry = MetricsRegistry()
+
+def observe(name, value, **labels):
+    registry.observe(name, value, **labels)
+
+def increment(name, amount=1, **labels):
+    registry.increment(name, amount, **labels)
+
+def timer(name, **labels):
+    return registry.timer(name, **labels)
+
+def timed(name, **labels):
+    return registry.timed(name, **labels)
+
+def register_stats(prefix, stats):
+    registry.register_stats(prefix, stats)
+
+def render_prometheus():
+    return registry.render_prometheus()
+
+def summary():
+    return registry.summary()
@@ -0,0 +1,305 @@
+# mock_server.py
+import json
+import os
+import random
+import ssl
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from stockthing.v2.pythonversion.utils import RateLimiter
+
+def overview_payload(symbol):
+    """
+    Build a fake OVERVIEW response for a symbol.
+    """
+    # Derive stable numbers from the symbol so repeated runs return the same data
+    seed = sum(ord(char) for char in symbol)
+    return {
+        "Symbol": symbol,
+        "Name": f"{symbol} Holdings Inc",
+        "Sector": "TECHNOLOGY",
+        "Industry": "SOFTWARE",
+        "MarketCapitalization": str(seed * 1000000),
+        "PERatio": f"{5 + seed % 30}.5",
+        "DividendYield": "0.012",
+        "50DayMovingAverage": f"{seed % 500 + 10}.25",
+    }
+
+def earnings_payload(symbol):
+    """
+    Build a fake EARNINGS response for a symbol.
+    """
+    return {
+        "symbol": symbol,
+        "quarterlyEarnings": [
+            {"fiscalDateEnding": "2024-09-30", "reportedDate": "2024-10-23", "reportedEPS": "0.72"},
+            {"fiscalDateEnding": "2024-06-30", "reportedDate": "2024-07-23", "reportedEPS": "0.52"},
+        ],
+    }
+
+def time_series_payload(symbol, function, outputsize="compact", interval="5min"):
+    """
+    Build a fake TIME_SERIES_DAILY or TIME_SERIES_INTRADAY response ending at the current bar.
+
+    Prices follow a deterministic random walk seeded by the symbol; "full" returns 20 years of daily
+    bars (or 30 days of intraday bars) and "compact" the latest 100.
+    """
+    seed = sum(ord(char) for char in symbol)
+    now = datetime.now().replace(second=0, microsecond=0)
+    if function == "TIME_SERIES_DAILY":
+        key = "Time Series (Daily)"
+        count = 20 * 252 if outputsize == "full" else 100
+        days = [day for day in (now.date() - timedelta(days=offset) for offset in range(count * 2)) if day.weekday() < 5]
+        timestamps = [day.isoformat() for day in days[:count]]
+    else:
+        key = f"Time Series ({interval})"
+        minutes = int(interval[:-3])
+        count = 30 * 16 * 60 // minutes if outputsize == "full" else 100
+        now = now - timedelta(minutes=now.minute % minutes)
+        timestamps = [(now - timedelta(minutes=minutes * offset)).strftime("%Y-%m-%d %H:%M:%S") for offset in range(count)]
+
+    bars = {}
+    for timestamp in reversed(timestamps):
+        # Derive each bar from its timestamp so repeated requests agree on shared bars
+        step = (zlib.crc32(f"{symbol}{timestamp}".encode()) % 2001 - 1000) / 100000
+        close = (seed % 500 + 10) * (1 + step)
+        bars[timestamp] = {
+            "1. open": f"{close * 0.995:.4f}",
+            "2. high": f"{close * 1.01:.4f}",
+            "3. low": f"{close * 0.99:.4f}",
+            "4. close": f"{close:.4f}",
+            "5. volume": str(seed * 1000 + len(bars)),
+        }
+    return {"Meta Data": {"2. Symbol": symbol}, key: dict(reversed(bars.items()))}
+
+def listing_status_csv(count):
+    """
+    Build a fake LISTING_STATUS CSV with count active stocks, plus one ETF and one delisted stock.
+    """
+    lines = ["symbol,name,exchange,assetType,ipoDate,delistingDate,status"]
+    for index in range(count):
+        exchange = "NYSE" if index % 2 else "NASDAQ"
+        lines.append(f"L{index:04d},L{index:04d} Holdings Inc,{exchange},Stock,2001-01-02,null,Active")
+    lines.append("ETFX,Example Index ETF,NYSE ARCA,ETF,2010-05-05,null,Active")
+    lines.append("GONE,Gone Corp,NYSE,Stock,1999-03-04,2020-06-30,Delisted")
+    return "\n".join(lines) + "\n"
+
+def search_payload(query):
+    """
+    Build a fake Google Custom Search response with three results for a query.
+    """
+    symbol = query.split()[0].upper() if query.split() else "N/A"
+    items = [
+        {
+            "title": f"{symbol} Holdings Inc - Company Profile ({source})",
+            "snippet": f"{symbol} Holdings Inc designs and sells software. Founded in 1990, headquartered in Austin.",
+            "link": f"https://{source}/{symbol.lower()}",
+        }
+        for source in ("example.com", "example.org", "example.net")
+    ]
+    return {"kind": "customsearch#search", "searchInformation": {"totalResults": str(len(items))}, "items": items}
+
+def completion_payload(request_body):
+    """
+    Build a fake OpenAI completion or chat completion response.
+    """
+    if "messages" in request_body:
+        prompt = request_body["messages"][-1]["content"]
+    else:
+        prompt = request_body.get("prompt", "")
+
+    # Competitor prompts get a comma-separated symbol list, everything else a short summary
+    if "competitors" in prompt:
+        text = "MSFT, GOOGL, AMZN"
+    else:
+        text = "Overall sentiment is neutral to positive. Key points: steady growth, fair valuation."
+
+    usage = {"prompt_tokens": len(prompt.split()), "completion_tokens": len(text.split())}
+    usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+    if "messages" in request_body:
+        choice = {"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}
+        return {"object": "chat.completion", "choices": [choice], "usage": usage}
+    return {"object": "text_completion", "choices": [{"index": 0, "text": text, "finish_reason": "stop"}], "usage": usage}
+
+# Rejections sent once a client exceeds the rate limit, shaped like each real provider's
+ALPHA_VANTAGE_RATE_LIMIT_NOTE = {
+    "Note": "Thank you for using Alpha Vantage! Our standard API call frequency is 5 calls per minute and "
+            "500 calls per day."
+}
+
+class ClientRateLimits:
+    """
+    Token bucket of `calls` per `period` seconds for each client key, like the providers' quotas.
+    """
+
+    def __init__(self, calls, period):
+        self.calls = calls
+        self.period = period
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def allow(self, key):
+        with self.lock:
+            if key not in self.buckets:
+                self.buckets[key] = RateLimiter(self.calls, self.period)
+            bucket = self.buckets[key]
+        return bucket.try_acquire()
+
+class MockUpstreamHandler(BaseHTTPRequestHandler):
+    """
+    Answer Alpha Vantage style /query requests, Google Custom Search requests and OpenAI completion
+    requests with recorded or canned JSON after a configurable delay.
+
+    A fraction of requests (error_rate) fail with 503, and clients over the rate limit get the
+    provider's rejection (an Alpha Vantage "Note" or a 429).
+    """
+
+    # HTTP/1.1 so clients can keep connections alive between requests
+    protocol_version = "HTTP/1.1"
+    # Send headers and body immediately instead of waiting on delayed ACKs
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        function = params.get("function", "")
+        symbol = params.get("symbol", "").upper()
+
+        # Simulate the network and upstream processing time
+        time.sleep(self.server.latency)
+
+        if url.path.startswith("/customsearch"):
+            self.count("search")
+            if self.reject(params.get("key", ""), status=429):
+                return
+            self.send_json(self.server.recording("search", "search") or search_payload(params.get("q", "")))
+            return
+
+        self.count(function)
+        if self.reject(params.get("apikey", ""), note=ALPHA_VANTAGE_RATE_LIMIT_NOTE):
+            return
+        if function == "LISTING_STATUS":
+            self.send_body(listing_status_csv(self.server.listing_size).encode("utf-8"), "text/csv")
+            return
+        if function == "OVERVIEW":
+            payload = self.server.recording(function, symbol) or overview_payload(symbol)
+        elif function == "EARNINGS":
+            payload = self.server.recording(function, symbol) or earnings_payload(symbol)
+        elif function.startswith("TIME_SERIES_"):
+            payload = time_series_payload(symbol, function, params.get("outputsize", "compact"), params.get("interval", "5min"))
+        else:
+            payload = {"Error Message": f"Unknown function: {function}"}
+
+        self.send_json(payload)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request_body = json.loads(self.rfile.read(length) or b"{}")
+
+        # Simulate the model's generation time
+        time.sleep(self.server.latency)
+
+        self.count("completions")
+        if self.reject(self.headers.get("Authorization", ""), status=429):
+            return
+        if self.path.endswith("completions"):
+            self.send_json(self.server.recording("completion", "completion") or completion_payload(request_body))
+        else:
+            self.send_json({"error": {"message": f"Unknown path: {self.path}"}}, status=404)
+
+    def count(self, name):
+        with self.server.lock:
+            self.server.call_counts[name] = self.server.call_counts.get(name, 0) + 1
+
+    def reject(self, client_key, status=200, note=None):
+        """
+        Send an injected error or a rate-limit rejection and return True, or return False to answer normally.
+        """
+        with self.server.lock:
+            failed = self.server.random.random() < self.server.error_rate
+        if failed:
+            self.count("errors")
+            self.send_json({"error": {"message": "Service temporarily unavailable."}}, status=503)
+            return True
+        if self.server.rate_limit is not None and not self.server.rate_limit.allow(client_key):
+            self.count("rate_limited")
+            self.send_json(note or {"error": {"message": "Rate limit exceeded."}}, status=status)
+            return True
+        return False
+
+    def send_json(self, payload, status=200):
+        self.send_body(json.dumps(payload).encode("utf-8"), "application/json", status)
+
+    def send_body(self, body, content_type, status=200):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Keep benchmark output clean
+        pass
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default listen backlog of 5 drops connections in load tests, which clients only retry after
+    # a 1 s SYN timeout
+    request_queue_size = 128
+
+def load_recordings(directory):
+    """
+    Return a lookup function for recorded responses saved as <directory>/<FUNCTION>/<SYMBOL>.json
+    (e.g. OVERVIEW/IBM.json), search/search.json and completion/completion.json.
+    """
+    cache = {}
+
+    def recording(kind, name):
+        if directory is None:
+            return None
+        path = os.path.join(directory, kind, f"{name}.json")
+        if path not in cache:
+            try:
+                with open(path) as file:
+                    cache[path] = json.load(file)
+            except FileNotFoundError:
+                cache[path] = None
+        return cache[path]
+    return recording
+
+def start_mock_server(latency=0.05, port=0, certfile=None, keyfile=None, listing_size=100, error_rate=0.0,
+                      rate_limit=None, recordings=None, seed=0):
+    """
+    Start the mock Alpha Vantage / Google Custom Search / OpenAI server in a background thread.
+
+    Pass certfile/keyfile to serve HTTPS. listing_size is the number of stocks LISTING_STATUS returns.
+    error_rate is the fraction of requests failing with 503; rate_limit is (calls, period) per API key,
+    e.g. (5, 60) for the Alpha Vantage free tier. recordings is a directory of recorded responses
+    replayed instead of the generated ones (see load_recordings).
+
+    Returns the server (stop it with server.shutdown()) and the Alpha Vantage /query URL to use;
+    OpenAI clients should use server.openai_base and search clients server.search_url.
+    """
+    server = MockServer(("127.0.0.1", port), MockUpstreamHandler)
+    scheme = "http"
+    if certfile:
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(certfile, keyfile)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+        scheme = "https"
+    server.latency = latency
+    server.listing_size = listing_size
+    server.error_rate = error_rate
+    server.random = random.Random(seed)  # Seeded, so injected errors hit the same requests every run
+    server.rate_limit = ClientRateLimits(*rate_limit) if rate_limit else None
+    server.recording = load_recordings(recordings)
+    server.call_counts = {}
+    server.lock = threading.Lock()
+    server.openai_base = f"{scheme}://127.0.0.1:{server.server_address[1]}/v1"
+    server.search_url = f"{scheme}://127.0.0.1:{server.server_address[1]}/customsearch/v1"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"{scheme}://127.0.0.1:{server.server_address[1]}/query"
@@ -1,7 +1,12 @@
 # output_handler.py
-def handle_output(display_option, symbol, stock_data, rating, csv_writer=None):
+from stockthing.v2.pythonversion.export import format_text_block
+
+def handle_output(display_option, symbol, stock_data, rating, csv_writer=None, export_writer=None):
     """
     Handle the output of stock analysis based on the selected display option.
+
+    File modes that collect every stock in one file ("one", "csv", "jsonl", "parquet") should pass
+    the run's ExportWriter, which keeps a single buffered handle open for the whole run.
     """
     if display_option == "console":
         print(f"\n=== Analysis for {symbol} ===")
@@ -19,26 +24,26 @@ def handle_output(display_option, symbol, stock_data, rating, csv_writer=None):
             file.write("\n=== Rating ===\n")
             file.write(f"The rating for {symbol} is: {rating}\n\n")
         print(f"Analysis for {symbol} has been saved to {output_file}.")
+    elif export_writer is not None:
+        export_writer.write(stock_data, rating)
+        print(f"Analysis for {symbol} has been added to {export_writer.path}.")
     elif display_option == "one":
         with open("stock_analysis.txt", "a") as file:
-            file.write(f"=== Analysis for {symbol} ===\n")
-            file.write("=== Stock Information ===\n")
-            for key, value in stock_data.items():
-                file.write(f"{key.capitalize()}: {value}\n")
-            file.write("\n=== Rating ===\n")
-            file.write(f"The rating for {symbol} is: {rating}\n\n")
+            file.write(format_text_block(symbol, stock_data, rating))
         print(f"Analysis for {symbol} has been added to stock_analysis.txt.")
     elif display_option == "csv" and csv_writer:
+        # Use display strings so missing values are written as "N/A"
+        values = dict(stock_data.items())
         csv_writer.writerow([
-            stock_data.get("symbol", "N/A"),
-            stock_data.get("long_name", "N/A"),
-            stock_data.get("sector", "N/A"),
-            stock_data.get("industry", "N/A"),
-            stock_data.get("market_cap", "N/A"),
-            stock_data.get("pe_ratio", "N/A"),
-            stock_data.get("dividend_yield", "N/A"),
-            stock_data.get("current_price", "N/A"),
-            stock_data.get("recent_quarter", "N/A"),
+            values.get("symbol", "N/A"),
+            values.get("long_name", "N/A"),
+            values.get("sector", "N/A"),
+            values.get("industry", "N/A"),
+            values.get("market_cap", "N/A"),
+            values.get("pe_ratio", "N/A"),
+            values.get("dividend_yield", "N/A"),
+            values.get("current_price", "N/A"),
+            values.get("recent_quarter", "N/A"),
             rating,
         ])
         print(f"Analysis for {symbol} has been added to stock_analysis.csv.")
\ No newline at end of file
@@ -0,0 +1,225 @@
+# portfolio.py
+import math
+
+import numpy as np
+
+from stockthing.v2.pythonversion import indicators
+from stockthing.v2.pythonversion.cache import fundamentals_cache
+from stockthing.v2.pythonversion.records import parse_text
+
+# Days of history used for covariance, VaR and beta
+DEFAULT_LOOKBACK = 252
+
+# Index whose returns beta is measured against
+DEFAULT_BENCHMARK = "SPY"
+
+class Portfolio:
+    """
+    Holdings with risk measures computed over a window of daily returns.
+
+    Everything is vectorized over positions: values (N), returns (days x N), the covariance matrix
+    (N x N), its product with the position values and the daily P&L series are kept, so changing one
+    position with set_position() updates the risk figures in O(N + days) instead of recomputing the
+    covariance in O(N^2 x days).
+    """
+
+    def __init__(self, symbols, shares, prices, returns, sectors=None, benchmark_returns=None,
+                 periods_per_year=indicators.PERIODS_PER_YEAR):
+        self.symbols = list(symbols)
+        self.index = {symbol: position for position, symbol in enumerate(self.symbols)}
+        self.shares = np.asarray(shares, dtype=np.float64).copy()
+        self.prices = np.asarray(prices, dtype=np.float64)
+        self.returns = np.ascontiguousarray(returns, dtype=np.float64)  # Days x positions
+        self.periods_per_year = periods_per_year
+        self.benchmark_returns = None if benchmark_returns is None else np.asarray(benchmark_returns, dtype=np.float64)
+
+        centered = self.returns - self.returns.mean(axis=0)
+        self.covariance = centered.T @ centered / (len(self.returns) - 1)
+
+        # Sector of each position as an integer code, for bincount
+        self.sector_names, self.sector_codes = np.unique(
+            np.array(sectors if sectors is not None else ["N/A"] * len(self.symbols), dtype=object).astype(str),
+            return_inverse=True,
+        )
+        self._recompute()
+
+    def _recompute(self):
+        self.values = self.shares * self.prices
+        self.cov_values = self.covariance @ self.values  # Covariance of each position with the portfolio
+        self.variance_values = float(self.values @ self.cov_values)  # Daily P&L variance in currency^2
+        self.pnl = self.returns @ self.values  # Daily P&L of the current holdings over the window
+
+    @property
+    def total_value(self):
+        return float(self.values.sum())
+
+    @property
+    def weights(self):
+        total = self.total_value
+        return self.values / total if total else np.zeros(len(self.values))
+
+    def set_position(self, symbol, shares):
+        """
+        Change the number of shares held of a symbol already in the portfolio, updating the risk
+        figures incrementally.
+        """
+        position = self.index[symbol]
+        delta = (shares - self.shares[position]) * self.prices[position]
+        self.shares[position] = shares
+        self.values[position] += delta
+        self.variance_values += 2 * delta * self.cov_values[position] + delta * delta * self.covariance[position, position]
+        self.cov_values += delta * self.covariance[:, position]
+        self.pnl += delta * self.returns[:, position]
+
+    def add_position(self, symbol, shares, price, returns, sector="N/A"):
+        """
+        Add a symbol that is not in the portfolio yet, with its daily returns over the same window.
+        """
+        if symbol in self.index:
+            self.set_position(symbol, shares)
+            return
+        returns = np.asarray(returns, dtype=np.float64)
+        if returns.shape != (len(self.returns),):
+            raise ValueError(f"Expected {len(self.returns)} daily returns for {symbol}, got {len(returns)}.")
+        centered = self.returns - self.returns.mean(axis=0)
+        new_centered = returns - returns.mean()
+        column = centered.T @ new_centered / (len(returns) - 1)
+
+        size = len(self.symbols)
+        covariance = np.empty((size + 1, size + 1))
+        covariance[:size, :size] = self.covariance
+        covariance[size, :size] = covariance[:size, size] = column
+        covariance[size, size] = new_centered @ new_centered / (len(returns) - 1)
+        self.covariance = covariance
+        self.returns = np.column_stack([self.returns, returns])
+        self.symbols.append(symbol)
+        self.index[symbol] = size
+        self.shares = np.append(self.shares, 0.0)
+        self.prices = np.append(self.prices, price)
+        if sector not in self.sector_names:
+            self.sector_names = np.append(self.sector_names, sector)
+        self.sector_codes = np.append(self.sector_codes, np.flatnonzero(self.sector_names == sector)[0])
+        self.values = np.append(self.values, 0.0)
+        self.cov_values = np.append(self.cov_values, float(column @ self.values[:size]))
+        self.set_position(symbol, shares)
+
+    def volatility(self):
+        """
+        Annualized volatility of the portfolio's returns.
+        """
+        total = self.total_value
+        return math.sqrt(max(self.variance_values, 0.0)) / total * math.sqrt(self.periods_per_year) if total else 0.0
+
+    def portfolio_returns(self):
+        """
+        Daily returns the current holdings would have had over the window.
+        """
+        total = self.total_value
+        return self.pnl / total if total else np.zeros(len(self.pnl))
+
+    def value_at_risk(self, confidence=0.95, horizon_days=1):
+        """
+        Historical Value at Risk: the loss (as a fraction of value) not exceeded with the given confidence.
+        """
+        returns = self.portfolio_returns()
+        return float(-np.quantile(returns, 1 - confidence) * math.sqrt(horizon_days))
+
+    def conditional_value_at_risk(self, confidence=0.95, horizon_days=1):
+        """
+        Expected shortfall: the average loss on the days worse than the Value at Risk.
+        """
+        returns = self.portfolio_returns()
+        tail = returns[returns <= np.quantile(returns, 1 - confidence)]
+        return float(-tail.mean() * math.sqrt(horizon_days)) if len(tail) else 0.0
+
+    def beta(self):
+        """
+        Beta of the portfolio against the benchmark, or None without benchmark returns.
+        """
+        if self.benchmark_returns is None:
+            return None
+        benchmark = self.benchmark_returns - self.benchmark_returns.mean()
+        returns = self.portfolio_returns()
+        return float((returns - returns.mean()) @ benchmark / (benchmark @ benchmark))
+
+    def position_betas(self):
+        """
+        Beta of every position against the benchmark, or None without benchmark returns.
+        """
+        if self.benchmark_returns is None:
+            return None
+        benchmark = self.benchmark_returns - self.benchmark_returns.mean()
+        centered = self.returns - self.returns.mean(axis=0)
+        return benchmark @ centered / (benchmark @ benchmark)
+
+    def risk_contributions(self):
+        """
+        Share of the portfolio variance contributed by each position (sums to 1).
+        """
+        if not self.variance_values:
+            return np.zeros(len(self.values))
+        return self.values * self.cov_values / self.variance_values
+
+    def sector_exposure(self):
+        """
+        Portfolio weight per sector.
+        """
+        exposure = np.bincount(self.sector_codes, weights=self.weights, minlength=len(self.sector_names))
+        return {str(name): float(weight) for name, weight in zip(self.sector_names, exposure) if weight}
+
+    def report(self, confidence=0.95):
+        """
+        Return the main figures as a dictionary (fractions of portfolio value unless noted).
+        """
+        total = self.total_value
+        value_at_risk = self.value_at_risk(confidence)
+        conditional = self.conditional_value_at_risk(confidence)
+        return {
+            "value": total,
+            "positions": int(np.count_nonzero(self.shares)),
+            "volatility": self.volatility(),
+            "value_at_risk": value_at_risk,
+            "value_at_risk_amount": value_at_risk * total,
+            "conditional_value_at_risk": conditional,
+            "conditional_value_at_risk_amount": conditional * total,
+            "confidence": confidence,
+            "beta": self.beta(),
+            "sector_exposure": self.sector_exposure(),
+        }
+
+    @classmethod
+    def from_store(cls, positions, lookback=DEFAULT_LOOKBACK, benchmark=DEFAULT_BENCHMARK, store=None, cache=None):
+        """
+        Build a portfolio from {symbol: shares} using closes from the price store and sectors from
+        the cached OVERVIEW responses. Prices are the latest closes; a symbol without any close in
+        the lookback window raises ValueError.
+        """
+        cache = cache or fundamentals_cache
+        store = store or indicators.price_store
+        symbols = list(positions)
+        if benchmark and not store.rows(benchmark):
+            benchmark = None  # No beta without benchmark prices
+        with_benchmark = [benchmark] + symbols if benchmark else symbols
+        _, closes = indicators.load_closes(with_benchmark, store=store)
+        closes = closes[:, -(lookback + 1):]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            returns = np.nan_to_num(closes[:, 1:] / closes[:, :-1] - 1, nan=0.0, posinf=0.0)
+
+        # Latest available close of every symbol
+        available = ~np.isnan(closes)
+        missing = [symbol for symbol, found in zip(with_benchmark, available.any(axis=1)) if not found]
+        if missing:
+            raise ValueError(f"No stored closes in the lookback window for {', '.join(missing)}.")
+        last = closes.shape[1] - 1 - np.argmax(available[:, ::-1], axis=1)
+        prices = closes[np.arange(len(closes)), last]
+
+        benchmark_returns = None
+        if benchmark:
+            benchmark_returns = returns[0]
+            returns, prices = returns[1:], prices[1:]
+
+        sectors = []
+        for symbol in symbols:
+            overview_data = cache.get("alphavantage", "OVERVIEW", symbol, allow_stale=True) or {}
+            sectors.append(parse_text(overview_data.get("Sector")) or "N/A")
+        return cls(symbols, [positions[symbol] for symbol in symbols], prices, returns.T, sectors, benchmark_returns)
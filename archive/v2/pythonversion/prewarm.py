@@ -0,0 +1,277 @@
+# prewarm.py
+import argparse
+import os
+import threading
+import time
+from typing import Callable, NamedTuple, Optional
+
+from dotenv import load_dotenv, find_dotenv
+
+from stockthing.v2.pythonversion import stock_analysis
+from stockthing.v2.pythonversion.bulk_loader import load_universe_file, unique_symbols
+from stockthing.v2.pythonversion.utils import PRIORITY_BACKGROUND, get_rate_limiter, log_error
+
+# Symbols kept warm when neither PREWARM_WATCHLIST nor PREWARM_WATCHLIST_FILE is set
+# (the same tickers the Node server pre-warms)
+DEFAULT_WATCHLIST = ["AAPL", "MSFT", "GOOGL", "AMZN", "META", "NVDA", "TSLA", "JPM", "V", "WMT"]
+
+# Seconds between pre-warming cycles
+PREWARM_INTERVAL = float(os.getenv("PREWARM_INTERVAL", "60"))
+
+# Refresh entries once they have used this fraction of their TTL, so users never hit an expired one
+PREWARM_REFRESH_AHEAD = float(os.getenv("PREWARM_REFRESH_AHEAD", "0.9"))
+
+# Tokens per provider left for interactive requests; pre-warming waits for the next cycle below this
+PREWARM_RESERVE_TOKENS = float(os.getenv("PREWARM_RESERVE_TOKENS", "2"))
+
+# Lookups of a symbol count half as much after this many seconds
+PREWARM_POPULARITY_HALF_LIFE = float(os.getenv("PREWARM_POPULARITY_HALF_LIFE", str(60 * 60)))
+
+# Most popular symbols outside the watchlist that are kept warm too
+PREWARM_POPULAR_LIMIT = int(os.getenv("PREWARM_POPULAR_LIMIT", "50"))
+
+# Symbols whose decayed lookup count falls below this are forgotten (after about 6 half-lives for one lookup)
+PREWARM_POPULARITY_FLOOR = float(os.getenv("PREWARM_POPULARITY_FLOOR", "0.02"))
+
+# Most symbols whose popularity is tracked; beyond this the least popular half is forgotten
+PREWARM_MAX_TRACKED = int(os.getenv("PREWARM_MAX_TRACKED", "10000"))
+
+# Staleness of an entry that has never been fetched (entries at their TTL have staleness 1)
+MISSING_STALENESS = 10.0
+
+class PrewarmTask(NamedTuple):
+    """
+    One kind of data kept warm per symbol.
+    """
+
+    name: str
+    provider: str  # Rate limiter whose budget the refresh spends
+    refresh: Callable  # refresh(symbol) fetches the data and stores it in its cache
+    max_age: Callable  # max_age(symbol) returns how long (seconds) the cached data stays fresh
+    age: Optional[Callable] = None  # age(symbol) returns seconds since cached or None; default: since last refresh
+
+def alpha_vantage_task(function, api_key):
+    """
+    Task keeping an Alpha Vantage function (OVERVIEW, EARNINGS) warm in the fundamentals cache.
+
+    Uses the refresh planner, so EARNINGS are not refreshed before the next report is due.
+    """
+    def max_age(symbol):
+        planned = stock_analysis.refresh_planner.max_age(function, symbol)
+        cache = stock_analysis.fundamentals_cache
+        return cache.ttls.get(function, cache.default_ttl) if planned is None else planned
+
+    return PrewarmTask(
+        name=function,
+        provider="alphavantage",
+        refresh=lambda symbol: stock_analysis.query_alpha_vantage(function, symbol, api_key, PRIORITY_BACKGROUND,
+                                                                  max_age=0),
+        max_age=max_age,
+        age=lambda symbol: stock_analysis.fundamentals_cache.age("alphavantage", function, symbol),
+    )
+
+def load_watchlist():
+    """
+    Return the watchlist from PREWARM_WATCHLIST (comma-separated), PREWARM_WATCHLIST_FILE or the default.
+    """
+    if os.getenv("PREWARM_WATCHLIST"):
+        return unique_symbols(os.getenv("PREWARM_WATCHLIST").split(","))
+    if os.getenv("PREWARM_WATCHLIST_FILE"):
+        return load_universe_file(os.getenv("PREWARM_WATCHLIST_FILE"))
+    return list(DEFAULT_WATCHLIST)
+
+class Prewarmer:
+    """
+    Background thread keeping a watchlist (plus the most looked-up symbols) warm.
+
+    Every cycle, (task, symbol) pairs past PREWARM_REFRESH_AHEAD of their TTL are refreshed in order
+    of popularity x staleness. Refreshes run one at a time in the background rate limiter lane and
+    only while the provider has more than PREWARM_RESERVE_TOKENS tokens, so requests from users are
+    never queued behind pre-warming and the rate budget is never exceeded.
+    """
+
+    def __init__(self, tasks, watchlist=None, interval=PREWARM_INTERVAL, refresh_ahead=PREWARM_REFRESH_AHEAD,
+                 reserve_tokens=PREWARM_RESERVE_TOKENS, half_life=PREWARM_POPULARITY_HALF_LIFE,
+                 popular_limit=PREWARM_POPULAR_LIMIT, popularity_floor=PREWARM_POPULARITY_FLOOR,
+                 max_tracked=PREWARM_MAX_TRACKED):
+        self.tasks = list(tasks)
+        self.watchlist = load_watchlist() if watchlist is None else unique_symbols(watchlist)
+        self.interval = interval
+        self.refresh_ahead = refresh_ahead
+        self.reserve_tokens = reserve_tokens
+        self.half_life = half_life
+        self.popular_limit = popular_limit
+        self.popularity_floor = popularity_floor
+        self.max_tracked = max_tracked
+        self.popularity = {}  # Symbol -> (decayed lookup count, time of last update)
+        self.last_refresh = {}  # (task name, symbol) -> time of the last refresh by this prewarmer
+        self.refreshed = {task.name: 0 for task in self.tasks}
+        self.errors = 0
+        self.deferred = 0  # Refreshes postponed to the next cycle for lack of rate budget
+        self.cycles = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def touch(self, symbol):
+        """
+        Record a lookup of symbol by a user; popular symbols are refreshed first.
+        """
+        now = time.monotonic()
+        with self._lock:
+            count, updated = self.popularity.get(symbol, (0.0, now))
+            self.popularity[symbol] = (count * 0.5 ** ((now - updated) / self.half_life) + 1, now)
+            if len(self.popularity) > self.max_tracked:
+                self._prune(now)
+
+    def popularity_of(self, symbol, now=None):
+        now = time.monotonic() if now is None else now
+        count, updated = self.popularity.get(symbol, (0.0, now))
+        return count * 0.5 ** ((now - updated) / self.half_life)
+
+    def _prune(self, now):
+        # Forget symbols nobody has looked up for a while; if that is not enough, keep the most popular half
+        # (called with the lock held)
+        self.popularity = {symbol: entry for symbol, entry in self.popularity.items()
+                           if self.popularity_of(symbol, now) >= self.popularity_floor}
+        if len(self.popularity) > self.max_tracked:
+            popular = sorted(self.popularity, key=lambda symbol: self.popularity_of(symbol, now), reverse=True)
+            self.popularity = {symbol: self.popularity[symbol] for symbol in popular[:self.max_tracked // 2]}
+
+    def symbols(self):
+        """
+        Return the watchlist plus the most popular symbols outside it.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._prune(now)
+            popular = sorted(self.popularity, key=lambda symbol: self.popularity_of(symbol, now), reverse=True)
+        extra = [symbol for symbol in popular if symbol not in self.watchlist][:self.popular_limit]
+        return self.watchlist + extra
+
+    def staleness(self, task, symbol):
+        """
+        Return age / max_age of a task's data for symbol (1 at expiry), MISSING_STALENESS if never fetched.
+        """
+        if task.age is not None:
+            age = task.age(symbol)
+        else:
+            refreshed_at = self.last_refresh.get((task.name, symbol))
+            age = None if refreshed_at is None else time.monotonic() - refreshed_at
+        if age is None:
+            return MISSING_STALENESS
+        max_age = task.max_age(symbol)
+        return age / max_age if max_age else MISSING_STALENESS
+
+    def plan(self):
+        """
+        Return the (score, task, symbol) refreshes due this cycle, highest score first.
+
+        Watchlist symbols count as at least one lookup, so they stay warm even when nobody asks for them.
+        """
+        now = time.monotonic()
+        due = []
+        for symbol in self.symbols():
+            with self._lock:
+                popularity = self.popularity_of(symbol, now)
+            if symbol in self.watchlist:
+                popularity += 1
+            for task in self.tasks:
+                staleness = self.staleness(task, symbol)
+                if staleness >= self.refresh_ahead:
+                    due.append((popularity * staleness, task, symbol))
+        due.sort(key=lambda item: item[0], reverse=True)
+        return due
+
+    def run_once(self):
+        """
+        Run one pre-warming cycle. Returns the number of refreshes made.
+        """
+        count = 0
+        due = self.plan()
+        for position, (_, task, symbol) in enumerate(due):
+            if self._stop.is_set():
+                break
+            limiter = get_rate_limiter(task.provider)
+            # Leave the reserve to interactive requests; whatever is left waits for the next cycle
+            if limiter.available() < self.reserve_tokens + 1:
+                self.deferred += len(due) - position
+                break
+            try:
+                task.refresh(symbol)
+            except Exception as e:
+                log_error(f"Pre-warming {task.name} for {symbol} failed: {e}", error=e, symbol=symbol, endpoint=task.name)
+                with self._lock:
+                    self.errors += 1
+                continue
+            self.last_refresh[(task.name, symbol)] = time.monotonic()
+            count += 1
+            with self._lock:
+                self.refreshed[task.name] += 1
+        with self._lock:
+            self.cycles += 1
+        return count
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                log_error(f"Pre-warming cycle failed: {e}", error=e)
+            self._stop.wait(self.interval)
+
+    def start(self):
+        """
+        Start the background thread (a daemon, so it never keeps the process alive).
+        """
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="prewarm", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        """
+        Stop after the refresh in progress, if any.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "watchlist": len(self.watchlist),
+                "tracked": len(self.popularity),
+                "cycles": self.cycles,
+                "refreshed": dict(self.refreshed),
+                "deferred": self.deferred,
+                "errors": self.errors,
+            }
+
+def main():
+    parser = argparse.ArgumentParser(description="Keep the fundamentals of a watchlist warm in the cache.")
+    parser.add_argument("--watchlist", help="Comma-separated symbols (default: PREWARM_WATCHLIST or the built-in list).")
+    parser.add_argument("--interval", type=float, default=PREWARM_INTERVAL, help="Seconds between cycles.")
+    parser.add_argument("--once", action="store_true", help="Run a single cycle and exit.")
+    args = parser.parse_args()
+
+    dotenv_path = find_dotenv("api.env")
+    if dotenv_path:
+        load_dotenv(dotenv_path)
+    api_key = os.getenv("ALPHA_VANTAGE_API_KEY", "").strip()
+    watchlist = args.watchlist.split(",") if args.watchlist else None
+    prewarmer = Prewarmer([alpha_vantage_task("OVERVIEW", api_key), alpha_vantage_task("EARNINGS", api_key)],
+                          watchlist, interval=args.interval)
+    if args.once:
+        print(f"Refreshed {prewarmer.run_once()} entries; {prewarmer.deferred} deferred for lack of rate budget.")
+        return
+    prewarmer.start()
+    try:
+        while True:
+            time.sleep(args.interval)
+            print(prewarmer.stats())
+    except KeyboardInterrupt:
+        prewarmer.stop()
+
+if __name__ == "__main__":
+    main()
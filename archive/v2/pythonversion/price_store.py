@@ -0,0 +1,224 @@
+# price_store.py
+import os
+import threading
+from datetime import date
+from typing import NamedTuple
+
+import numpy as np
+
+from stockthing.v2.pythonversion import http_client, stock_analysis
+from stockthing.v2.pythonversion.utils import PRIORITY_INTERACTIVE, rate_limit_check
+
+# Root directory of the store (one subdirectory per interval, then one per symbol)
+PRICE_STORE_PATH = os.getenv("PRICE_STORE_PATH", "price_store")
+
+# Column files kept for every symbol and their on-disk types (8 bytes per value)
+COLUMNS = {
+    "open": np.float64,
+    "high": np.float64,
+    "low": np.float64,
+    "close": np.float64,
+    "volume": np.int64,
+    "date": np.dtype("datetime64[s]"),  # Written last, so it marks how many rows are complete
+}
+
+# Supported bar intervals; everything except "daily" uses TIME_SERIES_INTRADAY
+INTERVALS = ("daily", "1min", "5min", "15min", "30min", "60min")
+
+# Column order of PriceSeries
+SERIES_COLUMNS = ("date", "open", "high", "low", "close", "volume")
+
+# A "compact" request returns the latest 100 bars; older stores need a full download
+COMPACT_BARS = 100
+
+class PriceSeries(NamedTuple):
+    """
+    OHLCV columns for one symbol, oldest bar first. Arrays are read-only views of the column files.
+    """
+
+    dates: np.ndarray
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray
+
+    def slice(self, start, stop):
+        return PriceSeries(*(column[start:stop] for column in self))
+
+def empty_series():
+    return PriceSeries(*(np.empty(0, dtype=COLUMNS[name]) for name in SERIES_COLUMNS))
+
+def column_path(directory, name):
+    return os.path.join(directory, f"{name}.bin")
+
+def parse_time_series(payload):
+    """
+    Parse a TIME_SERIES_DAILY or TIME_SERIES_INTRADAY response into column arrays, oldest bar first.
+    """
+    key = next((key for key in payload if key.startswith("Time Series")), None)
+    if key is None:
+        raise ValueError(f"Unexpected time series response: {str(payload)[:200]}")
+    bars = sorted(payload[key].items())
+    return {
+        "date": np.array([timestamp for timestamp, _ in bars], dtype=COLUMNS["date"]),
+        "open": np.array([float(bar["1. open"]) for _, bar in bars]),
+        "high": np.array([float(bar["2. high"]) for _, bar in bars]),
+        "low": np.array([float(bar["3. low"]) for _, bar in bars]),
+        "close": np.array([float(bar["4. close"]) for _, bar in bars]),
+        "volume": np.array([int(bar["5. volume"]) for _, bar in bars], dtype=np.int64),
+    }
+
+def request_time_series(symbol, api_key, interval="daily", full=False, priority=PRIORITY_INTERACTIVE):
+    """
+    Fetch daily or intraday OHLCV bars from Alpha Vantage and return the JSON.
+    """
+    params = {"symbol": symbol, "apikey": api_key, "outputsize": "full" if full else "compact"}
+    if interval == "daily":
+        params["function"] = "TIME_SERIES_DAILY"
+    else:
+        params["function"] = "TIME_SERIES_INTRADAY"
+        params["interval"] = interval
+    if not http_client.is_replayed(stock_analysis.ALPHA_VANTAGE_URL, params):
+        rate_limit_check(priority=priority)
+    response = http_client.get("alphavantage", stock_analysis.ALPHA_VANTAGE_URL, params=params)
+    return response.json()
+
+class PriceStore:
+    """
+    Append-only store of OHLCV bars with one binary column file per field and symbol.
+
+    Columns are memory-mapped, so range queries are zero-copy views found by binary search on the
+    date column and only the pages actually read are loaded. New bars are appended to the end of
+    each file; the date column is written last, so a crash mid-append never exposes a partial row.
+    Appends are serialized within a process; run one updater per store.
+    """
+
+    def __init__(self, root=PRICE_STORE_PATH):
+        self.root = root
+        self._maps = {}  # (interval, symbol) -> (rows, PriceSeries) of open memory maps
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+
+    def _directory(self, symbol, interval):
+        if interval not in INTERVALS:
+            raise ValueError(f"Unsupported interval: {interval}")
+        return os.path.join(self.root, interval, symbol.upper())
+
+    def _lock(self, symbol, interval):
+        with self._locks_lock:
+            return self._locks.setdefault((interval, symbol.upper()), threading.Lock())
+
+    def rows(self, symbol, interval="daily"):
+        """
+        Return the number of complete bars stored for a symbol.
+        """
+        directory = self._directory(symbol, interval)
+        sizes = []
+        for name, dtype in COLUMNS.items():
+            path = column_path(directory, name)
+            sizes.append(os.path.getsize(path) // np.dtype(dtype).itemsize if os.path.exists(path) else 0)
+        return min(sizes)
+
+    def load(self, symbol, interval="daily"):
+        """
+        Return all stored bars for a symbol as memory-mapped columns.
+        """
+        key = (interval, symbol.upper())
+        rows = self.rows(symbol, interval)
+        cached = self._maps.get(key)
+        if cached and cached[0] == rows:
+            return cached[1]
+        if rows == 0:
+            return empty_series()
+
+        directory = self._directory(symbol, interval)
+        series = PriceSeries(*(
+            np.memmap(column_path(directory, name), dtype=COLUMNS[name], mode="r", shape=(rows,))
+            for name in SERIES_COLUMNS
+        ))
+        self._maps[key] = (rows, series)
+        return series
+
+    def range(self, symbol, start=None, end=None, interval="daily"):
+        """
+        Return the bars with start <= date <= end (either bound may be None) as views into the files.
+
+        start and end can be dates, datetimes or ISO strings.
+        """
+        series = self.load(symbol, interval)
+        dates = series.dates
+        first = 0 if start is None else np.searchsorted(dates, np.datetime64(start, "s"), side="left")
+        if end is None:
+            last = len(dates)
+        else:
+            end = np.datetime64(end)
+            # A bare date as the end bound includes every bar on that day
+            if end.dtype == np.dtype("datetime64[D]"):
+                end = end + np.timedelta64(1, "D") - np.timedelta64(1, "s")
+            last = np.searchsorted(dates, end.astype("datetime64[s]"), side="right")
+        return series.slice(first, last)
+
+    def last_timestamp(self, symbol, interval="daily"):
+        """
+        Return the timestamp of the newest stored bar, or None if there are none.
+        """
+        dates = self.load(symbol, interval).dates
+        return dates[-1] if len(dates) else None
+
+    def append(self, symbol, bars, interval="daily"):
+        """
+        Append bars (a dict of column arrays, oldest first) newer than the last stored bar.
+
+        Returns the number of bars appended.
+        """
+        with self._lock(symbol, interval):
+            directory = self._directory(symbol, interval)
+            os.makedirs(directory, exist_ok=True)
+            rows = self.rows(symbol, interval)
+            last = self.last_timestamp(symbol, interval) if rows else None
+            new = slice(0, None) if last is None else slice(np.searchsorted(bars["date"], last, side="right"), None)
+            count = len(bars["date"][new])
+            if count == 0:
+                return 0
+
+            for name, dtype in COLUMNS.items():
+                with open(column_path(directory, name), "ab") as file:
+                    # Drop any partial row left behind by an interrupted append
+                    file.truncate(rows * np.dtype(dtype).itemsize)
+                    file.write(np.ascontiguousarray(bars[name][new], dtype=dtype).tobytes())
+            return count
+
+    def update(self, symbol, api_key, interval="daily", priority=PRIORITY_INTERACTIVE):
+        """
+        Fetch bars newer than the last stored one and append them. Returns the number of new bars.
+
+        Uses a compact request (latest 100 bars) when that is enough to close the gap and a full
+        download otherwise. The current, still-forming bar is not stored.
+        """
+        last = self.last_timestamp(symbol, interval)
+        full = last is None or self._gap_bars(last, interval) >= COMPACT_BARS
+        bars = parse_time_series(request_time_series(symbol, api_key, interval, full, priority))
+
+        # Keep only finished bars: daily bars before today, and every intraday bar but the newest
+        if interval == "daily":
+            finished = bars["date"] < np.datetime64(date.today(), "s")
+        else:
+            finished = np.arange(len(bars["date"])) < len(bars["date"]) - 1
+        return self.append(symbol, {name: column[finished] for name, column in bars.items()}, interval)
+
+    @staticmethod
+    def _gap_bars(last, interval):
+        """
+        Estimate how many bars have been published since `last`.
+        """
+        now = np.datetime64(date.today(), "s") + np.timedelta64(1, "D")
+        if interval == "daily":
+            return int(np.busday_count(last.astype("datetime64[D]"), now.astype("datetime64[D]")))
+        minutes = int(interval[:-3])
+        # About 16 trading hours a day including extended hours
+        trading_days = np.busday_count(last.astype("datetime64[D]"), now.astype("datetime64[D]"))
+        return int(trading_days * 16 * 60 / minutes)
+
+# Shared store instance
+price_store = PriceStore()
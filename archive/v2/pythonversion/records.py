@@ -0,0 +1,140 @@
+# records.py
+import math
+from array import array
+from typing import NamedTuple, Optional
+
+# Values Alpha Vantage uses for "no data"
+MISSING_VALUES = ("", "N/A", "None", "-")
+
+def parse_float(value):
+    """
+    Parse a raw API value into a float, using NaN for missing or unparseable values.
+    """
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+def parse_text(value):
+    """
+    Return a raw API string, or None if it is missing.
+    """
+    return None if value is None or value in MISSING_VALUES else value
+
+def format_value(value):
+    """
+    Format a field for display the way the raw API strings looked ("N/A" when missing).
+    """
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return "N/A"
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return str(value)
+
+class StockRecord(NamedTuple):
+    """
+    Stock information with numbers parsed once: floats are NaN and text is None when missing.
+
+    Behaves like the old stock_data dictionary for reading: get() returns typed values and items()
+    returns display strings.
+    """
+
+    symbol: str
+    long_name: Optional[str]
+    sector: Optional[str]
+    industry: Optional[str]
+    market_cap: float
+    pe_ratio: float
+    dividend_yield: float
+    current_price: float  # Alpha Vantage's 50-day moving average
+    recent_quarter: Optional[str]
+
+    @classmethod
+    def from_responses(cls, symbol, overview_data, earnings_data):
+        """
+        Build a record from Alpha Vantage OVERVIEW and EARNINGS responses.
+        """
+        recent_quarter = None
+        if earnings_data.get("quarterlyEarnings"):
+            recent_quarter = earnings_data["quarterlyEarnings"][0]["fiscalDateEnding"]
+        return cls(
+            symbol=symbol,
+            long_name=parse_text(overview_data.get("Name")),
+            sector=parse_text(overview_data.get("Sector")),
+            industry=parse_text(overview_data.get("Industry")),
+            market_cap=parse_float(overview_data.get("MarketCapitalization")),
+            pe_ratio=parse_float(overview_data.get("PERatio")),
+            dividend_yield=parse_float(overview_data.get("DividendYield")),
+            current_price=parse_float(overview_data.get("50DayMovingAverage")),
+            recent_quarter=recent_quarter,
+        )
+
+    def get(self, field, default=None):
+        """
+        Return a field's typed value, like dict.get.
+        """
+        return getattr(self, field, default)
+
+    def items(self):
+        """
+        Return (field, display string) pairs, like dict.items on the old stock_data dictionary.
+        """
+        return [(field, format_value(value)) for field, value in zip(self._fields, self)]
+
+    def display_dict(self):
+        """
+        Return a dictionary of display strings, for templates.
+        """
+        return dict(self.items())
+
+# Fields stored as float arrays in a StockRecordBatch; the rest are lists of strings
+NUMERIC_FIELDS = ("market_cap", "pe_ratio", "dividend_yield", "current_price")
+TEXT_FIELDS = tuple(field for field in StockRecord._fields if field not in NUMERIC_FIELDS)
+
+class StockRecordBatch:
+    """
+    Column-oriented container for many records: numbers live in compact float arrays
+    (8 bytes per value) instead of one Python object per value.
+    """
+
+    def __init__(self):
+        self.numeric = {field: array("d") for field in NUMERIC_FIELDS}
+        self.text = {field: [] for field in TEXT_FIELDS}
+
+    @classmethod
+    def from_records(cls, records):
+        batch = cls()
+        for record in records:
+            batch.append(record)
+        return batch
+
+    def append(self, record):
+        for field in NUMERIC_FIELDS:
+            self.numeric[field].append(getattr(record, field))
+        for field in TEXT_FIELDS:
+            self.text[field].append(getattr(record, field))
+
+    def __len__(self):
+        return len(self.text["symbol"])
+
+    def __getitem__(self, index):
+        values = {field: column[index] for field, column in self.numeric.items()}
+        values.update({field: column[index] for field, column in self.text.items()})
+        return StockRecord(**values)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def column(self, field):
+        """
+        Return a column; numeric columns are NumPy views of the underlying arrays (no copy).
+
+        Release numeric views before appending more records, since the array cannot grow while
+        a view of it exists.
+        """
+        if field in self.numeric:
+            import numpy as np  # Only column() needs NumPy, so importing records stays cheap
+
+            return np.frombuffer(self.numeric[field], dtype=np.float64)
+        return self.text[field]
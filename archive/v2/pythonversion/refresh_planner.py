@@ -0,0 +1,161 @@
+# refresh_planner.py
+import calendar
+import math
+import threading
+import time
+from datetime import date, timedelta
+
+from stockthing.v2.pythonversion import metrics
+from stockthing.v2.pythonversion.cache import fundamentals_cache
+
+# Typical gap between a quarter's end and its earnings report, used when a report date is missing
+DEFAULT_REPORT_LAG_DAYS = 45
+
+# Start checking for a new report this many days before it is expected
+EARLY_CHECK_DAYS = 3
+
+# Once a report is due, check EARNINGS this often until the new quarter shows up
+DUE_RECHECK_SECONDS = 24 * 60 * 60
+
+def add_months(day, months):
+    """
+    Add calendar months to a date, clamping to the end of the month (e.g. Nov 30 + 3 months = Feb 28).
+    """
+    month = day.month - 1 + months
+    year = day.year + month // 12
+    month = month % 12 + 1
+    return date(year, month, min(day.day, calendar.monthrange(year, month)[1]))
+
+def expected_next_report(earnings_data):
+    """
+    Estimate the date of the next earnings report from an EARNINGS response.
+
+    The next quarter ends three months after the latest one, and is assumed to be reported with
+    the same lag as the latest report. Returns None if the response has no quarterly earnings.
+    """
+    quarters = earnings_data.get("quarterlyEarnings") or []
+    if not quarters:
+        return None
+    fiscal_end = date.fromisoformat(quarters[0]["fiscalDateEnding"])
+    lag = DEFAULT_REPORT_LAG_DAYS
+    reported = quarters[0].get("reportedDate")
+    if reported and reported != "None":
+        lag = min(max((date.fromisoformat(reported) - fiscal_end).days, 0), 90)
+    return add_months(fiscal_end, 3) + timedelta(days=lag)
+
+class RefreshPlanner:
+    """
+    Decides which fundamentals actually need an upstream call.
+
+    EARNINGS only change when a company reports, so a cached EARNINGS response is reused, however old,
+    until shortly before the next expected report date; after that it is re-checked daily until the
+    new quarter appears. OVERVIEW is re-fetched whenever its cache entry is stale. Per-symbol state
+    (latest quarter, expected report date, last fetch times) lives next to the cache entries.
+    """
+
+    def __init__(self, cache=fundamentals_cache):
+        self.cache = cache
+        self.saved_calls = {}  # Calls skipped thanks to the planner, per function
+        self._stats_lock = threading.Lock()
+        self._table_ready = False
+
+    def _connection(self):
+        # Share the cache's per-thread connection, so state lives in the same database file
+        connection = self.cache._connection()
+        if not self._table_ready:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS refresh_state ("
+                "symbol TEXT PRIMARY KEY, recent_quarter TEXT, next_report TEXT, "
+                "overview_fetched_at REAL, earnings_fetched_at REAL)"
+            )
+            connection.commit()
+            self._table_ready = True
+        return connection
+
+    def state(self, symbol):
+        """
+        Return the recorded state of a symbol as a dictionary, or None if it has never been fetched.
+        """
+        row = self._connection().execute(
+            "SELECT recent_quarter, next_report, overview_fetched_at, earnings_fetched_at "
+            "FROM refresh_state WHERE symbol = ?",
+            (symbol,),
+        ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("recent_quarter", "next_report", "overview_fetched_at", "earnings_fetched_at"), row))
+
+    def max_age(self, function, symbol, today=None):
+        """
+        Return how old (in seconds) a cached response may be before it is re-fetched,
+        or None to use the endpoint's normal TTL.
+        """
+        if function != "EARNINGS":
+            return None
+        state = self.state(symbol)
+        if state is None or state["next_report"] is None:
+            return None
+        today = today or date.today()
+        if today < date.fromisoformat(state["next_report"]) - timedelta(days=EARLY_CHECK_DAYS):
+            return math.inf
+        return DUE_RECHECK_SECONDS
+
+    def plan(self, function, symbol, provider="alphavantage"):
+        """
+        Return (max_age, skipped) for a lookup: the max_age to pass to the cache, and whether the
+        cached entry is only reused because of the planner (a call saved).
+
+        Counts the saved call when skipped is True.
+        """
+        max_age = self.max_age(function, symbol)
+        skipped = False
+        if max_age is not None:
+            age = self.cache.age(provider, function, symbol)
+            ttl = self.cache.ttls.get(function, self.cache.default_ttl)
+            skipped = age is not None and ttl < age <= max_age
+        if skipped:
+            with self._stats_lock:
+                self.saved_calls[function] = self.saved_calls.get(function, 0) + 1
+        return max_age, skipped
+
+    def needs_fetch(self, function, symbol, provider="alphavantage"):
+        """
+        Return True if a lookup would go upstream, without counting anything.
+        """
+        return not self.cache.is_fresh(provider, function, symbol, self.max_age(function, symbol))
+
+    def record(self, function, symbol, payload):
+        """
+        Record a freshly fetched OVERVIEW or EARNINGS response.
+        """
+        now = time.time()
+        connection = self._connection()
+        with connection:
+            connection.execute("INSERT OR IGNORE INTO refresh_state (symbol) VALUES (?)", (symbol,))
+            if function == "EARNINGS":
+                quarters = payload.get("quarterlyEarnings") or []
+                next_report = expected_next_report(payload)
+                connection.execute(
+                    "UPDATE refresh_state SET recent_quarter = ?, next_report = ?, earnings_fetched_at = ? "
+                    "WHERE symbol = ?",
+                    (
+                        quarters[0]["fiscalDateEnding"] if quarters else None,
+                        next_report.isoformat() if next_report else None,
+                        now,
+                        symbol,
+                    ),
+                )
+            else:
+                connection.execute("UPDATE refresh_state SET overview_fetched_at = ? WHERE symbol = ?", (now, symbol))
+
+    def stats(self):
+        """
+        Return the number of upstream calls saved per function and in total.
+        """
+        with self._stats_lock:
+            saved = dict(self.saved_calls)
+        return {"saved_calls": saved, "total_saved_calls": sum(saved.values())}
+
+# Shared planner for the shared cache
+refresh_planner = RefreshPlanner()
+metrics.register_stats("refresh_planner", refresh_planner.stats)
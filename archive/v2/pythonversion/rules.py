@@ -0,0 +1,38 @@
+# rules.py
+import os
+from typing import NamedTuple
+
+class RatingRules(NamedTuple):
+    """
+    P/E thresholds of the Buy/Hold/Sell rating: Buy below buy_below, Sell above sell_above and
+    Hold in between (both ends inclusive).
+    """
+
+    buy_below: float = 15.0
+    sell_above: float = 25.0
+
+    @classmethod
+    def from_env(cls):
+        """
+        Read the thresholds from RATING_BUY_BELOW and RATING_SELL_ABOVE, falling back to 15 and 25.
+        """
+        defaults = cls()
+        return cls(
+            buy_below=float(os.getenv("RATING_BUY_BELOW", defaults.buy_below)),
+            sell_above=float(os.getenv("RATING_SELL_ABOVE", defaults.sell_above)),
+        )
+
+    def rate(self, pe_ratio):
+        """
+        Return "Buy", "Hold" or "Sell" for a P/E ratio (a number or numeric string).
+        """
+        pe_ratio = float(pe_ratio)
+        if pe_ratio < self.buy_below:
+            return "Buy"
+        elif pe_ratio <= self.sell_above:
+            return "Hold"
+        else:
+            return "Sell"
+
+# Thresholds used by every script and the Flask app
+rating_rules = RatingRules.from_env()
@@ -0,0 +1,142 @@
+# screening.py
+import operator
+
+import numpy as np
+
+from stockthing.v2.pythonversion.records import MISSING_VALUES
+from stockthing.v2.pythonversion.rules import rating_rules
+
+# Columns parsed into float arrays (missing or unparseable values become NaN)
+NUMERIC_FIELDS = ("market_cap", "pe_ratio", "dividend_yield", "current_price")
+# Columns kept as object arrays of strings
+TEXT_FIELDS = ("symbol", "long_name", "sector", "industry", "recent_quarter")
+
+# Rating labels, indexed by the codes rate_universe computes
+RATING_LABELS = np.array(
+    ["No Rating (P/E ratio unavailable)", "Unable to provide a rating.", "Buy", "Hold", "Sell"], dtype=object
+)
+NO_RATING, INVALID_RATING, BUY, HOLD, SELL = range(len(RATING_LABELS))
+
+# Comparison operators available to screening rules
+OPERATORS = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+def parse_number(value):
+    """
+    Parse one raw value; returns NaN for missing values and None for values that are not numbers.
+    """
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan if value is None or value in MISSING_VALUES else None
+
+def parse_numeric_column(values):
+    """
+    Parse a sequence of raw values into a float array.
+
+    Returns (numbers, invalid): missing values are NaN, and values that are present but not numbers
+    are NaN and flagged in the invalid mask.
+    """
+    parsed = [parse_number(value) for value in values]
+    invalid = np.fromiter((number is None for number in parsed), dtype=bool, count=len(parsed))
+    if invalid.any():
+        parsed = [np.nan if number is None else number for number in parsed]
+    return np.array(parsed, dtype=np.float64), invalid
+
+class Universe:
+    """
+    Columnar view of many stocks: one NumPy array per field instead of one dict per stock.
+    """
+
+    def __init__(self, columns, invalid=None):
+        self.columns = columns
+        self.invalid = invalid or {}
+
+    @classmethod
+    def from_records(cls, records):
+        """
+        Build a universe from stock_data dictionaries or StockRecords.
+        """
+        columns = {}
+        invalid = {}
+        for field in TEXT_FIELDS:
+            columns[field] = np.array([record.get(field, "N/A") for record in records], dtype=object)
+        for field in NUMERIC_FIELDS:
+            columns[field], invalid[field] = parse_numeric_column([record.get(field) for record in records])
+        return cls(columns, invalid)
+
+    @classmethod
+    def from_batch(cls, batch):
+        """
+        Build a universe from a StockRecordBatch without re-parsing any numbers.
+        """
+        columns = {field: np.array(batch.column(field), dtype=object) for field in TEXT_FIELDS}
+        invalid = {}
+        for field in NUMERIC_FIELDS:
+            columns[field] = batch.column(field).copy()  # Copy so the batch can keep growing
+            invalid[field] = np.zeros(len(batch), dtype=bool)  # Records are parsed, so nothing is invalid
+        return cls(columns, invalid)
+
+    def __len__(self):
+        # All columns have the same length; not every universe has a symbol column
+        return len(next(iter(self.columns.values())))
+
+    def __getitem__(self, field):
+        return self.columns[field]
+
+def rule_mask(universe, rule):
+    """
+    Evaluate one rule (field, op, value) over the whole universe and return a boolean mask.
+
+    op is a comparison from OPERATORS, "in" (value is a collection) or "between" (value is (low, high),
+    inclusive). Comparisons against NaN are False.
+    """
+    field, op, value = rule
+    column = universe[field]
+    if op == "in":
+        return np.isin(column, list(value))
+    if op == "between":
+        low, high = value
+        return (column >= low) & (column <= high)
+    return OPERATORS[op](column, value)
+
+def screen(universe, rules):
+    """
+    Return a boolean mask of the stocks that pass every rule.
+    """
+    mask = np.ones(len(universe), dtype=bool)
+    for rule in rules:
+        mask &= rule_mask(universe, rule)
+    return mask
+
+def rate_codes(universe, buy_below=rating_rules.buy_below, sell_above=rating_rules.sell_above, buy_rules=()):
+    """
+    Rate every stock in one pass and return integer codes (NO_RATING, INVALID_RATING, BUY, HOLD, SELL).
+    """
+    pe_ratio = universe["pe_ratio"]
+    buy = pe_ratio < buy_below
+    if buy_rules:
+        buy &= screen(universe, buy_rules)
+
+    # Start from Sell and overwrite, lowest precedence first
+    codes = np.full(len(pe_ratio), SELL, dtype=np.int8)
+    codes[pe_ratio <= sell_above] = HOLD
+    codes[buy] = BUY
+    codes[np.isnan(pe_ratio)] = NO_RATING
+    codes[universe.invalid["pe_ratio"]] = INVALID_RATING
+    return codes
+
+def rate_universe(universe, buy_below=rating_rules.buy_below, sell_above=rating_rules.sell_above, buy_rules=()):
+    """
+    Rate every stock in one pass with the same P/E bands as analyze_stock_data.
+
+    buy_rules are extra conditions a stock must meet to be rated Buy; stocks in the Buy band that
+    fail them are rated Hold. Returns an array of rating strings.
+    """
+    return RATING_LABELS[rate_codes(universe, buy_below, sell_above, buy_rules)]
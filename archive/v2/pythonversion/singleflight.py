@@ -0,0 +1,105 @@
+# singleflight.py
+import threading
+
+class InFlightCall:
+    """
+    A call that is currently running; waiters block on `done` and then read result or error.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls with the same key into one execution.
+
+    The first caller for a key runs the function; callers that arrive while it is still running wait
+    for it and receive the same result (or exception) instead of starting their own call.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.executions = 0  # Calls that actually ran
+        self.coalesced = 0  # Callers that shared another caller's result
+        self.max_waiters = 0  # Largest number of waiters on a single call
+
+    def do(self, key, function):
+        """
+        Run function() for key, or wait for the identical call already in flight.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if not leader:
+                call.waiters += 1
+                self.coalesced += 1
+                self.max_waiters = max(self.max_waiters, call.waiters)
+            else:
+                call = InFlightCall()
+                self._calls[key] = call
+                self.executions += 1
+
+        # Another caller is already running this call; wait for its outcome
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = function()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self):
+        """
+        Return execution and coalescing counters.
+        """
+        with self._lock:
+            return {
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+                "max_waiters": self.max_waiters,
+                "in_flight": len(self._calls),
+            }
+
+class AsyncSingleFlight:
+    """
+    SingleFlight for coroutines on one event loop: concurrent awaits of the same key share one execution.
+    """
+
+    def __init__(self):
+        self._calls = {}  # Key -> asyncio.Future of the running call
+        self.executions = 0
+        self.coalesced = 0
+
+    async def do(self, key, function):
+        """
+        Await function() for key, or the identical call already in flight.
+        """
+        import asyncio  # Only async callers need it, and they have already loaded it
+
+        call = self._calls.get(key)
+        if call is not None:
+            self.coalesced += 1
+            # Shielded, so a waiter being cancelled does not cancel the shared call
+            return await asyncio.shield(call)
+
+        call = asyncio.ensure_future(function())
+        self._calls[key] = call
+        self.executions += 1
+        call.add_done_callback(lambda _: self._calls.pop(key, None))
+        return await asyncio.shield(call)
+
+    def stats(self):
+        return {"executions": self.executions, "coalesced": self.coalesced, "in_flight": len(self._calls)}
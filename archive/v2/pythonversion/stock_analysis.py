@@ -1,78 +1,257 @@
 # stock_analysis.py
-import requests
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
 from datetime import datetime
-from stockthing.v2.pythonversion.utils import rate_limit_check, log_error
+from stockthing.v2.pythonversion import http_client, metrics
+from stockthing.v2.pythonversion.cache import fundamentals_cache
+from stockthing.v2.pythonversion.records import StockRecord
+from stockthing.v2.pythonversion.refresh_planner import refresh_planner
+from stockthing.v2.pythonversion.rules import rating_rules
+from stockthing.v2.pythonversion.singleflight import AsyncSingleFlight, SingleFlight
+from stockthing.v2.pythonversion.utils import PRIORITY_INTERACTIVE, rate_limit_check, rate_limit_check_async, log_error
 
+# Alpha Vantage endpoint (can be pointed at a local mock server for benchmarks)
+ALPHA_VANTAGE_URL = os.getenv("ALPHA_VANTAGE_URL", "https://www.alphavantage.co/query")
+
+# Number of upstream requests fetch_many keeps in flight at once
+DEFAULT_MAX_CONCURRENCY = 4
+
+# Concurrent lookups of the same (function, symbol) share one upstream call
+alpha_vantage_flight = SingleFlight()
+metrics.register_stats("alpha_vantage_singleflight", alpha_vantage_flight.stats)
+alpha_vantage_async_flight = AsyncSingleFlight()
+metrics.register_stats("alpha_vantage_async_singleflight", alpha_vantage_async_flight.stats)
+
+def request_alpha_vantage(function, symbol, api_key, priority=PRIORITY_INTERACTIVE):
+    """
+    Call a single Alpha Vantage function (e.g. OVERVIEW, EARNINGS) for a symbol and return the JSON.
+    """
+    params = {
+        "function": function,
+        "symbol": symbol,
+        "apikey": api_key,  # Use the provided API key
+    }
+    # Check and handle rate limits before making the API call (replayed responses don't use the quota)
+    if not http_client.is_replayed(ALPHA_VANTAGE_URL, params):
+        rate_limit_check(priority=priority)
+    start = time.perf_counter()
+    try:
+        response = http_client.get("alphavantage", ALPHA_VANTAGE_URL, params=params)
+        payload = response.json()
+    except Exception as e:
+        log_error(f"Alpha Vantage {function} request for {symbol} failed: {e}", error=e, symbol=symbol,
+                  endpoint=function, latency=time.perf_counter() - start)
+        raise
+    if response.status_code >= 400 or not is_valid_response(payload):
+        log_invalid_response(function, symbol, payload, response.status_code, time.perf_counter() - start)
+    return payload
+
+async def request_alpha_vantage_async(session, function, symbol, api_key, priority=PRIORITY_INTERACTIVE):
+    """
+    request_alpha_vantage for the asyncio web app, over an aiohttp session (see http_client.create_async_session).
+    """
+    await rate_limit_check_async(priority=priority)
+    params = {"function": function, "symbol": symbol, "apikey": api_key}
+    start = time.perf_counter()
+    try:
+        status, payload = await http_client.get_json_async(session, "alphavantage", ALPHA_VANTAGE_URL, params)
+    except Exception as e:
+        log_error(f"Alpha Vantage {function} request for {symbol} failed: {e}", error=e, symbol=symbol,
+                  endpoint=function, latency=time.perf_counter() - start)
+        raise
+    if status >= 400 or not is_valid_response(payload):
+        log_invalid_response(function, symbol, payload, status, time.perf_counter() - start)
+    return payload
+
+def log_invalid_response(function, symbol, payload, status, latency):
+    """
+    Log an Alpha Vantage response without data, with the kind of error response that came back.
+    """
+    # Rate limit note, error message or empty body
+    kind = next((key for key in ("Error Message", "Note", "Information") if key in (payload or {})), "Empty")
+    log_error(f"Alpha Vantage {function} returned no data for {symbol}", symbol=symbol, endpoint=function,
+              latency=latency, status=status, error_class=kind)
+
+def is_valid_response(payload):
+    """
+    Return True for real data, False for empty, error or rate-limit responses (which must not be cached).
+    """
+    return bool(payload) and not any(key in payload for key in ("Error Message", "Note", "Information"))
+
+def query_alpha_vantage(function, symbol, api_key, priority=PRIORITY_INTERACTIVE, max_age=None):
+    """
+    Return an Alpha Vantage response for a symbol, served from the on-disk cache when it is fresh.
+
+    Concurrent callers asking for the same function and symbol wait for a single shared lookup.
+    The refresh planner decides how old a cached response may be (EARNINGS are reused until the next
+    report is due) unless max_age (seconds) is given, e.g. 0 to refresh ahead of expiry.
+    priority is the rate limiter lane used if the request has to go upstream.
+    """
+    def fetch():
+        payload = request_alpha_vantage(function, symbol, api_key, priority)
+        if is_valid_response(payload):
+            refresh_planner.record(function, symbol, payload)
+        return payload
+
+    def lookup():
+        allowed_age = max_age
+        if allowed_age is None:
+            allowed_age, _ = refresh_planner.plan(function, symbol)
+        return fundamentals_cache.get_or_fetch(
+            "alphavantage", function, symbol, fetch, is_valid=is_valid_response, max_age=allowed_age
+        )
+
+    # Includes cache hits, so the distribution shows how often callers wait on the upstream
+    with metrics.timer("alpha_vantage_lookup_seconds", function=function):
+        return alpha_vantage_flight.do(("alphavantage", function, symbol), lookup)
+
+async def query_alpha_vantage_async(session, function, symbol, api_key, priority=PRIORITY_INTERACTIVE, max_age=None):
+    """
+    query_alpha_vantage for coroutines: same cache, refresh planning and coalescing, without blocking the loop.
+    """
+    async def fetch():
+        payload = await request_alpha_vantage_async(session, function, symbol, api_key, priority)
+        if is_valid_response(payload):
+            refresh_planner.record(function, symbol, payload)
+        return payload
+
+    async def lookup():
+        allowed_age = max_age
+        if allowed_age is None:
+            allowed_age, _ = refresh_planner.plan(function, symbol)
+        return await fundamentals_cache.get_or_fetch_async(
+            "alphavantage", function, symbol, fetch, is_valid=is_valid_response, max_age=allowed_age
+        )
+
+    with metrics.timer("alpha_vantage_lookup_seconds", function=function):
+        return await alpha_vantage_async_flight.do(("alphavantage", function, symbol), lookup)
+
+def check_overview(symbol, overview_data):
+    """
+    Raise ValueError if an OVERVIEW response does not describe a known symbol.
+    """
+    # If the response does not contain the "Symbol" key, raise an error
+    if "Symbol" not in overview_data:
+        raise ValueError(f"Unable to fetch data for symbol: {symbol}. Response: {overview_data}")
+
+def build_stock_info(symbol, overview_data, earnings_data):
+    """
+    Combine OVERVIEW and EARNINGS responses into a StockRecord. Check the OVERVIEW response with
+    check_overview first.
+    """
+    return StockRecord.from_responses(symbol, overview_data, earnings_data)
+
+def fetch_stock_record(symbol, api_key, priority=PRIORITY_INTERACTIVE):
+    """
+    Fetch OVERVIEW and then EARNINGS for a symbol and return a StockRecord. Raises on failure.
+
+    EARNINGS is only requested once OVERVIEW shows the symbol exists, so unknown tickers cost one call.
+    """
+    # Fetch company overview data from Alpha Vantage
+    overview_data = query_alpha_vantage("OVERVIEW", symbol, api_key, priority)
+
+    # Skip the earnings call if the symbol is unknown
+    check_overview(symbol, overview_data)
+
+    # Fetch earnings data from Alpha Vantage
+    earnings_data = query_alpha_vantage("EARNINGS", symbol, api_key, priority)
+
+    return build_stock_info(symbol, overview_data, earnings_data)
+
+async def fetch_stock_record_async(session, symbol, api_key, priority=PRIORITY_INTERACTIVE):
+    """
+    fetch_stock_record for coroutines. Raises on failure.
+    """
+    overview_data = await query_alpha_vantage_async(session, "OVERVIEW", symbol, api_key, priority)
+
+    # Skip the earnings call if the symbol is unknown
+    check_overview(symbol, overview_data)
+
+    earnings_data = await query_alpha_vantage_async(session, "EARNINGS", symbol, api_key, priority)
+    return build_stock_info(symbol, overview_data, earnings_data)
+
+@metrics.timed("stage_seconds", stage="fetch")
 def fetch_stock_data(symbol, api_key):
     """
-    Fetch stock data for a given symbol using the Alpha Vantage API.
+    Fetch stock data for a given symbol using the Alpha Vantage API and return a StockRecord.
     """
     try:
-        # Check and handle rate limits before making the API call
-        rate_limit_check()
-
-        # Fetch company overview data from Alpha Vantage
-        overview_url = "https://www.alphavantage.co/query"
-        overview_params = {
-            "function": "OVERVIEW",
-            "symbol": symbol,
-            "apikey": api_key,  # Use the provided API key
-        }
-        overview_response = requests.get(overview_url, params=overview_params)
-        overview_data = overview_response.json()
-
-        # If the response does not contain the "Symbol" key, raise an error
-        if "Symbol" not in overview_data:
-            raise ValueError(f"Unable to fetch data for symbol: {symbol}. Response: {overview_data}")
-
-        # Fetch earnings data from Alpha Vantage
-        rate_limit_check()
-        earnings_url = "https://www.alphavantage.co/query"
-        earnings_params = {
-            "function": "EARNINGS",
-            "symbol": symbol,
-            "apikey": api_key,  # Use the provided API key
-        }
-        earnings_response = requests.get(earnings_url, params=earnings_params)
-        earnings_data = earnings_response.json()
-
-        # Extract the most recent fiscal quarter from the earnings data
-        recent_quarter = "N/A"
-        if "quarterlyEarnings" in earnings_data:
-            recent_quarter = earnings_data["quarterlyEarnings"][0]["fiscalDateEnding"]
-
-        # Build a dictionary containing the stock information
-        stock_info = {
-            "symbol": symbol,
-            "long_name": overview_data.get("Name", "N/A"),
-            "sector": overview_data.get("Sector", "N/A"),
-            "industry": overview_data.get("Industry", "N/A"),
-            "market_cap": overview_data.get("MarketCapitalization", "N/A"),
-            "pe_ratio": overview_data.get("PERatio", "N/A"),
-            "dividend_yield": overview_data.get("DividendYield", "N/A"),
-            "current_price": overview_data.get("50DayMovingAverage", "N/A"),
-            "recent_quarter": recent_quarter,
-        }
+        return fetch_stock_record(symbol, api_key)
+    except Exception as e:
+        log_error(f"Error fetching data for {symbol}: {e}", error=e, symbol=symbol)
+        return None
 
-        return stock_info
+async def fetch_stock_data_async(session, symbol, api_key, priority=PRIORITY_INTERACTIVE):
+    """
+    fetch_stock_data for coroutines: returns a StockRecord, or None (and logs the error) on failure.
+    """
+    try:
+        return await fetch_stock_record_async(session, symbol, api_key, priority)
     except Exception as e:
-        log_error(f"Error fetching data for {symbol}: {e}")
+        log_error(f"Error fetching data for {symbol}: {e}", error=e, symbol=symbol)
         return None
 
+def iter_fetch_many(symbols, api_key, max_concurrency=DEFAULT_MAX_CONCURRENCY, timeout=None,
+                    priority=PRIORITY_INTERACTIVE):
+    """
+    Fetch several symbols concurrently and yield (index, symbol, stock_data) as each symbol completes.
+
+    Symbols are fetched in parallel on a thread pool, each with fetch_stock_record, so EARNINGS is
+    only requested after a valid OVERVIEW; the shared rate limiter in utils keeps the total request
+    rate within the Alpha Vantage budget. stock_data is None for symbols that could not be fetched.
+    If timeout (seconds) expires, iteration stops and symbols that have not finished are left out.
+    """
+    executor = ThreadPoolExecutor(max_workers=max_concurrency)
+    try:
+        owners = {
+            executor.submit(fetch_stock_record, symbol, api_key, priority): (index, symbol)
+            for index, symbol in enumerate(symbols)
+        }
+
+        # Yield a symbol as soon as its requests have finished
+        finished = 0
+        try:
+            for future in as_completed(owners, timeout=timeout):
+                index, symbol = owners[future]
+                finished += 1
+                try:
+                    stock_data = future.result()
+                except Exception as e:
+                    log_error(f"Error fetching data for {symbol}: {e}", error=e, symbol=symbol)
+                    stock_data = None
+                yield index, symbol, stock_data
+        except FuturesTimeoutError as e:
+            log_error(f"Deadline of {timeout}s reached; {len(symbols) - finished} symbol(s) not fetched.",
+                      error=e, latency=timeout)
+    finally:
+        # Don't wait for stragglers after a deadline and drop requests that have not started yet;
+        # requests already running finish in the background and still fill the cache
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def fetch_many(symbols, api_key, max_concurrency=DEFAULT_MAX_CONCURRENCY, timeout=None):
+    """
+    Fetch stock data for several symbols concurrently and return the results in input order.
+
+    Symbols that fail, or are not finished when timeout (seconds) expires, are None.
+    """
+    results = [None] * len(symbols)
+    for index, _, stock_data in iter_fetch_many(symbols, api_key, max_concurrency, timeout):
+        results[index] = stock_data
+    return results
+
+@metrics.timed("stage_seconds", stage="analyze")
 def analyze_stock_data(stock_data):
     """
     Analyze stock data and provide a Buy, Sell, or Hold recommendation.
     """
     try:
         pe_ratio = stock_data.get("pe_ratio", None)
-        if pe_ratio is None or pe_ratio == "N/A":
+        if pe_ratio is None or pe_ratio == "N/A" or (isinstance(pe_ratio, float) and math.isnan(pe_ratio)):
             return "No Rating (P/E ratio unavailable)"
-        elif float(pe_ratio) < 15:
-            return "Buy"
-        elif 15 <= float(pe_ratio) <= 25:
-            return "Hold"
-        else:
-            return "Sell"
+        # StockRecords hold floats already; plain dictionaries may still hold strings
+        return rating_rules.rate(pe_ratio)
     except Exception as e:
-        log_error(f"Error analyzing stock data: {e}")
-        return "Unable to provide a rating."
\ No newline at end of file
+        log_error(f"Error analyzing stock data: {e}", error=e)
+        return "Unable to provide a rating."
@@ -0,0 +1,207 @@
+# sweep.py
+import argparse
+import hashlib
+import itertools
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from stockthing.v2.pythonversion.backtest import Market, load_market, pe_rating_strategy, run_backtest
+from stockthing.v2.pythonversion.cache import FundamentalsCache
+
+# Where sweep results are kept, keyed by market data and parameter set
+SWEEP_CACHE_PATH = os.getenv("SWEEP_CACHE_PATH", "sweep_cache.sqlite3")
+
+# Summary fields of a BacktestResult stored for every parameter set
+SUMMARY_FIELDS = ("total_return", "annual_return", "volatility", "sharpe", "max_drawdown", "turnover")
+
+def parameter_grid(**values):
+    """
+    Return every combination of parameter values, e.g. parameter_grid(buy_below=[10, 15], sell_above=[25]).
+    """
+    names = list(values)
+    return [dict(zip(names, combination)) for combination in itertools.product(*values.values())]
+
+def market_arrays(market):
+    """
+    Return the market's arrays by name (factors are prefixed with "factor:").
+    """
+    arrays = {"dates": market.dates, "close": market.close, "pe_ratio": market.pe_ratio}
+    for name, values in (market.factors or {}).items():
+        arrays[f"factor:{name}"] = values
+    return arrays
+
+def market_fingerprint(market):
+    """
+    Return a hash of the market data, so cached results are only reused for identical inputs.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(json.dumps(list(market.symbols)).encode("utf-8"))
+    for name, values in sorted(market_arrays(market).items()):
+        digest.update(name.encode("utf-8"))
+        digest.update(np.ascontiguousarray(values).view(np.uint8))
+    return digest.hexdigest()
+
+def parameter_key(strategy_factory, parameters, options):
+    """
+    Return the cache key of one grid point: strategy, its parameters and the backtest options.
+    """
+    return json.dumps(
+        {"strategy": f"{strategy_factory.__module__}.{strategy_factory.__qualname__}",
+         "parameters": parameters, "options": options},
+        sort_keys=True,
+    )
+
+class SharedMarket:
+    """
+    A Market copied once into shared memory, so worker processes map the same pages instead of each
+    unpickling their own copy. Use as a context manager; the blocks are freed on exit.
+    """
+
+    def __init__(self, market):
+        self.blocks = []
+        arrays = {}
+        for name, values in market_arrays(market).items():
+            values = np.ascontiguousarray(values)
+            block = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+            np.ndarray(values.shape, dtype=values.dtype, buffer=block.buf)[...] = values
+            self.blocks.append(block)
+            arrays[name] = (block.name, values.shape, values.dtype.str)
+        # Small picklable description the workers attach from
+        self.spec = (list(market.symbols), arrays)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+
+def attach_market(spec):
+    """
+    Rebuild a Market from a SharedMarket spec as read-only views of the shared blocks.
+
+    Returns (market, blocks); keep the blocks referenced for as long as the market is used.
+    """
+    symbols, arrays = spec
+    blocks = []
+    views = {}
+    for name, (block_name, shape, dtype) in arrays.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        blocks.append(block)
+        view = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+        view.flags.writeable = False
+        views[name] = view
+    factors = {name.split(":", 1)[1]: values for name, values in views.items() if name.startswith("factor:")}
+    return Market(symbols, views["dates"], views["close"], views["pe_ratio"], factors or None), blocks
+
+# Set in each worker process by _init_worker
+_worker_market = None
+_worker_blocks = None
+
+def _init_worker(spec):
+    global _worker_market, _worker_blocks
+    _worker_market, _worker_blocks = attach_market(spec)
+
+def summarize(result):
+    """
+    Return the summary of a BacktestResult as a JSON-friendly dictionary (no daily series).
+    """
+    return {field: getattr(result, field) for field in SUMMARY_FIELDS}
+
+def _run_parameters(strategy_factory, parameters, options):
+    return summarize(run_backtest(_worker_market, strategy_factory(**parameters), **options))
+
+class SweepRunner:
+    """
+    Evaluates a grid of strategy parameters over one market on a process pool.
+
+    Results are cached per (market data, strategy, parameters, options), so re-running a sweep only
+    computes grid points that have not been seen before.
+    """
+
+    def __init__(self, cache_path=SWEEP_CACHE_PATH):
+        self.cache = FundamentalsCache(cache_path, ttls={}, default_ttl=math.inf)
+        self.computed = 0
+        self.reused = 0
+
+    def run(self, market, grid, strategy_factory=pe_rating_strategy, processes=None, **options):
+        """
+        Backtest strategy_factory(**parameters) for every parameter set in grid.
+
+        Returns (parameters, summary) pairs, best Sharpe ratio first. strategy_factory must be a
+        module-level function so it can be sent to the workers; options go to run_backtest.
+        """
+        fingerprint = market_fingerprint(market)
+        results = []
+        pending = []
+        for parameters in grid:
+            key = parameter_key(strategy_factory, parameters, options)
+            summary = self.cache.get("sweep", fingerprint, key)
+            if summary is None:
+                pending.append((key, parameters))
+            else:
+                results.append((parameters, summary))
+        self.reused += len(results)
+
+        if pending:
+            with SharedMarket(market) as shared, ProcessPoolExecutor(
+                max_workers=processes, initializer=_init_worker, initargs=(shared.spec,)
+            ) as executor:
+                futures = {
+                    executor.submit(_run_parameters, strategy_factory, parameters, options): (key, parameters)
+                    for key, parameters in pending
+                }
+                for future in as_completed(futures):
+                    key, parameters = futures[future]
+                    summary = future.result()
+                    # Cache each point as soon as it finishes, so an interrupted sweep keeps its progress
+                    self.cache.set("sweep", fingerprint, key, summary)
+                    results.append((parameters, summary))
+                    self.computed += 1
+
+        return sorted(results, key=lambda item: item[1]["sharpe"], reverse=True)
+
+def parse_values(text):
+    """
+    Parse a comma-separated list of numbers, e.g. "10,12.5,15".
+    """
+    return [float(value) for value in text.split(",") if value.strip()]
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep P/E rating thresholds over historical data.")
+    parser.add_argument("symbols", help="Comma-separated symbols with data in the price store and cache.")
+    parser.add_argument("--buy-below", type=parse_values, default=[10, 12.5, 15, 17.5, 20],
+                        help="Comma-separated Buy thresholds to try.")
+    parser.add_argument("--sell-above", type=parse_values, default=[20, 25, 30, 35],
+                        help="Comma-separated Sell thresholds to try.")
+    parser.add_argument("--start", help="First date (YYYY-MM-DD).")
+    parser.add_argument("--end", help="Last date (YYYY-MM-DD).")
+    parser.add_argument("--rebalance-every", type=int, default=1, help="Days between rebalances.")
+    parser.add_argument("--cost-bps", type=float, default=10.0, help="Trading cost in basis points.")
+    parser.add_argument("--processes", type=int, help="Worker processes (default: CPU count).")
+    parser.add_argument("--top", type=int, default=10, help="Number of results to print.")
+    args = parser.parse_args()
+
+    market = load_market([symbol.strip().upper() for symbol in args.symbols.split(",") if symbol.strip()],
+                         args.start, args.end)
+    grid = [
+        parameters for parameters in parameter_grid(buy_below=args.buy_below, sell_above=args.sell_above)
+        if parameters["buy_below"] <= parameters["sell_above"]
+    ]
+    runner = SweepRunner()
+    results = runner.run(market, grid, processes=args.processes,
+                         rebalance_every=args.rebalance_every, cost_bps=args.cost_bps)
+    print(f"{len(grid)} parameter sets: {runner.computed} computed, {runner.reused} from cache.")
+    for parameters, summary in results[:args.top]:
+        print(f"  Buy < {parameters['buy_below']:5.1f}  Sell > {parameters['sell_above']:5.1f}  "
+              f"Sharpe {summary['sharpe']:5.2f}  annual return {summary['annual_return']:6.1%}  "
+              f"max drawdown {summary['max_drawdown']:6.1%}  turnover {summary['turnover']:5.2f}/yr")
+
+if __name__ == "__main__":
+    main()
@@ -1,31 +1,246 @@
 # utils.py
+import heapq
+import importlib
+import itertools
+import logging
+import os
+import sys
+import threading
 import time
-from datetime import datetime
 
-# Global variables for rate limiting
-api_call_count = 0
-start_time = time.time()
+from stockthing.v2.pythonversion import error_log, metrics
 
-def rate_limit_check():
+# Priority lanes for RateLimiter (lower number is served first)
+PRIORITY_INTERACTIVE = 0  # A user is waiting on the result (CLI prompt, Flask request)
+PRIORITY_BATCH = 1  # Bulk or multi-symbol runs
+PRIORITY_BACKGROUND = 2  # Pre-warming and other work nobody is waiting for
+
+# Default quota per provider as (calls, period in seconds).
+# Override with e.g. RATE_LIMIT_ALPHAVANTAGE=75/60 for a premium key.
+PROVIDER_RATE_LIMITS = {
+    "alphavantage": (5, 60),  # Free tier: 5 calls per minute
+    "finnhub": (60, 60),  # Free tier: 60 calls per minute
+    "google_cse": (100, 86400),  # Custom Search: 100 queries per day
+    "openai": (60, 60),
+}
+
+class RateLimiter:
+    """
+    Thread-safe token bucket rate limiter with priority lanes.
+
+    The bucket holds up to `burst` tokens (defaults to `calls`) and refills at calls/period tokens
+    per second, so the long-run rate never exceeds the quota and there is no burst at window edges.
+    Waiters are served by priority, then in arrival order. `clock`, `sleep` and `async_sleep` can be
+    replaced (e.g. with a fake clock) to make the limiter deterministic; async_sleep defaults to
+    asyncio.sleep.
+    """
+
+    def __init__(self, calls, period, burst=None, clock=time.monotonic, sleep=time.sleep, async_sleep=None):
+        self.rate = calls / period  # Tokens added per second
+        self.capacity = burst or calls
+        self.clock = clock
+        self.sleep = sleep
+        self.async_sleep = async_sleep
+        self.tokens = float(self.capacity)
+        self.updated = clock()
+        self._lock = threading.Lock()
+        self._waiters = []  # Heap of [priority, sequence, tokens, granted]
+        self._sequence = itertools.count()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def _grant(self):
+        # Hand out available tokens to queued waiters in priority order
+        self._refill()
+        while self._waiters and self._waiters[0][2] <= self.tokens:
+            ticket = heapq.heappop(self._waiters)
+            self.tokens -= ticket[2]
+            ticket[3] = True
+
+    def _enqueue(self, tokens, priority):
+        if tokens > self.capacity:
+            raise ValueError(f"Cannot acquire {tokens} tokens from a bucket of {self.capacity}.")
+        ticket = [priority, next(self._sequence), tokens, False]
+        with self._lock:
+            heapq.heappush(self._waiters, ticket)
+        return ticket
+
+    def _poll(self, ticket, deadline):
+        """
+        Return 0 once the ticket is granted, otherwise how long to wait before polling again.
+        Returns None (and leaves the queue) when the deadline has passed.
+        """
+        with self._lock:
+            self._grant()
+            if ticket[3]:
+                return 0
+            # Tokens needed by everyone ahead of us in the queue, including this ticket
+            needed = sum(waiter[2] for waiter in self._waiters if waiter[:2] <= ticket[:2])
+            wait = (needed - self.tokens) / self.rate
+            if deadline is not None:
+                remaining = deadline - self.clock()
+                if remaining <= 0:
+                    self._waiters.remove(ticket)
+                    heapq.heapify(self._waiters)
+                    return None
+                wait = min(wait, remaining)
+            return wait
+
+    def try_acquire(self, tokens=1):
+        """
+        Take tokens without waiting. Returns False if they are not available right now.
+        """
+        with self._lock:
+            self._grant()
+            if self._waiters or self.tokens < tokens:
+                return False
+            self.tokens -= tokens
+            return True
+
+    def available(self):
+        """
+        Return how many tokens could be taken right now without waiting (0 while others are queued).
+        """
+        with self._lock:
+            self._grant()
+            return 0.0 if self._waiters else self.tokens
+
+    def acquire(self, tokens=1, priority=PRIORITY_INTERACTIVE, timeout=None):
+        """
+        Block until tokens are available. Returns False if the timeout expires first.
+        """
+        deadline = None if timeout is None else self.clock() + timeout
+        ticket = self._enqueue(tokens, priority)
+        while True:
+            wait = self._poll(ticket, deadline)
+            if wait is None:
+                return False
+            if wait == 0:
+                return True
+            self.sleep(wait)
+
+    async def acquire_async(self, tokens=1, priority=PRIORITY_INTERACTIVE, timeout=None):
+        """
+        Wait for tokens without blocking the event loop. Returns False if the timeout expires first.
+        """
+        import asyncio  # Only async callers need it, and they have already loaded it
+
+        async_sleep = self.async_sleep or asyncio.sleep
+        deadline = None if timeout is None else self.clock() + timeout
+        ticket = self._enqueue(tokens, priority)
+        while True:
+            wait = self._poll(ticket, deadline)
+            if wait is None:
+                return False
+            if wait == 0:
+                return True
+            await async_sleep(wait)
+
+# Shared limiters, one per provider
+rate_limiters = {}
+rate_limiters_lock = threading.Lock()
+
+def configure_rate_limiter(provider, calls, period, burst=None):
+    """
+    Replace the shared limiter for a provider with a new quota.
+    """
+    with rate_limiters_lock:
+        rate_limiters[provider] = RateLimiter(calls, period, burst)
+        return rate_limiters[provider]
+
+def get_rate_limiter(provider):
+    """
+    Return the shared limiter for a provider, creating it from PROVIDER_RATE_LIMITS on first use.
+    """
+    with rate_limiters_lock:
+        if provider not in rate_limiters:
+            calls, period = PROVIDER_RATE_LIMITS[provider]
+            override = os.getenv(f"RATE_LIMIT_{provider.upper()}")
+            if override:
+                calls, period = (float(value) for value in override.split("/"))
+            rate_limiters[provider] = RateLimiter(calls, period)
+        return rate_limiters[provider]
+
+def rate_limit_check(provider="alphavantage", priority=PRIORITY_INTERACTIVE):
     """
     Check if the API call limit has been reached and wait if necessary.
     """
-    global api_call_count, start_time
-    elapsed_time = time.time() - start_time
-    if elapsed_time > 60:
-        api_call_count = 0
-        start_time = time.time()
-    if api_call_count >= 5:
-        wait_time = 60 - elapsed_time
-        print(f"Rate limit reached. Waiting for {wait_time:.2f} seconds...")
-        time.sleep(wait_time)
-        api_call_count = 0
-        start_time = time.time()
-    api_call_count += 1
-
-def log_error(message):
-    """
-    Log errors to a file with a timestamp.
-    """
-    with open("error_log.txt", "a") as log_file:
-        log_file.write(f"{datetime.now()} - {message}\n")
\ No newline at end of file
+    limiter = get_rate_limiter(provider)
+    if limiter.try_acquire():
+        metrics.observe("rate_limit_wait_seconds", 0.0, provider=provider)
+        return
+    print(f"Rate limit reached for {provider}. Waiting for a free slot...")
+    metrics.increment("rate_limit_waits_total", provider=provider)
+    with metrics.timer("rate_limit_wait_seconds", provider=provider):
+        limiter.acquire(priority=priority)
+
+async def rate_limit_check_async(provider="alphavantage", priority=PRIORITY_INTERACTIVE):
+    """
+    rate_limit_check for coroutines: waits for a slot without blocking the event loop.
+    """
+    limiter = get_rate_limiter(provider)
+    if limiter.try_acquire():
+        metrics.observe("rate_limit_wait_seconds", 0.0, provider=provider)
+        return
+    metrics.increment("rate_limit_waits_total", provider=provider)
+    with metrics.timer("rate_limit_wait_seconds", provider=provider):
+        await limiter.acquire_async(priority=priority)
+
+def log_error(message, error=None, **fields):
+    """
+    Log an error as a JSON record in the error log (see error_log).
+
+    Pass the exception as error and what is known about the failed call as fields, e.g.
+    log_error("Request failed", error=e, symbol="IBM", endpoint="OVERVIEW", latency=0.42, status=503).
+    """
+    error_log.log(logging.ERROR, message, error, **fields)
+
+class LazyModule:
+    """
+    Stand-in for a module that is imported on first attribute access, from whichever thread gets there first.
+
+    Attributes set before then (e.g. openai.api_key) are kept and applied to the module once it is loaded.
+    """
+
+    def __init__(self, name):
+        object.__setattr__(self, "_name", name)
+        object.__setattr__(self, "_module", None)
+        object.__setattr__(self, "_pending", {})
+        object.__setattr__(self, "_lock", threading.Lock())
+
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    module = importlib.import_module(self._name)
+                    for name, value in self._pending.items():
+                        setattr(module, name, value)
+                    object.__setattr__(self, "_module", module)
+        return self._module
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+    def __setattr__(self, name, value):
+        with self._lock:
+            if self._module is None:
+                self._pending[name] = value
+                return
+        setattr(self._module, name, value)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+def lazy_import(name):
+    """
+    Return a LazyModule for name, or the module itself if it is already imported.
+
+    For heavy optional dependencies (openai, yfinance, streamlit) that entry points only need on some
+    code paths, so starting a CLI does not pay for importing them.
+    """
+    module = sys.modules.get(name)
+    return module if module is not None else LazyModule(name)
@@ -0,0 +1,224 @@
+# web_cache.py
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from stockthing.v2.pythonversion import metrics
+from stockthing.v2.pythonversion.singleflight import AsyncSingleFlight, SingleFlight
+
+# Memory the cached values may use, in bytes (measured as their pickled size)
+WEB_CACHE_MAX_BYTES = int(os.getenv("WEB_CACHE_MAX_BYTES", str(64 * 2 ** 20)))
+
+# Entries are served as-is until the soft TTL, served stale while a refresh runs until the hard TTL,
+# and refetched before answering after that (seconds)
+WEB_CACHE_SOFT_TTL = float(os.getenv("WEB_CACHE_SOFT_TTL", "60"))
+WEB_CACHE_HARD_TTL = float(os.getenv("WEB_CACHE_HARD_TTL", str(60 * 60)))
+
+# Threads running background refreshes
+WEB_CACHE_REFRESH_WORKERS = int(os.getenv("WEB_CACHE_REFRESH_WORKERS", "4"))
+
+class CacheEntry:
+    __slots__ = ("value", "size", "stored_at", "soft_ttl", "hard_ttl")
+
+    def __init__(self, value, size, soft_ttl, hard_ttl):
+        self.value = value
+        self.size = size
+        self.stored_at = time.monotonic()
+        self.soft_ttl = soft_ttl
+        self.hard_ttl = hard_ttl
+
+class WebCache:
+    """
+    In-process LRU cache for the web apps, bounded by memory, with stale-while-revalidate.
+
+    A lookup younger than its soft TTL is a hit. Between the soft and hard TTL the stale value is
+    returned immediately and one background refresh replaces it. A missing or expired entry is
+    fetched before answering, with concurrent misses for the same key sharing one fetch.
+    """
+
+    def __init__(self, max_bytes=WEB_CACHE_MAX_BYTES, soft_ttl=WEB_CACHE_SOFT_TTL, hard_ttl=WEB_CACHE_HARD_TTL,
+                 refresh_workers=WEB_CACHE_REFRESH_WORKERS):
+        self.max_bytes = max_bytes
+        self.soft_ttl = soft_ttl
+        self.hard_ttl = hard_ttl
+        self.entries = OrderedDict()  # Least recently used first
+        self.bytes = 0
+        self.flight = SingleFlight()
+        self.async_flight = AsyncSingleFlight()
+        self._async_refreshes = set()  # Background refresh tasks of get_or_fetch_async (kept referenced)
+        self.refresher = ThreadPoolExecutor(max_workers=refresh_workers, thread_name_prefix="web-cache-refresh")
+        self._refreshing = set()  # Keys with a background refresh queued or running
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+
+    def get(self, key):
+        """
+        Return the cached value for key regardless of age, or None. Does not count a hit or miss.
+        """
+        with self._lock:
+            entry = self.entries.get(key)
+            return None if entry is None else entry.value
+
+    def set(self, key, value, soft_ttl=None, hard_ttl=None):
+        """
+        Store a value and evict least recently used entries until the cache fits in max_bytes.
+
+        Values larger than max_bytes on their own are not stored.
+        """
+        size = len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        entry = CacheEntry(value, size, self.soft_ttl if soft_ttl is None else soft_ttl,
+                           self.hard_ttl if hard_ttl is None else hard_ttl)
+        with self._lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old.size
+            if size > self.max_bytes:
+                return
+            self.entries[key] = entry
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.bytes -= evicted.size
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            entry = self.entries.pop(key, None)
+            if entry is not None:
+                self.bytes -= entry.size
+
+    def clear(self):
+        """
+        Drop every entry (counters are kept).
+        """
+        with self._lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def get_or_fetch(self, key, fetch, is_valid=None, soft_ttl=None, hard_ttl=None):
+        """
+        Return the value for key, calling fetch() when it is missing or past its hard TTL.
+
+        Results rejected by is_valid (by default None) are returned but not cached.
+        """
+        if is_valid is None:
+            is_valid = lambda value: value is not None
+        with self._lock:
+            entry = self.entries.get(key)
+            age = None if entry is None else time.monotonic() - entry.stored_at
+            if entry is not None and age < entry.hard_ttl:
+                self.entries.move_to_end(key)
+                if age < entry.soft_ttl:
+                    self.hits += 1
+                    return entry.value
+                self.stale_hits += 1
+                # Serve the stale value and refresh it in the background, once per key
+                if key not in self._refreshing:
+                    self._refreshing.add(key)
+                    self.refresher.submit(self._refresh, key, fetch, is_valid, soft_ttl, hard_ttl)
+                return entry.value
+            self.misses += 1
+
+        def fetch_and_store():
+            value = fetch()
+            if is_valid(value):
+                self.set(key, value, soft_ttl, hard_ttl)
+            return value
+        return self.flight.do(key, fetch_and_store)
+
+    async def get_or_fetch_async(self, key, fetch, is_valid=None, soft_ttl=None, hard_ttl=None):
+        """
+        get_or_fetch for coroutines: fetch is a coroutine function, and stale entries are refreshed
+        by a task on the running event loop instead of the refresh thread pool.
+        """
+        import asyncio  # Only async callers need it, and they have already loaded it
+
+        if is_valid is None:
+            is_valid = lambda value: value is not None
+        with self._lock:
+            entry = self.entries.get(key)
+            age = None if entry is None else time.monotonic() - entry.stored_at
+            if entry is not None and age < entry.hard_ttl:
+                self.entries.move_to_end(key)
+                if age < entry.soft_ttl:
+                    self.hits += 1
+                    return entry.value
+                self.stale_hits += 1
+                # Serve the stale value and refresh it in the background, once per key
+                if key not in self._refreshing:
+                    self._refreshing.add(key)
+                    task = asyncio.ensure_future(self._refresh_async(key, fetch, is_valid, soft_ttl, hard_ttl))
+                    self._async_refreshes.add(task)
+                    task.add_done_callback(self._async_refreshes.discard)
+                return entry.value
+            self.misses += 1
+
+        async def fetch_and_store():
+            value = await fetch()
+            if is_valid(value):
+                self.set(key, value, soft_ttl, hard_ttl)
+            return value
+        return await self.async_flight.do(key, fetch_and_store)
+
+    async def _refresh_async(self, key, fetch, is_valid, soft_ttl, hard_ttl):
+        try:
+            value = await self.async_flight.do(key, fetch)
+            if is_valid(value):
+                self.set(key, value, soft_ttl, hard_ttl)
+            with self._lock:
+                self.refreshes += 1
+        except Exception as e:
+            print(f"Background refresh of {key} failed: {e}")
+            with self._lock:
+                self.refresh_errors += 1
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _refresh(self, key, fetch, is_valid, soft_ttl, hard_ttl):
+        try:
+            value = self.flight.do(key, fetch)
+            if is_valid(value):
+                self.set(key, value, soft_ttl, hard_ttl)
+            with self._lock:
+                self.refreshes += 1
+        except Exception as e:
+            # The stale value stays until its hard TTL; the next stale hit tries again
+            print(f"Background refresh of {key} failed: {e}")
+            with self._lock:
+                self.refresh_errors += 1
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def stats(self):
+        """
+        Return hit/miss/eviction counters and memory use.
+        """
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "refreshes": self.refreshes,
+                "refresh_errors": self.refresh_errors,
+                "refreshing": len(self._refreshing),
+                "entries": len(self.entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+# Shared cache for the Flask apps
+web_cache = WebCache()
+metrics.register_stats("web_cache", web_cache.stats)
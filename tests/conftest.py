@@ -0,0 +1,14 @@
+# conftest.py
+import importlib.util
+import os
+import sys
+import types
+
+# The scripts import the code as the "stockthing" package, which is the archive directory. Make it
+# importable when the tests run from a plain checkout.
+ARCHIVE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "archive")
+
+if importlib.util.find_spec("stockthing") is None:
+    package = types.ModuleType("stockthing")
+    package.__path__ = [ARCHIVE_DIR]
+    sys.modules["stockthing"] = package
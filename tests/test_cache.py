@@ -0,0 +1,18 @@
+# test_cache.py
+import pytest
+
+from stockthing.v2.pythonversion import cache, utils
+from stockthing.v2.pythonversion.cache import CacheMiss, FundamentalsCache
+from stockthing.v2.pythonversion.llm_cache import LLMCache
+
+def test_offline_mode_only_applies_to_alpha_vantage(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "offline", True)
+    monkeypatch.setitem(utils.rate_limiters, "openai", utils.RateLimiter(10, 1))
+    fundamentals = FundamentalsCache(str(tmp_path / "cache.sqlite3"))
+    with pytest.raises(CacheMiss):
+        fundamentals.get_or_fetch("alphavantage", "OVERVIEW", "IBM", lambda: {"Symbol": "IBM"})
+
+    completions = LLMCache(str(tmp_path / "llm.sqlite3"))
+    response = completions.completion(lambda **request: {"choices": [{"text": "ok"}]},
+                                      engine="text-davinci-003", prompt="Hi", max_tokens=5)
+    assert response["choices"][0]["text"] == "ok"
@@ -0,0 +1,45 @@
+# test_export.py
+import pytest
+
+from stockthing.v2.pythonversion.export import ExportWriter, format_text_block
+
+STOCK = {"symbol": "AAPL", "long_name": "Apple Inc", "pe_ratio": 20.0}
+
+def test_append_keeps_earlier_runs(tmp_path):
+    path = tmp_path / "stock_analysis.txt"
+    path.write_text("earlier run\n")
+    with ExportWriter(str(path), append=True) as writer:
+        writer.write(STOCK, "Hold")
+    assert path.read_text() == "earlier run\n" + format_text_block("AAPL", STOCK, "Hold")
+
+def test_append_writes_the_csv_header_once(tmp_path):
+    path = tmp_path / "stock_analysis.csv"
+    for _ in range(2):
+        with ExportWriter(str(path), append=True) as writer:
+            writer.write(STOCK, "Hold")
+    lines = path.read_text().splitlines()
+    assert len(lines) == 3 and lines[0].startswith("Symbol,")
+
+def test_failed_run_leaves_the_target_untouched(tmp_path):
+    path = tmp_path / "stock_analysis.txt"
+    path.write_text("earlier run\n")
+    with pytest.raises(RuntimeError):
+        with ExportWriter(str(path), append=True) as writer:
+            writer.write(STOCK, "Hold")
+            writer.flush()
+            raise RuntimeError("fetch failed")
+    assert path.read_text() == "earlier run\n"
+    assert [entry.name for entry in tmp_path.iterdir()] == ["stock_analysis.txt"]
+
+def test_parquet_cannot_be_appended(tmp_path):
+    with pytest.raises(ValueError):
+        ExportWriter(str(tmp_path / "stock_analysis.parquet"), append=True)
+
+def test_writers_in_one_process_use_separate_temporary_files(tmp_path):
+    path = tmp_path / "stock_analysis.csv"
+    first, second = ExportWriter(str(path)), ExportWriter(str(path))
+    assert first.temp_path != second.temp_path
+    first.write(STOCK, "Hold")
+    first.close()
+    second.abort()
+    assert [entry.name for entry in tmp_path.iterdir()] == ["stock_analysis.csv"]
@@ -0,0 +1,30 @@
+# test_import_time.py
+import os
+
+import pytest
+
+from stockthing.v2.pythonversion.benchmarks.import_time import IMPORT_TIME_BUDGETS, IMPORT_TIME_BUDGET_SCALE, measure_import
+from conftest import ARCHIVE_DIR
+
+# Fresh-interpreter imports per entry point; the fastest one is compared with the budget, so a
+# busy machine has to slow down every run to fail the test
+IMPORT_TIME_RUNS = 5
+
+@pytest.fixture
+def stockthing_path(tmp_path, monkeypatch):
+    """
+    Make the archive directory importable as "stockthing" in child interpreters.
+    """
+    os.symlink(ARCHIVE_DIR, tmp_path / "stockthing")
+    monkeypatch.setenv("PYTHONPATH", os.pathsep.join(filter(None, [str(tmp_path), os.getenv("PYTHONPATH")])))
+
+@pytest.mark.parametrize("module", sorted(IMPORT_TIME_BUDGETS))
+def test_entry_point_imports_within_budget(module, stockthing_path):
+    budget, allowed = IMPORT_TIME_BUDGETS[module]
+    measure_import(module)  # Warm-up: compiles bytecode and fills the OS file cache
+    runs = [measure_import(module) for _ in range(IMPORT_TIME_RUNS)]
+
+    best_ms = min(seconds for seconds, _ in runs) * 1000
+    assert best_ms <= budget * IMPORT_TIME_BUDGET_SCALE, f"{module} imports in {best_ms:.0f} ms"
+    eager = {name for _, loaded in runs for name in loaded} - set(allowed)
+    assert not eager, f"{module} imports {', '.join(sorted(eager))} at startup"
@@ -0,0 +1,75 @@
+# test_indicators.py
+import numpy as np
+import pytest
+
+from stockthing.v2.pythonversion import indicators
+
+def reference_sma(values, window):
+    return np.array([np.mean(values[index - window + 1:index + 1]) if index >= window - 1 else np.nan
+                     for index in range(len(values))])
+
+def reference_smooth(values, alpha, window):
+    result = np.full(len(values), np.nan)
+    current = np.mean(values[:window])
+    result[window - 1] = current
+    for index in range(window, len(values)):
+        current += alpha * (values[index] - current)
+        result[index] = current
+    return result
+
+@pytest.fixture
+def closes():
+    return 100 + np.cumsum(np.random.default_rng(0).normal(size=(3, 120)), axis=-1)
+
+def test_indicators_match_reference_without_gaps(closes):
+    np.testing.assert_allclose(indicators.sma(closes, 10)[0], reference_sma(closes[0], 10))
+    np.testing.assert_allclose(indicators.ema(closes, 10)[1], reference_smooth(closes[1], 2 / 11, 10))
+    expected_std = [np.std(closes[2, index - 9:index + 1]) if index >= 9 else np.nan for index in range(120)]
+    np.testing.assert_allclose(indicators.rolling_std(closes, 10)[2], expected_std)
+
+def test_leading_nans_start_each_row_at_its_first_valid_bar():
+    row = np.array([np.nan, np.nan, 3, 4, 5, 6, 7, 8])
+    nan4 = [np.nan] * 4
+    np.testing.assert_allclose(indicators.sma(row, 3), nan4 + [4, 5, 6, 7])
+    np.testing.assert_allclose(indicators.ema(row, 3), nan4 + [4, 5, 6, 7])
+    np.testing.assert_allclose(indicators.rolling_std(row, 3), nan4 + [np.sqrt(2 / 3)] * 4)
+    np.testing.assert_allclose(indicators.rsi(row, 3), [np.nan] * 5 + [100, 100, 100])
+    np.testing.assert_allclose(indicators.drawdown(row), [np.nan, np.nan] + [0] * 6)
+    assert indicators.max_drawdown(row) == 0
+
+def test_late_listing_row_matches_the_same_series_without_padding(closes):
+    padded = closes.copy()
+    padded[1, :30] = np.nan
+    listed = closes[1, 30:]
+    np.testing.assert_allclose(indicators.sma(padded, 10)[1, 30:], indicators.sma(listed, 10))
+    np.testing.assert_allclose(indicators.ema(padded, 10)[1, 30:], indicators.ema(listed, 10))
+    np.testing.assert_allclose(indicators.rsi(padded, 14)[1, 30:], indicators.rsi(listed, 14))
+    np.testing.assert_allclose(indicators.rolling_std(padded, 10)[1, 30:], indicators.rolling_std(listed, 10))
+    for padded_part, listed_part in zip(indicators.macd(padded), indicators.macd(listed)):
+        np.testing.assert_allclose(padded_part[1, 30:], listed_part)
+    # Rows without gaps are unaffected by the other row's padding
+    np.testing.assert_allclose(indicators.sma(padded, 10)[0], indicators.sma(closes[0], 10))
+
+def test_gap_only_affects_windows_that_contain_it(closes):
+    gapped = closes[0].copy()
+    gapped[50] = np.nan
+    sma = indicators.sma(gapped, 5)
+    assert np.isnan(sma[50:55]).all()
+    np.testing.assert_allclose(sma[55:], indicators.sma(closes[0], 5)[55:])
+    np.testing.assert_allclose(sma[:50], indicators.sma(closes[0], 5)[:50])
+
+    ema = indicators.ema(gapped, 5)
+    assert np.isnan(ema[50])
+    assert not np.isnan(ema[51:]).any()
+    # The EMA holds its state over the missing bar
+    alpha = 2 / 6
+    expected = ema[49] + alpha * (gapped[51] - ema[49])
+    assert ema[51] == pytest.approx(expected)
+
+def test_all_nan_row_stays_nan():
+    rows = np.array([[np.nan] * 20, np.arange(1.0, 21.0)])
+    assert np.isnan(indicators.sma(rows, 5)[0]).all()
+    assert np.isnan(indicators.ema(rows, 5)[0]).all()
+    assert np.isnan(indicators.rolling_std(rows, 5)[0]).all()
+    assert np.isnan(indicators.max_drawdown(rows)[0])
+    assert not np.isnan(indicators.ema(rows, 5)[1, 4:]).any()
@@ -0,0 +1,34 @@
+# test_portfolio.py
+import numpy as np
+import pytest
+
+from stockthing.v2.pythonversion.cache import FundamentalsCache
+from stockthing.v2.pythonversion.portfolio import Portfolio
+from stockthing.v2.pythonversion.price_store import PriceStore
+
+def daily_bars(closes):
+    closes = np.asarray(closes, dtype=np.float64)
+    return {
+        "date": np.datetime64("2024-01-02", "s") + np.arange(len(closes)) * np.timedelta64(1, "D"),
+        "open": closes, "high": closes, "low": closes, "close": closes,
+        "volume": np.zeros(len(closes), dtype=np.int64),
+    }
+
+@pytest.fixture
+def store(tmp_path):
+    store = PriceStore(str(tmp_path / "prices"))
+    store.append("AAA", daily_bars([10, 11, 12, 11, 13]))
+    return store
+
+def test_from_store_rejects_symbols_without_closes(store, tmp_path):
+    cache = FundamentalsCache(str(tmp_path / "cache.sqlite3"))
+    portfolio = Portfolio.from_store({"AAA": 2}, benchmark=None, store=store, cache=cache)
+    assert portfolio.total_value == 26
+    with pytest.raises(ValueError, match="BBB"):
+        Portfolio.from_store({"AAA": 2, "BBB": 1}, benchmark=None, store=store, cache=cache)
+
+def test_add_position_rejects_returns_of_another_window():
+    portfolio = Portfolio(["AAA"], [1], [10], np.array([[0.01], [0.02], [-0.01]]))
+    with pytest.raises(ValueError):
+        portfolio.add_position("BBB", 1, 20, [0.01, 0.02])
+    assert portfolio.symbols == ["AAA"]
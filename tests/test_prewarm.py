@@ -0,0 +1,52 @@
+# test_prewarm.py
+import types
+
+from stockthing.v2.pythonversion import cache, llm_cache, utils
+from stockthing.v2.pythonversion.prewarm import Prewarmer
+
+def test_popularity_is_capped():
+    prewarmer = Prewarmer([], watchlist=[], max_tracked=100)
+    for index in range(1000):
+        prewarmer.touch(f"T{index:04d}")
+    prewarmer.touch("T0999")
+    assert len(prewarmer.popularity) <= 100
+    assert "T0999" in prewarmer.popularity
+
+def test_decayed_symbols_are_forgotten():
+    prewarmer = Prewarmer([], watchlist=[], half_life=1.0)
+    prewarmer.touch("AAPL")
+    count, updated = prewarmer.popularity["AAPL"]
+    prewarmer.popularity["AAPL"] = (count, updated - 10)  # Ten half-lives ago
+    prewarmer.touch("MSFT")
+    assert prewarmer.symbols() == ["MSFT"]
+    assert list(prewarmer.popularity) == ["MSFT"]
+
+def test_sentiment_is_refetched_before_it_expires(tmp_path, monkeypatch):
+    from stockthing.v2.pythonversion import maintowebsite
+
+    now = [1000000.0]
+    monkeypatch.setattr(cache, "time", types.SimpleNamespace(time=lambda: now[0]))
+    monkeypatch.setattr(llm_cache, "llm_cache", llm_cache.LLMCache(str(tmp_path / "llm.sqlite3")))
+    monkeypatch.setitem(utils.rate_limiters, "openai", utils.RateLimiter(10 ** 6, 1))
+    calls = []
+
+    def create(**request):
+        calls.append(now[0])
+        return {"choices": [{"text": f"sentiment {len(calls)}"}]}
+
+    monkeypatch.setattr(maintowebsite, "openai", types.SimpleNamespace(Completion=types.SimpleNamespace(create=create)))
+    task = next(task for task in maintowebsite.prewarmer.tasks if task.name == "sentiment")
+    prewarmer = Prewarmer([task], watchlist=["AAPL"], refresh_ahead=0.9, reserve_tokens=0)
+    ttl = llm_cache.LLM_CACHE_TTL
+
+    assert prewarmer.run_once() == 1
+    now[0] += 0.5 * ttl
+    assert prewarmer.run_once() == 0  # Fresh entries are left alone
+    now[0] += 0.45 * ttl
+    assert prewarmer.run_once() == 1  # Refreshed ahead of expiry, not served from the cache
+    assert len(calls) == 2
+
+    # Past the first entry's expiry users are still served from the refreshed entry
+    now[0] += 0.5 * ttl
+    assert maintowebsite.get_investor_sentiment("AAPL") == "sentiment 2"
+    assert len(calls) == 2
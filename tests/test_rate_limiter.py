@@ -0,0 +1,148 @@
+# test_rate_limiter.py
+import asyncio
+
+import pytest
+
+from stockthing.v2.pythonversion import utils
+from stockthing.v2.pythonversion.llm_cache import LLMCache
+from stockthing.v2.pythonversion.utils import (
+    PRIORITY_BACKGROUND, PRIORITY_BATCH, PRIORITY_INTERACTIVE, RateLimiter,
+)
+
+class FakeClock:
+    """
+    Clock that only moves when sleep() is called (or advance() by the test).
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+    async def async_sleep(self, seconds):
+        self.sleep(seconds)
+
+def make_limiter(calls, period, burst=None):
+    clock = FakeClock()
+    limiter = RateLimiter(calls, period, burst, clock=clock, sleep=clock.sleep, async_sleep=clock.async_sleep)
+    return limiter, clock
+
+def test_burst_is_available_up_front_and_capped():
+    limiter, clock = make_limiter(5, 60, burst=3)
+    assert [limiter.try_acquire() for _ in range(4)] == [True, True, True, False]
+
+    # A long idle period refills the bucket only up to the burst size
+    clock.advance(3600)
+    assert limiter.available() == 3
+    assert [limiter.try_acquire() for _ in range(4)] == [True, True, True, False]
+
+def test_refill_follows_the_quota_rate():
+    limiter, clock = make_limiter(4, 64)  # One token every 16 seconds
+    for _ in range(4):
+        assert limiter.try_acquire()
+    assert not limiter.try_acquire()
+
+    clock.advance(15)
+    assert not limiter.try_acquire()
+    clock.advance(1)
+    assert limiter.try_acquire()
+    assert limiter.available() == 0
+
+    clock.advance(40)
+    assert limiter.available() == 2.5
+
+def test_acquire_sleeps_until_the_next_token():
+    limiter, clock = make_limiter(5, 60)
+    for _ in range(5):
+        limiter.try_acquire()
+
+    start = clock()
+    assert limiter.acquire()
+    assert clock() - start == pytest.approx(12)
+    assert limiter.acquire()
+    assert clock() - start == pytest.approx(24)
+
+def test_acquire_times_out_without_taking_a_token():
+    limiter, clock = make_limiter(1, 60)
+    limiter.try_acquire()
+
+    assert not limiter.acquire(timeout=10)
+    assert sum(clock.sleeps) == pytest.approx(10)
+    # The abandoned request left the queue, so the token arrives on schedule for the next caller
+    clock.advance(50)
+    assert limiter.try_acquire()
+
+def test_try_acquire_does_not_jump_the_queue():
+    limiter, clock = make_limiter(1, 10)
+    limiter.try_acquire()
+    ticket = limiter._enqueue(1, PRIORITY_BATCH)
+    assert limiter._poll(ticket, None) == pytest.approx(10)
+
+    clock.advance(10)
+    # The token that just arrived belongs to the queued waiter
+    assert not limiter.try_acquire()
+    assert limiter._poll(ticket, None) == 0
+
+def test_waiters_are_served_by_priority_then_arrival():
+    limiter, clock = make_limiter(1, 10)
+    limiter.try_acquire()
+    background = limiter._enqueue(1, PRIORITY_BACKGROUND)
+    batch_first = limiter._enqueue(1, PRIORITY_BATCH)
+    interactive = limiter._enqueue(1, PRIORITY_INTERACTIVE)
+    batch_second = limiter._enqueue(1, PRIORITY_BATCH)
+    tickets = {"background": background, "batch_first": batch_first,
+               "interactive": interactive, "batch_second": batch_second}
+
+    # Each wait covers everyone ahead in the queue
+    assert limiter._poll(interactive, None) == pytest.approx(10)
+    assert limiter._poll(batch_second, None) == pytest.approx(30)
+    assert limiter._poll(background, None) == pytest.approx(40)
+
+    served = []
+    for _ in range(4):
+        clock.advance(10)
+        limiter._grant()
+        served += [name for name, ticket in tickets.items() if ticket[3] and name not in served]
+    assert served == ["interactive", "batch_first", "batch_second", "background"]
+
+def test_acquire_rejects_more_tokens_than_the_bucket_holds():
+    limiter, _ = make_limiter(5, 60)
+    with pytest.raises(ValueError):
+        limiter.acquire(tokens=6)
+
+def test_acquire_async_uses_the_injected_sleep():
+    limiter, clock = make_limiter(2, 10)
+    limiter.try_acquire(2)
+
+    assert asyncio.run(limiter.acquire_async())
+    assert clock.sleeps == [pytest.approx(5)]
+    assert not asyncio.run(limiter.acquire_async(timeout=1))
+
+def test_only_uncached_completions_take_an_openai_token(tmp_path, monkeypatch):
+    limiter, _ = make_limiter(2, 60)
+    monkeypatch.setitem(utils.rate_limiters, "openai", limiter)
+    cache = LLMCache(str(tmp_path / "llm.sqlite3"))
+    calls = []
+
+    def create(**request):
+        calls.append(request)
+        return {"choices": [{"text": "ok"}], "usage": {"total_tokens": 10}}
+
+    for _ in range(3):
+        assert cache.completion(create, engine="text-davinci-003", prompt="Hi", max_tokens=5)["choices"][0]["text"] == "ok"
+    assert len(calls) == 1
+    assert limiter.available() == pytest.approx(1)
+
+    asyncio.run(cache.completion_async(lambda **request: asyncio.sleep(0, create(**request)),
+                                       engine="text-davinci-003", prompt="Hello", max_tokens=5))
+    assert len(calls) == 2
+    assert limiter.available() == pytest.approx(0)
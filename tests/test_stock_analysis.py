@@ -0,0 +1,33 @@
+# test_stock_analysis.py
+import pytest
+
+from stockthing.v2.pythonversion import stock_analysis
+
+@pytest.fixture
+def calls(monkeypatch):
+    """
+    Replace the Alpha Vantage lookup with a fake that knows AAPL and MSFT and records every call.
+    """
+    made = []
+
+    def query(function, symbol, api_key, priority=None, max_age=None):
+        made.append((function, symbol))
+        if function == "OVERVIEW":
+            return {"Symbol": symbol, "Name": f"{symbol} Inc", "PERatio": "20"} if symbol in ("AAPL", "MSFT") else {}
+        return {"quarterlyEarnings": [{"fiscalDateEnding": "2024-09-30"}]}
+
+    monkeypatch.setattr(stock_analysis, "query_alpha_vantage", query)
+    monkeypatch.setattr(stock_analysis, "log_error", lambda *args, **kwargs: None)
+    return made
+
+def test_fetch_many_skips_earnings_for_unknown_symbols(calls):
+    records = stock_analysis.fetch_many(["AAPL", "NOPE", "MSFT"], "key", max_concurrency=3)
+    assert [record.symbol if record else None for record in records] == ["AAPL", None, "MSFT"]
+    assert ("EARNINGS", "NOPE") not in calls
+    assert sorted(calls) == [("EARNINGS", "AAPL"), ("EARNINGS", "MSFT"),
+                             ("OVERVIEW", "AAPL"), ("OVERVIEW", "MSFT"), ("OVERVIEW", "NOPE")]
+
+def test_iter_fetch_many_requests_earnings_after_overview(calls):
+    results = list(stock_analysis.iter_fetch_many(["AAPL"], "key"))
+    assert results[0][:2] == (0, "AAPL")
+    assert calls == [("OVERVIEW", "AAPL"), ("EARNINGS", "AAPL")]